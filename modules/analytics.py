@@ -0,0 +1,454 @@
+# coding: utf-8
+# modules/analytics.py · WolfSight-PDF
+"""
+Estadísticas de firma en columnas, particionadas por mes.
+
+``validaciones.json`` es una lista de objetos: contar firmas por usuario y
+día obliga a cargarla entera. Aquí cada registro se agrega, al guardarse,
+a una carpeta por mes (``2026-10/``) con un archivo por columna:
+
+=============  ======  =================================================
+``ts``         ``q``   segundos desde 1970 (UTC)
+``day``        ``B``   día del mes, en hora local del puesto
+``user``       ``I``   código en ``dict.json`` de la partición
+``office``     ``I``   ídem
+``bytes``      ``Q``   tamaño del PDF firmado (0 = desconocido)
+``latency_ms`` ``f``   duración de la firma (NaN = no registrada)
+=============  ======  =================================================
+
+Son arreglos binarios de ``array`` (sin dependencias): agregar es escribir
+al final, y una consulta lee sólo las columnas que usa de los meses que
+pide, agrupa sobre códigos enteros y recién al final los traduce a texto.
+Un corte a mitad de escritura deja columnas de largos distintos; se lee
+hasta el mínimo común y la próxima escritura recorta el sobrante. Varios
+procesos (la GUI, la CLI, el demonio) pueden escribir el mismo mes: cada
+escritura toma un bloqueo del sistema sobre la partición.
+
+Si el almacén ya tiene historia, ``rebuild_from_store`` regenera todo desde
+``validaciones.json`` (en streaming) y reemplaza la carpeta de una vez.
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import sys
+import threading
+from array import array
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from itertools import compress, repeat
+from operator import add, mul
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Final, Iterable, Iterator, Sequence
+
+from modules import config
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover – Windows
+    fcntl = None  # type: ignore[assignment]
+try:
+    import msvcrt
+except ImportError:  # pragma: no cover – POSIX
+    msvcrt = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from modules.signature_manager import ValidationRecord
+
+_LOG = logging.getLogger("Analytics")
+_FORMAT: Final[int] = 1
+_DICT_FILE: Final[str] = "dict.json"
+_LOCK_FILE: Final[str] = ".lock"
+_MONTH_DIR: Final = re.compile(r"\d{4}-\d{2}")
+_REBUILD_BATCH: Final[int] = 50_000
+_DENSE_GROUPS: Final[int] = 1 << 20
+_COLUMNS: Final[dict[str, str]] = {
+    "ts": "q",
+    "day": "B",
+    "user": "I",
+    "office": "I",
+    "bytes": "Q",
+    "latency_ms": "f",
+}
+_ENCODED: Final[tuple[str, ...]] = ("user", "office")
+# Claves de agrupación y columna que leen («month» sale del nombre de la partición).
+GROUP_KEYS: Final[dict[str, str | None]] = {"user": "user", "office": "office", "day": "day", "month": None}
+
+Row = tuple[str, int, int, str, str, int, float]  # mes, ts, día, usuario, oficina, bytes, latencia
+Key = tuple[str, ...]
+
+
+def analytics_dir_for(store_path: str | Path) -> Path:
+    """Carpeta de estadísticas de un almacén: la configurada o una junto a él."""
+    if config.ANALYTICS_DIR:
+        return Path(config.ANALYTICS_DIR)
+    store_path = Path(store_path)
+    return store_path.with_name(f"{store_path.stem}-estadisticas")
+
+
+def _row(rec: "ValidationRecord") -> Row | None:
+    try:
+        stamp = _dt.datetime.fromisoformat(rec.datetime_utc)
+    except (TypeError, ValueError):
+        return None
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=_dt.timezone.utc)
+    local = stamp.astimezone()
+    latency = float("nan") if rec.elapsed_ms is None else float(rec.elapsed_ms)
+    return (
+        local.strftime("%Y-%m"), int(stamp.timestamp()), local.day,
+        rec.user, rec.office, max(0, int(rec.size_bytes)), latency,
+    )
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Bloqueo exclusivo entre procesos sobre ``path`` (espera si está tomado)."""
+    with open(path, "a+b") as fp:
+        if fcntl is not None:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            fp.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK se rinde tras ~10 s
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                fp.seek(0)
+                msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# ═════════════════════ partición mensual ═════════════════════════════════════
+class _Partition:
+    """Un mes: diccionarios de texto y una columna por archivo."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.month = path.name
+        self._meta: dict[str, Any] | None = None
+
+    @property
+    def meta(self) -> dict[str, Any]:
+        if self._meta is None:
+            try:
+                meta = json.loads((self.path / _DICT_FILE).read_text("utf-8"))
+                if meta.get("format") != _FORMAT:
+                    raise ValueError(f"formato {meta.get('format')!r}")
+            except FileNotFoundError:
+                meta = {"format": _FORMAT, "byteorder": sys.byteorder, **{name: [] for name in _ENCODED}}
+            self._meta = meta
+        return self._meta
+
+    def rows(self) -> int:
+        """Filas completas: el largo de la columna más corta."""
+        counts = []
+        for name, typecode in _COLUMNS.items():
+            try:
+                size = (self.path / name).stat().st_size
+            except FileNotFoundError:
+                size = 0
+            counts.append(size // array(typecode).itemsize)
+        return min(counts)
+
+    def column(self, name: str, rows: int) -> array:
+        values = array(_COLUMNS[name])
+        with open(self.path / name, "rb") as fp:
+            values.frombytes(fp.read(rows * values.itemsize))
+        if self.meta.get("byteorder", sys.byteorder) != sys.byteorder:
+            values.byteswap()
+        return values
+
+    def append(self, rows: Sequence[Row]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Otro proceso pudo agregar textos al diccionario: se relee con el bloqueo tomado.
+        with _file_lock(self.path / _LOCK_FILE):
+            self._meta = None
+            self._append(rows)
+
+    def _append(self, rows: Sequence[Row]) -> None:
+        meta = self.meta
+        if meta.get("byteorder", sys.byteorder) != sys.byteorder:
+            raise OSError(f"{self.path} se escribió en otra arquitectura; regenere las estadísticas.")
+        lookups = {name: {value: code for code, value in enumerate(meta[name])} for name in _ENCODED}
+        columns = {name: array(typecode) for name, typecode in _COLUMNS.items()}
+        grew = False
+        for _month, ts, day, user, office, size, latency in rows:
+            columns["ts"].append(ts)
+            columns["day"].append(day)
+            columns["bytes"].append(size)
+            columns["latency_ms"].append(latency)
+            for name, value in (("user", user), ("office", office)):
+                code = lookups[name].get(value)
+                if code is None:
+                    code = lookups[name][value] = len(meta[name])
+                    meta[name].append(value)
+                    grew = True
+                columns[name].append(code)
+
+        # Primero el diccionario: una columna nunca apunta a un código sin texto.
+        if grew:
+            tmp = self.path / f"{_DICT_FILE}.tmp"
+            tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.path / _DICT_FILE)
+        complete = self.rows()
+        for name, values in columns.items():
+            target = self.path / name
+            with open(target, "ab") as fp:
+                fp.truncate(complete * values.itemsize)  # restos de una escritura cortada
+                values.tofile(fp)
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class SigningStats:
+    """Escritura incremental y consultas de agregación sobre las particiones."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    # ——— escritura ——————————————————————————————————————————————————
+    def append(self, records: Iterable["ValidationRecord"]) -> int:
+        """Agrega ``records`` a sus meses. Devuelve cuántos se guardaron."""
+        by_month: dict[str, list[Row]] = {}
+        skipped = 0
+        for rec in records:
+            row = _row(rec)
+            if row is None:
+                skipped += 1
+                continue
+            by_month.setdefault(row[0], []).append(row)
+        if skipped:
+            _LOG.warning("%d registros sin fecha válida no se incluyen en las estadísticas", skipped)
+        with self._lock:
+            for month, rows in by_month.items():
+                _Partition(self.root / month).append(rows)
+        return sum(len(rows) for rows in by_month.values())
+
+    def rebuild_from_store(self, store_path: str | Path) -> int:
+        """Regenera todas las particiones desde ``validaciones.json``."""
+        from modules.audit import iter_records
+        from modules.signature_manager import ValidationRecord
+
+        staging = self.root.with_name(f"{self.root.name}.nuevo")
+        shutil.rmtree(staging, ignore_errors=True)
+        builder = SigningStats(staging)
+        total = 0
+        batch: list[ValidationRecord] = []
+        for _index, item in iter_records(store_path):
+            try:
+                batch.append(ValidationRecord.from_dict(item))
+            except TypeError:
+                continue
+            if len(batch) >= _REBUILD_BATCH:
+                total += builder.append(batch)
+                batch.clear()
+        total += builder.append(batch)
+        staging.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            retired = self.root.with_name(f"{self.root.name}.anterior")
+            shutil.rmtree(retired, ignore_errors=True)
+            if self.root.exists():
+                self.root.replace(retired)
+            staging.replace(self.root)
+            shutil.rmtree(retired, ignore_errors=True)
+        return total
+
+    # ——— consultas ——————————————————————————————————————————————————
+    def months(self) -> list[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir() and _MONTH_DIR.fullmatch(p.name))
+
+    def count(self, by: Sequence[str] = ("user", "day"), **filters: Any) -> dict[Key, int]:
+        """Firmas por grupo. Filtros: ``start``/``end`` (fechas), ``user``, ``office``."""
+        totals: Counter[Key] = Counter()
+        for part, index, radices, _values, selected in self._scan(by, None, **filters):
+            decode = self._decoder(part, by, radices)
+            for group, n in (Counter(index) if index is not None else {0: selected}).items():
+                totals[decode(group)] += n
+        return dict(sorted(totals.items()))
+
+    def bytes_signed(self, by: Sequence[str] = ("user",), **filters: Any) -> dict[Key, int]:
+        """Bytes firmados por grupo (sólo registros con tamaño conocido)."""
+        totals: Counter[Key] = Counter()
+        for part, index, radices, values, _selected in self._scan(by, "bytes", **filters):
+            decode = self._decoder(part, by, radices)
+            if index is None:
+                totals[decode(0)] += sum(values)
+                continue
+            sums = _accumulators(radices, int)
+            for group, size in zip(index, values):
+                sums[group] += size
+            for group, size in _nonempty(sums):
+                totals[decode(group)] += size
+        return dict(sorted(totals.items()))
+
+    def latency_percentiles(
+        self,
+        percentiles: Sequence[float] = (50, 90, 99),
+        by: Sequence[str] = (),
+        **filters: Any,
+    ) -> dict[Key, dict[str, float]]:
+        """Percentiles (rango más cercano) de la duración de firma, en ms."""
+        samples: dict[Key, list[float]] = {}
+        for part, index, radices, values, _selected in self._scan(by, "latency_ms", **filters):
+            decode = self._decoder(part, by, radices)
+            if index is None:
+                samples.setdefault(decode(0), []).extend(v for v in values if v == v)
+                continue
+            groups = _accumulators(radices, list)
+            for group, value in zip(index, values):
+                if value == value:  # NaN: duración no registrada
+                    groups[group].append(value)
+            for group, found in _nonempty(groups):
+                samples.setdefault(decode(group), []).extend(found)
+
+        result: dict[Key, dict[str, float]] = {}
+        for key, values in sorted(samples.items()):
+            if not values:
+                continue
+            values.sort()
+            stats: dict[str, float] = {"n": len(values)}
+            for p in percentiles:
+                rank = max(1, math.ceil(p / 100.0 * len(values)))
+                stats[f"p{p:g}"] = round(values[min(rank, len(values)) - 1], 1)
+            result[key] = stats
+        return result
+
+    # ——— internos ———————————————————————————————————————————————————
+    def _scan(
+        self,
+        by: Sequence[str],
+        value_column: str | None,
+        *,
+        start: _dt.date | None = None,
+        end: _dt.date | None = None,
+        user: str | None = None,
+        office: str | None = None,
+    ) -> Iterator[tuple[_Partition, Sequence[int] | None, list[int], Sequence[Any], int]]:
+        """Por partición: índice de grupo por fila, sus bases, valores y filas elegidas.
+
+        Los códigos de las claves se combinan en un único entero por fila
+        (``((c0 * r1) + c1) * r2 + …``): agrupar sobre enteros chicos es
+        mucho más rápido que sobre tuplas. ``None`` = sin claves con columna.
+        """
+        unknown = [key for key in by if key not in GROUP_KEYS]
+        if unknown:
+            raise ValueError(f"Claves de agrupación desconocidas: {', '.join(unknown)}")
+        first = start.strftime("%Y-%m") if start else ""
+        last = end.strftime("%Y-%m") if end else "9999-99"
+
+        for month in self.months():
+            if not first <= month <= last:
+                continue
+            part = _Partition(self.root / month)
+            rows = part.rows()
+            if rows == 0:
+                continue
+            wanted = {name: value for name, value in (("user", user), ("office", office)) if value is not None}
+            if any(value not in part.meta[name] for name, value in wanted.items()):
+                continue  # ese usuario u oficina no firmó en el mes
+
+            selectors: list[bool] | None = None
+
+            def narrow(mask: Iterable[bool]) -> None:
+                nonlocal selectors
+                selectors = list(mask) if selectors is None else list(map(bool.__and__, selectors, mask))
+
+            for name, value in wanted.items():
+                narrow(map(part.meta[name].index(value).__eq__, part.column(name, rows)))
+            lo = start.day if start and month == first else 1
+            hi = end.day if end and month == last else 31
+            if lo > 1 or hi < 31:
+                narrow(lo <= d <= hi for d in part.column("day", rows))
+
+            selected = rows if selectors is None else sum(selectors)
+            if selected == 0:
+                continue
+
+            def load(name: str) -> Sequence[Any]:
+                values = part.column(name, rows)
+                return values if selectors is None else list(compress(values, selectors))
+
+            index: Sequence[int] | None = None
+            radices: list[int] = []
+            for key in by:
+                column = GROUP_KEYS[key]
+                radix = 32 if key == "day" else max(1, len(part.meta[column])) if column else 1
+                radices.append(radix)
+                if column is None:
+                    continue
+                codes = load(column)
+                index = codes if index is None else list(map(add, map(mul, index, repeat(radix)), codes))
+            values = load(value_column) if value_column else ()
+            yield part, index, radices, values, selected
+
+    @staticmethod
+    def _decoder(part: _Partition, by: Sequence[str], radices: Sequence[int]) -> Any:
+        """Índice de grupo → textos de las claves (tablas armadas una vez por mes)."""
+        month = part.month
+        days = [f"{month}-{day:02d}" for day in range(32)]
+        tables = [[month] if key == "month" else days if key == "day" else part.meta[key] for key in by]
+        steps = list(zip(reversed(tables), reversed(radices)))
+
+        def decode(group: int) -> Key:
+            out: list[str] = []
+            for table, radix in steps:
+                group, code = divmod(group, radix)
+                out.append(table[code])
+            out.reverse()
+            return tuple(out)
+
+        return decode
+
+
+def _accumulators(radices: Sequence[int], factory: Any) -> Any:
+    """Una lista indexada por grupo si entra en memoria; si no, un diccionario."""
+    size = math.prod(radices)
+    if size <= _DENSE_GROUPS:
+        return [factory() for _ in range(size)]
+    return defaultdict(factory)
+
+
+def _nonempty(accumulators: Any) -> Iterator[tuple[int, Any]]:
+    items = accumulators.items() if isinstance(accumulators, dict) else enumerate(accumulators)
+    return ((group, value) for group, value in items if value)
+
+
+# ═════════════════════ instancias por carpeta ════════════════════════════════
+_INSTANCES: dict[Path, SigningStats] = {}
+_INSTANCES_LOCK = threading.Lock()
+
+
+def get_signing_stats(root: str | Path) -> SigningStats:
+    """Una instancia por carpeta y proceso (comparten el candado de escritura)."""
+    root = Path(root).resolve()
+    with _INSTANCES_LOCK:
+        stats = _INSTANCES.get(root)
+        if stats is None:
+            stats = _INSTANCES[root] = SigningStats(root)
+        return stats
+
+
+def _forget_after_fork() -> None:
+    global _INSTANCES_LOCK
+    _INSTANCES.clear()
+    _INSTANCES_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_after_fork)
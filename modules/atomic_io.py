@@ -0,0 +1,49 @@
+# coding: utf-8
+# modules/atomic_io.py · WolfSight-PDF
+"""
+Escritura atómica de archivos: o queda el contenido completo o el anterior.
+
+Se escribe en ``<nombre>.<pid>.part`` junto al destino, se fuerza a disco
+(``fsync``) y recién entonces se renombra con ``os.replace``. Sin el
+``fsync`` un corte de luz después del renombre puede dejar el nombre nuevo
+apuntando a un archivo truncado. El PID en el temporal permite que varios
+procesos escriban el mismo destino sin pisarse el temporal.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any
+
+
+def write_atomic(path: str | Path, data: Any) -> None:
+    """Escribe ``data`` (bytes o buffer) en ``path`` sin dejarlo a medias."""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.part")
+    try:
+        with tmp.open("wb") as fp:
+            fp.write(data)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    _fsync_dir(path.parent)
+
+
+def _fsync_dir(folder: Path) -> None:
+    # El renombre vive en la carpeta; en Windows no se puede abrir una carpeta.
+    if os.name != "posix":
+        return
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
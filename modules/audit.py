@@ -0,0 +1,281 @@
+# coding: utf-8
+# modules/audit.py · WolfSight-PDF
+"""
+Auditoría de integridad del almacén de validaciones contra los archivos.
+
+Recorre ``validaciones.json`` en streaming (sin cargar la lista entera),
+ubica cada ``file_name`` bajo las raíces configuradas y vuelve a verificar
+su ``sha256`` en paralelo, leyendo siempre los bytes: la caché de hashes se
+indexa por metadatos del archivo y una auditoría no puede confiar en ellos.
+Cada archivo se lee una sola vez por ejecución: la búsqueda de huérfanos
+reutiliza los hashes de la verificación de registros.
+Informa:
+
+* ``missing``   – el registro no tiene archivo en ninguna raíz;
+* ``modified``  – el archivo existe pero su hash no coincide;
+* ``duplicate`` – registros repetidos (mismo código o mismo hash);
+* ``orphaned``  – PDF firmados bajo las raíces sin registro que los respalde.
+
+Los hallazgos se escriben a un informe JSONL a medida que aparecen y el
+avance se guarda en un checkpoint tras cada tanda, de modo que una
+auditoría de horas puede interrumpirse y retomarse donde quedó.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Final, Iterable, Iterator
+
+from modules.hashing import HashService, get_hash_service
+
+_LOG = logging.getLogger("Audit")
+_READ_CHUNK: Final[int] = 1024 * 1024
+_SIGNATURE_MARK: Final[bytes] = b"/ByteRange"
+
+
+# ═════════════════════ lectura en streaming ══════════════════════════════════
+def iter_records(store_path: str | Path) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Itera ``(índice, registro)`` de un arreglo JSON sin cargarlo entero."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    index = 0
+    started = False
+    with open(store_path, "r", encoding="utf-8") as fp:
+        eof = False
+        while True:
+            pos = 0
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if not started and pos < len(buf):
+                    if buf[pos] != "[":
+                        raise ValueError("La raíz del JSON no es una lista")
+                    started = True
+                    pos += 1
+                    continue
+                if pos < len(buf) and buf[pos] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    break  # registro incompleto: leer más
+                if isinstance(item, dict):
+                    yield index, item
+                index += 1
+                pos = end
+            buf = buf[pos:]
+            if eof:
+                if buf.strip():
+                    raise ValueError("Almacén de validaciones truncado")
+                return
+            chunk = fp.read(_READ_CHUNK)
+            eof = not chunk
+            buf += chunk
+
+
+def _digest_key(value: Any) -> bytes | None:
+    """SHA-256 hexadecimal → 32 bytes (la mitad de memoria en los conjuntos)."""
+    try:
+        return bytes.fromhex(str(value))
+    except ValueError:
+        return None
+
+
+def is_signed_file(path: Path) -> bool:
+    """Detección barata de firma: busca ``/ByteRange`` desde el final."""
+    try:
+        with path.open("rb") as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return view.rfind(_SIGNATURE_MARK) != -1
+    except (OSError, ValueError):
+        return False
+
+
+def index_roots(roots: Iterable[str | Path]) -> dict[str, list[Path]]:
+    """``{nombre de archivo: [rutas]}`` para todos los PDF bajo ``roots``."""
+    found: dict[str, list[Path]] = {}
+    for root in roots:
+        for dirpath, _dirs, files in os.walk(root):
+            for name in files:
+                if name.lower().endswith(".pdf"):
+                    found.setdefault(name, []).append(Path(dirpath) / name)
+    return found
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+@dataclass(slots=True)
+class AuditCheckpoint:
+    store_identity: list[int]
+    phase: str = "records"  # "records" | "orphans" | "done"
+    records_done: int = 0
+    orphans_done: int = 0
+    report_offset: int = 0
+    counts: dict[str, int] = field(default_factory=lambda: {
+        "records": 0, "ok": 0, "missing": 0, "modified": 0, "duplicate": 0, "orphaned": 0,
+    })
+
+
+class AuditJob:
+    """Auditoría reanudable. ``run()`` devuelve los contadores finales."""
+
+    def __init__(
+        self,
+        *,
+        store_path: str | Path,
+        roots: Iterable[str | Path],
+        report_path: str | Path,
+        checkpoint_path: str | Path | None = None,
+        batch_size: int = 256,
+        hash_service: HashService | None = None,
+    ) -> None:
+        self._store = Path(store_path)
+        self._roots = [Path(r) for r in roots]
+        self._report_path = Path(report_path)
+        self._checkpoint_path = Path(checkpoint_path or self._report_path.with_suffix(".checkpoint.json"))
+        self._batch = max(batch_size, 1)
+        self._hashes = hash_service or get_hash_service()
+        self._hashed: dict[Path, bytes | None] = {}  # leídos en esta ejecución
+
+    # ——— API pública ——————————————————————————————————————————————
+    def run(self) -> dict[str, int]:
+        ckpt = self._load_checkpoint()
+        files = index_roots(self._roots)
+        with self._report_path.open("a+b") as report:
+            # Descarta hallazgos escritos después del último checkpoint.
+            report.truncate(ckpt.report_offset)
+            report.seek(ckpt.report_offset)
+            if ckpt.phase == "records":
+                self._audit_records(ckpt, files, report)
+            if ckpt.phase == "orphans":
+                self._audit_orphans(ckpt, files, report)
+        return ckpt.counts
+
+    # ——— fase 1: registros ——————————————————————————————————————————
+    def _audit_records(self, ckpt: AuditCheckpoint, files: dict[str, list[Path]], report: Any) -> None:
+        seen_codes: set[str] = set()
+        seen_hashes: set[bytes] = set()
+        batch: list[dict[str, Any]] = []
+        next_index = ckpt.records_done
+        for index, record in iter_records(self._store):
+            code, digest = str(record.get("code")), _digest_key(record.get("sha256"))
+            if index < ckpt.records_done:
+                # Ya auditado: sólo se reconstruye el estado de duplicados.
+                seen_codes.add(code)
+                if digest is not None:
+                    seen_hashes.add(digest)
+                continue
+            if code in seen_codes:
+                self._emit(report, ckpt, "duplicate", record, detail="código repetido")
+            elif digest is not None and digest in seen_hashes:
+                self._emit(report, ckpt, "duplicate", record, detail="hash repetido")
+            seen_codes.add(code)
+            if digest is not None:
+                seen_hashes.add(digest)
+            batch.append(record)
+            next_index = index + 1
+            if len(batch) >= self._batch:
+                self._verify_batch(ckpt, batch, files, report)
+                ckpt.records_done = next_index
+                self._save_checkpoint(ckpt, report)
+                batch = []
+        if batch:
+            self._verify_batch(ckpt, batch, files, report)
+        ckpt.records_done = next_index
+        ckpt.phase = "orphans"
+        self._save_checkpoint(ckpt, report)
+
+    def _verify_batch(
+        self,
+        ckpt: AuditCheckpoint,
+        batch: list[dict[str, Any]],
+        files: dict[str, list[Path]],
+        report: Any,
+    ) -> None:
+        candidates = {p for rec in batch for p in files.get(str(rec.get("file_name")), [])}
+        digests = self._hashes.sha256_many(candidates, fresh=True)
+        self._hashed.update((path, _digest_key(digest)) for path, digest in digests.items())
+        for record in batch:
+            ckpt.counts["records"] += 1
+            paths = files.get(str(record.get("file_name")), [])
+            if not paths:
+                self._emit(report, ckpt, "missing", record)
+                continue
+            actual = [digests.get(p) for p in paths]
+            if record.get("sha256") in actual:
+                ckpt.counts["ok"] += 1
+            else:
+                self._emit(report, ckpt, "modified", record, paths=paths, actual=actual)
+
+    # ——— fase 2: huérfanos ——————————————————————————————————————————
+    def _audit_orphans(self, ckpt: AuditCheckpoint, files: dict[str, list[Path]], report: Any) -> None:
+        known = {_digest_key(rec.get("sha256")) for _i, rec in iter_records(self._store)}
+        all_files = sorted(p for paths in files.values() for p in paths)
+        for start in range(ckpt.orphans_done, len(all_files), self._batch):
+            chunk = [p for p in all_files[start:start + self._batch] if is_signed_file(p)]
+            # Sólo se leen los que la fase 1 no hasheó (o si se retomó en esta fase).
+            pending = [p for p in chunk if p not in self._hashed]
+            digests = {p: _digest_key(d) for p, d in self._hashes.sha256_many(pending, fresh=True).items()}
+            for path in chunk:
+                digest = self._hashed.pop(path) if path in self._hashed else digests.get(path)
+                if digest is not None and digest not in known:
+                    self._emit(report, ckpt, "orphaned", {"file_name": path.name, "sha256": None},
+                               paths=[path], actual=[digest.hex()])
+            ckpt.orphans_done = min(start + self._batch, len(all_files))
+            self._save_checkpoint(ckpt, report)
+        ckpt.phase = "done"
+        self._save_checkpoint(ckpt, report)
+
+    # ——— informe y checkpoint ————————————————————————————————————————
+    @staticmethod
+    def _emit(
+        report: Any,
+        ckpt: AuditCheckpoint,
+        kind: str,
+        record: dict[str, Any],
+        *,
+        paths: list[Path] | None = None,
+        actual: list[str | None] | None = None,
+        detail: str = "",
+    ) -> None:
+        ckpt.counts[kind] += 1
+        finding = {
+            "kind": kind,
+            "code": record.get("code"),
+            "file_name": record.get("file_name"),
+            "expected_sha256": record.get("sha256"),
+            "paths": [str(p) for p in paths or []],
+            "actual_sha256": actual or [],
+            "detail": detail,
+        }
+        report.write((json.dumps(finding, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def _identity(self) -> list[int]:
+        st = self._store.stat()
+        return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def _load_checkpoint(self) -> AuditCheckpoint:
+        identity = self._identity()
+        if self._checkpoint_path.exists():
+            try:
+                ckpt = AuditCheckpoint(**json.loads(self._checkpoint_path.read_text("utf-8")))
+                if ckpt.store_identity == identity and ckpt.phase != "done":
+                    _LOG.info("Retomando auditoría: %d registros ya verificados.", ckpt.records_done)
+                    return ckpt
+            except (json.JSONDecodeError, TypeError) as exc:
+                _LOG.warning("Checkpoint ilegible, se empieza de cero: %s", exc)
+        return AuditCheckpoint(store_identity=identity)
+
+    def _save_checkpoint(self, ckpt: AuditCheckpoint, report: Any) -> None:
+        report.flush()
+        os.fsync(report.fileno())
+        ckpt.report_offset = report.tell()
+        tmp = self._checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(ckpt), indent=2), encoding="utf-8")
+        os.replace(tmp, self._checkpoint_path)
@@ -0,0 +1,120 @@
+# coding: utf-8
+# modules/config.py · WolfSight-PDF
+"""
+Parámetros de configuración compartidos.
+
+Cada valor puede sobreescribirse con una variable de entorno ``WOLFSIGHT_*``
+para ajustar la aplicación en cada puesto sin tocar el código.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Final
+
+_MIB: Final[int] = 1024 * 1024
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def _env_path(name: str, default: Path) -> Path:
+    raw = os.environ.get(name)
+    return Path(raw) if raw else default
+
+
+def _env_str(name: str, default: str) -> str:
+    raw = os.environ.get(name)
+    return raw.strip() if raw else default
+
+
+# ─── Caché local ──────────────────────────────────────────────────────────
+CACHE_DIR: Final[Path] = _env_path("WOLFSIGHT_CACHE_DIR", Path.home() / ".wolfsight" / "cache")
+
+# ─── Precarga de la lista de trabajo ──────────────────────────────────────
+PREFETCH_DEPTH: Final[int] = _env_int("WOLFSIGHT_PREFETCH_DEPTH", 2)
+PREFETCH_MEMORY_BUDGET: Final[int] = _env_int("WOLFSIGHT_PREFETCH_MEMORY_MB", 128) * _MIB
+PREFETCH_DISK_BUDGET: Final[int] = _env_int("WOLFSIGHT_PREFETCH_DISK_MB", 2048) * _MIB
+
+# ─── Historial de versiones ───────────────────────────────────────────────
+VERSIONS_DIR: Final[Path] = _env_path("WOLFSIGHT_VERSIONS_DIR", Path.home() / ".wolfsight" / "versiones")
+
+# ─── Caché de render y memoria ────────────────────────────────────────────
+RENDER_CACHE_BUDGET: Final[int] = _env_int("WOLFSIGHT_RENDER_CACHE_MB", 256) * _MIB
+# Con RSS (proceso + hijos de QtWebEngine) por encima de este valor se reduce
+# la caché (0 = sin límite).
+MEMORY_SOFT_LIMIT: Final[int] = _env_int("WOLFSIGHT_MEMORY_SOFT_LIMIT_MB", 1536) * _MIB
+DEBUG_OVERLAY: Final[bool] = _env_int("WOLFSIGHT_DEBUG_OVERLAY", 0) == 1
+
+# ─── Pestañas de expedientes ──────────────────────────────────────────────
+MAX_LIVE_TABS: Final[int] = _env_int("WOLFSIGHT_MAX_LIVE_TABS", 3)
+TAB_IDLE_SECONDS: Final[int] = _env_int("WOLFSIGHT_TAB_IDLE_SECONDS", 120)
+
+# ─── Sesiones de documento ────────────────────────────────────────────────
+DOCUMENT_SESSIONS: Final[int] = _env_int("WOLFSIGHT_DOCUMENT_SESSIONS", 8)
+
+# ─── Sello de validación ──────────────────────────────────────────────────
+# QR y código en todas las páginas (1) o sólo en la primera (0).
+STAMP_ALL_PAGES: Final[bool] = _env_int("WOLFSIGHT_STAMP_ALL_PAGES", 1) == 1
+
+# ─── Firma de largo plazo (PAdES) ─────────────────────────────────────────
+# B-B (sólo firma), B-T (+ sello de tiempo), B-LT (+ revocación embebida)
+# o B-LTA (+ sello de tiempo de archivo).
+PADES_LEVEL: Final[str] = _env_str("WOLFSIGHT_PADES_LEVEL", "B-B").upper()
+# Servidores de sellos de tiempo separados por comas; se prueban en orden.
+TSA_URLS: Final[tuple[str, ...]] = tuple(
+    url.strip() for url in _env_str("WOLFSIGHT_TSA_URLS", "").split(",") if url.strip()
+)
+# Certificados raíz (PEM o DER) para armar la cadena del firmante.
+TRUST_ROOTS_DIR: Final[Path] = _env_path("WOLFSIGHT_TRUST_ROOTS", Path.home() / ".wolfsight" / "raices")
+REVOCATION_CACHE_DIR: Final[Path] = _env_path("WOLFSIGHT_REVOCATION_CACHE_DIR", CACHE_DIR / "revocacion")
+# Vigencia (segundos) de respuestas OCSP/CRL que no declaran nextUpdate.
+REVOCATION_MAX_AGE: Final[int] = _env_int("WOLFSIGHT_REVOCATION_MAX_AGE", 3600)
+NETWORK_TIMEOUT: Final[int] = _env_int("WOLFSIGHT_NETWORK_TIMEOUT", 10)
+
+# ─── Firma con token (PKCS#11) ────────────────────────────────────────────
+# Módulo del fabricante (.so/.dll); vacío = firmar sólo con .pfx.
+PKCS11_LIB: Final[str] = _env_str("WOLFSIGHT_PKCS11_LIB", "")
+PKCS11_SLOT: Final[int] = _env_int("WOLFSIGHT_PKCS11_SLOT", -1)           # -1 = por etiqueta
+PKCS11_TOKEN_LABEL: Final[str] = _env_str("WOLFSIGHT_PKCS11_TOKEN", "")
+PKCS11_KEY_LABEL: Final[str] = _env_str("WOLFSIGHT_PKCS11_KEY_LABEL", "")
+PKCS11_CERT_LABEL: Final[str] = _env_str("WOLFSIGHT_PKCS11_CERT_LABEL", "")
+PKCS11_KEY_ID: Final[str] = _env_str("WOLFSIGHT_PKCS11_KEY_ID", "")      # hexadecimal
+# Sesiones autenticadas que cada proceso mantiene abiertas.
+PKCS11_SESSIONS: Final[int] = _env_int("WOLFSIGHT_PKCS11_SESSIONS", 4)
+
+# ─── Control previo de anexos ─────────────────────────────────────────────
+# Umbrales de advertencia (no impiden anexar) y procesos (0 = uno por CPU).
+PREFLIGHT_MIN_DPI: Final[int] = _env_int("WOLFSIGHT_PREFLIGHT_MIN_DPI", 150)
+PREFLIGHT_MAX_DPI: Final[int] = _env_int("WOLFSIGHT_PREFLIGHT_MAX_DPI", 600)
+PREFLIGHT_MAX_MB: Final[int] = _env_int("WOLFSIGHT_PREFLIGHT_MAX_MB", 50)
+PREFLIGHT_WORKERS: Final[int] = _env_int("WOLFSIGHT_PREFLIGHT_WORKERS", 0)
+# Vistas previas de anexos combinados que se conservan en caché.
+ANNEX_PREVIEWS_KEPT: Final[int] = _env_int("WOLFSIGHT_ANNEX_PREVIEWS", 8)
+
+# ─── Estadísticas de firma ───────────────────────────────────────────────
+ANALYTICS_ENABLED: Final[bool] = _env_int("WOLFSIGHT_ANALYTICS", 1) == 1
+# Vacío = carpeta «<almacén>-estadisticas» junto a validaciones.json.
+ANALYTICS_DIR: Final[str] = _env_str("WOLFSIGHT_ANALYTICS_DIR", "")
+OFFICE: Final[str] = _env_str("WOLFSIGHT_OFFICE", "")
+
+# ─── Instancia única ──────────────────────────────────────────────────────
+# Un segundo arranque entrega sus archivos a la ventana abierta y termina.
+SINGLE_INSTANCE: Final[bool] = _env_int("WOLFSIGHT_SINGLE_INSTANCE", 1) == 1
+INSTANCE_NAME: Final[str] = _env_str("WOLFSIGHT_INSTANCE_NAME", "WolfSight-PDF")
+INSTANCE_TIMEOUT_MS: Final[int] = _env_int("WOLFSIGHT_INSTANCE_TIMEOUT_MS", 1000)
+
+# ─── Monitor de respuesta de la interfaz ──────────────────────────────────
+RESPONSIVENESS_ENABLED: Final[bool] = _env_int("WOLFSIGHT_RESPONSIVENESS", 0) == 1
+RESPONSIVENESS_STALL_MS: Final[int] = _env_int("WOLFSIGHT_RESPONSIVENESS_STALL_MS", 200)
+RESPONSIVENESS_LOG: Final[Path] = _env_path(
+    "WOLFSIGHT_RESPONSIVENESS_LOG", Path.home() / ".wolfsight" / "responsiveness.jsonl"
+)
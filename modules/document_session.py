@@ -0,0 +1,270 @@
+# coding: utf-8
+# modules/document_session.py · WolfSight-PDF
+"""
+Sesión de documento compartida: un expediente se parsea una sola vez.
+
+``DocumentSession`` mapea el archivo en memoria (``mmap``) y construye de
+forma perezosa, una única vez, cada vista que piden los distintos módulos:
+
+* ``reader``  – ``PyPDF2.PdfReader`` (xref + trailer; páginas cacheadas);
+* ``hanko_reader`` – ``pyhanko`` ``PdfFileReader`` para validar firmas;
+* ``fitz_document`` – documento PyMuPDF para rasterizar;
+* ``stream()`` – flujo de sólo lectura sobre el mapa, con posición propia,
+  para ``IncrementalPdfFileWriter`` y cualquier otro lector.
+
+``get_session(path)`` devuelve la sesión cacheada mientras el archivo no
+cambie de identidad ``(dispositivo, inodo, tamaño, mtime)``; si cambió, la
+sesión vieja se retira y se abre una nueva. Antes de sobrescribir un archivo
+con una sesión abierta hay que llamar a ``release(path)`` (en Windows un
+archivo mapeado no se puede reemplazar).
+
+Quien usa la sesión más allá de una consulta puntual (un hilo que imprime o
+rasteriza, un ``IncrementalPdfFileWriter`` sobre ``stream()``) la retiene con
+``with hold(path) as session:``. Una sesión retenida que el registro desaloja
+(LRU, archivo cambiado, ``release``) se retira pero recién se cierra cuando
+la suelta el último que la usa.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import mmap
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Final, Iterator
+
+from PyPDF2 import PageObject, PdfReader
+
+from modules import config, pdf_render
+
+_LOG = logging.getLogger("DocumentSession")
+_EMPTY: Final[bytes] = b""
+_STREAM_BUFFER: Final[int] = 64 * 1024
+
+
+class MappedStream(io.RawIOBase):
+    """Flujo binario de sólo lectura sobre un ``memoryview``, sin copiarlo."""
+
+    def __init__(self, view: memoryview) -> None:
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+
+    def readinto(self, buffer: Any) -> int:
+        n = min(len(buffer), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
+def _identity(path: Path) -> tuple[int, int, int, int]:
+    st = path.stat()
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class DocumentSession:
+    """Un PDF abierto una vez y compartido por visor, firma y anexado."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path).resolve()
+        self._lock = threading.RLock()
+        self._file = self.path.open("rb")
+        self.identity = _identity(self.path)
+        size = self.identity[2]
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._map) if self._map is not None else memoryview(_EMPTY)
+        self._reader: PdfReader | None = None
+        self._hanko: Any = None
+        self._fitz: Any = None
+        self._pages: dict[int, PageObject] = {}
+        self._page_count: int | None = None
+        self._holders = 0
+        self._retired = False
+        self.closed = False
+
+    # ——— vistas perezosas ——————————————————————————————————————————
+    def stream(self) -> io.BufferedReader:
+        """Flujo nuevo (posición independiente) sobre los bytes del archivo.
+
+        Los parsers leen de a un byte; el ``BufferedReader`` (en C) atiende
+        esas lecturas sin pasar por Python en cada una.
+        """
+        return io.BufferedReader(MappedStream(self._view), buffer_size=_STREAM_BUFFER)
+
+    @property
+    def size(self) -> int:
+        return len(self._view)
+
+    @property
+    def reader(self) -> PdfReader:
+        with self._lock:
+            if self._reader is None:
+                self._reader = PdfReader(self.stream(), strict=False)
+            return self._reader
+
+    @property
+    def hanko_reader(self) -> Any:
+        from pyhanko.pdf_utils.reader import PdfFileReader
+
+        with self._lock:
+            if self._hanko is None:
+                self._hanko = PdfFileReader(self.stream())
+            return self._hanko
+
+    @property
+    def fitz_document(self) -> Any:
+        """Documento PyMuPDF; usarlo siempre bajo ``pdf_render.FITZ_LOCK``."""
+        with self._lock:
+            if self._fitz is None:
+                with pdf_render.FITZ_LOCK:
+                    self._fitz = pdf_render.open_document(self.path)
+            return self._fitz
+
+    @property
+    def page_count(self) -> int:
+        with self._lock:
+            if self._page_count is None:
+                self._page_count = len(self.reader.pages)
+            return self._page_count
+
+    def page(self, index: int) -> PageObject:
+        """Página cacheada. No modificarla: es compartida (clonar antes)."""
+        with self._lock:
+            page = self._pages.get(index)
+            if page is None:
+                page = self._pages[index] = self.reader.pages[index]
+            return page
+
+    # ——— retención ————————————————————————————————————————————————
+    def acquire(self) -> "DocumentSession":
+        """Impide que la sesión se cierre hasta el ``release()`` correspondiente."""
+        with self._lock:
+            if self.closed:
+                raise ValueError(f"La sesión de {self.path} ya está cerrada.")
+            self._holders += 1
+            return self
+
+    def release(self) -> None:
+        with self._lock:
+            self._holders -= 1
+            if self._holders > 0 or not self._retired:
+                return
+        self.close()
+
+    def retire(self) -> None:
+        """La saca de circulación: se cierra ya o al soltarla el último que la usa."""
+        with self._lock:
+            self._retired = True
+            if self._holders > 0:
+                return
+        self.close()
+
+    # ——— vigencia ——————————————————————————————————————————————————
+    def is_stale(self) -> bool:
+        try:
+            return _identity(self.path) != self.identity
+        except OSError:
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._reader = self._hanko = None
+            self._pages.clear()
+            if self._fitz is not None:
+                with pdf_render.FITZ_LOCK:
+                    self._fitz.close()
+                self._fitz = None
+            try:
+                self._view.release()
+                if self._map is not None:
+                    self._map.close()
+            except BufferError:
+                # Algún lector aún referencia el mapa; se libera al recolectarse.
+                _LOG.debug("Mapa de %s todavía en uso", self.path)
+            self._file.close()
+
+
+# ═════════════════════ registro de sesiones ══════════════════════════════════
+_SESSIONS: OrderedDict[Path, DocumentSession] = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _lookup(key: Path) -> DocumentSession:
+    """Sesión vigente de ``key``; llamar con ``_SESSIONS_LOCK`` tomado."""
+    session = _SESSIONS.get(key)
+    if session is not None and not session.is_stale():
+        _SESSIONS.move_to_end(key)
+        return session
+    if session is not None:
+        _SESSIONS.pop(key)
+        session.retire()
+    session = _SESSIONS[key] = DocumentSession(key)
+    while len(_SESSIONS) > max(config.DOCUMENT_SESSIONS, 1):
+        _path, oldest = _SESSIONS.popitem(last=False)
+        oldest.retire()
+    return session
+
+
+def get_session(path: str | Path) -> DocumentSession:
+    """Sesión vigente de ``path``; se reabre si el archivo cambió en disco.
+
+    Sin retenerla, puede cerrarse en cuanto otro documento la desaloje: para
+    usos prolongados, ``hold``.
+    """
+    with _SESSIONS_LOCK:
+        return _lookup(Path(path).resolve())
+
+
+def acquire(path: str | Path) -> DocumentSession:
+    """Sesión vigente de ``path`` ya retenida (soltarla con ``release()``)."""
+    with _SESSIONS_LOCK:
+        return _lookup(Path(path).resolve()).acquire()
+
+
+@contextmanager
+def hold(path: str | Path) -> Iterator[DocumentSession]:
+    """Sesión de ``path`` que no se cierra mientras dure el bloque."""
+    session = acquire(path)
+    try:
+        yield session
+    finally:
+        session.release()
+
+
+def release(path: str | Path) -> None:
+    """Retira la sesión de ``path`` (antes de sobrescribir o borrar el archivo)."""
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.pop(Path(path).resolve(), None)
+    if session is not None:
+        session.retire()
+
+
+def release_all() -> None:
+    with _SESSIONS_LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+    for session in sessions:
+        session.retire()
@@ -0,0 +1,183 @@
+# coding: utf-8
+# modules/hashing.py · WolfSight-PDF
+"""
+Servicio compartido de SHA-256 con caché persistente.
+
+* Los archivos se leen con ``mmap`` (o con lecturas grandes si no se puede
+  mapear) y ``hashlib`` libera el GIL al procesar cada bloque, así que
+  ``sha256_many`` reparte el trabajo entre hilos de verdad.
+* El resultado se guarda en SQLite con clave
+  ``(dispositivo, inodo, tamaño, mtime_ns)``: un archivo que no cambió no
+  se vuelve a leer nunca, ni en esta ejecución ni en las siguientes.
+
+Lo usan la firma, la precarga, la exportación, el historial de versiones y
+la auditoría del almacén de validaciones.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Final, Iterable
+
+from modules import config
+
+_LOG = logging.getLogger("HashService")
+_BLOCK: Final[int] = 16 * 1024 * 1024
+
+
+class HashCancelled(Exception):
+    """Se canceló el cálculo de un hash."""
+
+
+def _file_key(st: os.stat_result) -> tuple[int, int, int, int]:
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def compute_sha256(path: str | Path, cancel: threading.Event | None = None) -> str:
+    """Calcula el SHA-256 sin caché."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        try:
+            view = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        except (OSError, ValueError):
+            view = None  # p. ej. algunos sistemas de archivos de red
+        if view is not None:
+            with view, memoryview(view) as mv:
+                for offset in range(0, size, _BLOCK):
+                    if cancel is not None and cancel.is_set():
+                        raise HashCancelled()
+                    digest.update(mv[offset:offset + _BLOCK])
+        else:
+            buf = bytearray(_BLOCK)
+            with memoryview(buf) as mv:
+                while n := fp.readinto(buf):
+                    if cancel is not None and cancel.is_set():
+                        raise HashCancelled()
+                    digest.update(mv[:n])
+    return digest.hexdigest()
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class HashService:
+    """Hashes de archivos con caché por identidad de archivo."""
+
+    def __init__(self, cache_path: str | Path | None = None, workers: int | None = None) -> None:
+        self._cache_path = Path(cache_path or config.CACHE_DIR / "hashes.sqlite3")
+        self._workers = workers or min(8, os.cpu_count() or 2)
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+    # ——— API pública ——————————————————————————————————————————————
+    def sha256(self, path: str | Path, cancel: threading.Event | None = None, *, fresh: bool = False) -> str:
+        """Hash de ``path``; con ``fresh`` siempre se leen los bytes (y se corrige la caché)."""
+        path = Path(path)
+        key = _file_key(path.stat())
+        cached = None if fresh else self._lookup(key)
+        if cached is not None:
+            return cached
+        digest = compute_sha256(path, cancel)
+        # Si el archivo cambió mientras se leía, el resultado no se cachea.
+        if _file_key(path.stat()) == key:
+            self._store(key, path, digest)
+        return digest
+
+    def remember(self, path: str | Path, digest: str) -> None:
+        """Registra el hash de un archivo recién escrito por quien ya lo calculó."""
+        path = Path(path)
+        self._store(_file_key(path.stat()), path, digest)
+
+    def sha256_many(self, paths: Iterable[str | Path], *, fresh: bool = False) -> dict[Path, str | None]:
+        """Hashea en paralelo; los archivos ilegibles quedan con ``None``.
+
+        ``fresh`` ignora la caché: una edición que conserva tamaño y
+        ``mtime`` (``touch -r``) tiene la misma clave que el original.
+        """
+        items = [Path(p) for p in paths]
+
+        def one(path: Path) -> str | None:
+            try:
+                return self.sha256(path, fresh=fresh)
+            except OSError as exc:
+                _LOG.warning("No se pudo leer %s: %s", path, exc)
+                return None
+
+        with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="hash") as pool:
+            return dict(zip(items, pool.map(one, items)))
+
+    def duplicates(self, paths: Iterable[str | Path]) -> dict[str, list[Path]]:
+        """Agrupa por contenido; sólo devuelve los grupos con más de un archivo."""
+        groups: dict[str, list[Path]] = {}
+        for path, digest in self.sha256_many(paths).items():
+            if digest is not None:
+                groups.setdefault(digest, []).append(path)
+        return {digest: group for digest, group in groups.items() if len(group) > 1}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ——— caché persistente —————————————————————————————————————————
+    def _conn(self) -> sqlite3.Connection | None:
+        if self._db is None:
+            try:
+                self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(self._cache_path, check_same_thread=False, timeout=10)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS hashes ("
+                    " dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,"
+                    " path TEXT, sha256 TEXT NOT NULL,"
+                    " PRIMARY KEY (dev, ino, size, mtime_ns))"
+                )
+                self._db = db
+            except sqlite3.Error as exc:
+                _LOG.warning("Caché de hashes no disponible (%s); se calculará siempre.", exc)
+                return None
+        return self._db
+
+    def _lookup(self, key: tuple[int, int, int, int]) -> str | None:
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT sha256 FROM hashes WHERE dev=? AND ino=? AND size=? AND mtime_ns=?", key
+            ).fetchone()
+        return row[0] if row else None
+
+    def _store(self, key: tuple[int, int, int, int], path: Path, digest: str) -> None:
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                with db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                        (*key, str(path), digest),
+                    )
+            except sqlite3.Error as exc:
+                _LOG.warning("No se pudo guardar el hash de %s: %s", path, exc)
+
+
+_DEFAULT: HashService | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_hash_service() -> HashService:
+    """Instancia compartida por todo el proceso."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = HashService()
+        return _DEFAULT
@@ -0,0 +1,441 @@
+# coding: utf-8
+# modules/ltv.py · WolfSight-PDF
+"""
+Validación de largo plazo (PAdES B-T, B-LT y B-LTA).
+
+Agregar revocación a cada firma significa consultar OCSP/CRL por cada
+certificado de la cadena; en un lote de mil expedientes firmados con el
+mismo certificado serían mil consultas idénticas. Este módulo las comparte:
+
+* ``RevocationCache`` guarda respuestas OCSP y CRL en memoria y en
+  ``CACHE_DIR/revocacion`` con clave emisor + número de serie. Una entrada
+  vale hasta su ``nextUpdate`` (o ``REVOCATION_MAX_AGE`` si no lo declara),
+  así que sirve para todo el lote, para los demás procesos y para las
+  ejecuciones siguientes.
+* Los *fetchers* de pyhanko-certvalidator se envuelven para consultar
+  primero la caché, y todas las conexiones (OCSP, CRL, AIA y TSA) salen de
+  una única ``requests.Session`` con keep-alive.
+* ``get_ltv_service()`` da la instancia compartida del proceso: contextos
+  de validación, cliente de sellos de tiempo y ``add_ltv`` para extender
+  documentos ya firmados.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime as _dt
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Final, Iterable, Sequence
+
+import requests
+from asn1crypto import crl, ocsp, tsp, x509
+from pyhanko.keys import load_certs_from_pemder
+from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
+from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.sign import signers
+from pyhanko.sign.timestamps import HTTPTimeStamper
+from pyhanko.sign.timestamps.common_utils import TimestampRequestError
+from pyhanko.sign.validation import add_validation_info
+from pyhanko_certvalidator import ValidationContext
+from pyhanko_certvalidator.fetchers.api import CRLFetcher, Fetchers, OCSPFetcher
+from pyhanko_certvalidator.fetchers.requests_fetchers.cert_fetch_client import RequestsCertificateFetcher
+from pyhanko_certvalidator.fetchers.requests_fetchers.crl_client import RequestsCRLFetcher
+from pyhanko_certvalidator.fetchers.requests_fetchers.ocsp_client import RequestsOCSPFetcher
+from pyhanko_certvalidator.util import issuer_serial
+
+from modules import config
+from modules.atomic_io import write_atomic
+from modules.document_session import hold, release
+from modules.hashing import get_hash_service
+
+_LOG = logging.getLogger("LTV")
+LEVELS: Final[tuple[str, ...]] = ("B-B", "B-T", "B-LT", "B-LTA")
+_USER_AGENT: Final[str] = "WolfSight-PDF"
+_POOL_SIZE: Final[int] = 8
+_ROOT_SUFFIXES: Final[frozenset[str]] = frozenset({".pem", ".crt", ".cer", ".der"})
+
+
+def check_level(level: str | None) -> str:
+    """Normaliza el nivel PAdES (por defecto ``config.PADES_LEVEL``)."""
+    value = (level or config.PADES_LEVEL).upper()
+    if value not in LEVELS:
+        raise ValueError(f"Nivel PAdES desconocido: {value!r} (válidos: {', '.join(LEVELS)}).")
+    return value
+
+
+# ═════════════════════ caché de revocación ═══════════════════════════════════
+@dataclass(slots=True)
+class _Entry:
+    expires: _dt.datetime
+    items: list[Any]
+
+
+def _now() -> _dt.datetime:
+    return _dt.datetime.now(_dt.timezone.utc)
+
+
+def _ocsp_expiry(response: ocsp.OCSPResponse, max_age: _dt.timedelta) -> _dt.datetime | None:
+    if response["response_status"].native != "successful":
+        return None
+    data = response["response_bytes"]["response"].parsed["tbs_response_data"]
+    expiries = []
+    for single in data["responses"]:
+        next_update = single["next_update"].native
+        expiries.append(next_update or single["this_update"].native + max_age)
+    return min(expiries) if expiries else None
+
+
+def _crl_expiry(crls: Sequence[crl.CertificateList], max_age: _dt.timedelta) -> _dt.datetime | None:
+    expiries = []
+    for item in crls:
+        tbs = item["tbs_cert_list"]
+        expiries.append(tbs["next_update"].native or tbs["this_update"].native + max_age)
+    return min(expiries) if expiries else None
+
+
+class RevocationCache:
+    """Respuestas OCSP y CRL por certificado (emisor + serie), vigentes hasta ``nextUpdate``."""
+
+    def __init__(self, directory: str | Path | None = None, *, max_age: int | None = None) -> None:
+        self._dir = Path(directory or config.REVOCATION_CACHE_DIR)
+        self._max_age = _dt.timedelta(seconds=config.REVOCATION_MAX_AGE if max_age is None else max_age)
+        self._memory: dict[tuple[str, str], _Entry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+
+    @staticmethod
+    def key(cert: Any) -> str:
+        return hashlib.sha256(issuer_serial(cert)).hexdigest()
+
+    # ——— OCSP ———
+    def ocsp_for(self, cert: Any) -> list[ocsp.OCSPResponse]:
+        return self._get("ocsp", self.key(cert), lambda ders: [ocsp.OCSPResponse.load(d) for d in ders])
+
+    def store_ocsp(self, cert: Any, response: ocsp.OCSPResponse) -> None:
+        expires = _ocsp_expiry(response, self._max_age)
+        if expires is not None:
+            self._put("ocsp", self.key(cert), expires, [response])
+
+    # ——— CRL ———
+    def crls_for(self, cert: Any) -> list[crl.CertificateList]:
+        return self._get("crl", self.key(cert), lambda ders: [crl.CertificateList.load(d) for d in ders])
+
+    def store_crls(self, cert: Any, crls: Sequence[crl.CertificateList]) -> None:
+        expires = _crl_expiry(crls, self._max_age)
+        if expires is not None:
+            self._put("crl", self.key(cert), expires, list(crls))
+
+    # ——— internos ———
+    def _get(self, kind: str, key: str, load: Any) -> list[Any]:
+        now = _now()
+        with self._lock:
+            entry = self._memory.get((kind, key))
+        if entry is None:
+            entry = self._read(kind, key, load)
+            if entry is not None:
+                with self._lock:
+                    self._memory[(kind, key)] = entry
+        if entry is None or entry.expires <= now:
+            return []
+        with self._lock:
+            self.hits += 1
+        return entry.items
+
+    def _put(self, kind: str, key: str, expires: _dt.datetime, items: list[Any]) -> None:
+        with self._lock:
+            self._memory[(kind, key)] = _Entry(expires, items)
+            self.fetches += 1
+        folder = self._dir / kind
+        try:
+            folder.mkdir(parents=True, exist_ok=True)
+            for stale in folder.glob(f"{key}.*.der"):
+                stale.unlink(missing_ok=True)
+            stamp = expires.strftime("%Y%m%dT%H%M%SZ")
+            for index, item in enumerate(items):
+                write_atomic(folder / f"{key}.{stamp}.{index}.der", item.dump())
+        except OSError as exc:
+            _LOG.warning("No se pudo guardar la revocación en caché (%s): %s", kind, exc)
+
+    def _read(self, kind: str, key: str, load: Any) -> _Entry | None:
+        # Archivos «<clave>.<vencimiento>.<n>.der»: el vencimiento va en el
+        # nombre para descartar entradas viejas sin abrirlas. Si otro proceso
+        # dejó más de una generación, vale la que vence más tarde.
+        files = sorted((self._dir / kind).glob(f"{key}.*.der"))
+        if not files:
+            return None
+        try:
+            stamp = max(f.name.split(".")[1] for f in files)
+            expires = _dt.datetime.strptime(stamp, "%Y%m%dT%H%M%SZ").replace(tzinfo=_dt.timezone.utc)
+            if expires <= _now():
+                return None
+            return _Entry(expires, load([f.read_bytes() for f in files if f.name.split(".")[1] == stamp]))
+        except (OSError, ValueError, IndexError) as exc:
+            _LOG.debug("Entrada de revocación ilegible %s: %s", files[0], exc)
+            return None
+
+
+# ═════════════════════ clientes HTTP ═════════════════════════════════════════
+class _SessionMixin:
+    """Reemplaza ``requests.get/post`` de los fetchers por una sesión compartida."""
+
+    session: requests.Session
+    per_request_timeout: int
+    user_agent: str
+
+    def _get(self, url: str, *, acceptable_content_types: Iterable[str]) -> Any:
+        return asyncio.to_thread(self._request, "GET", url, None, {"Accept": ",".join(acceptable_content_types)})
+
+    def _post(self, url: str, data: bytes, *, content_type: str, acceptable_content_types: Iterable[str]) -> Any:
+        headers = {"Accept": ",".join(acceptable_content_types), "Content-Type": content_type}
+        return asyncio.to_thread(self._request, "POST", url, data, headers)
+
+    def _request(self, method: str, url: str, data: bytes | None, headers: dict[str, str]) -> requests.Response:
+        response = self.session.request(
+            method, url, data=data, headers={"User-Agent": self.user_agent, **headers},
+            timeout=self.per_request_timeout,
+        )
+        if response.status_code != 200:
+            raise requests.RequestException(f"status code {response.status_code}")
+        return response
+
+
+class _SessionOCSPFetcher(_SessionMixin, RequestsOCSPFetcher):
+    def __init__(self, session: requests.Session, timeout: int) -> None:
+        super().__init__(user_agent=_USER_AGENT, per_request_timeout=timeout)
+        self.session = session
+
+
+class _SessionCRLFetcher(_SessionMixin, RequestsCRLFetcher):
+    def __init__(self, session: requests.Session, timeout: int) -> None:
+        super().__init__(user_agent=_USER_AGENT, per_request_timeout=timeout)
+        self.session = session
+
+
+class _SessionCertificateFetcher(_SessionMixin, RequestsCertificateFetcher):
+    def __init__(self, session: requests.Session, timeout: int) -> None:
+        super().__init__(user_agent=_USER_AGENT, per_request_timeout=timeout)
+        self.session = session
+
+
+class CachingOCSPFetcher(OCSPFetcher):
+    """Consulta ``RevocationCache`` antes de ir a la red.
+
+    Se crea uno por contexto de validación (por documento): ``inner`` y la
+    caché son compartidos, pero ``fetched_responses`` sólo devuelve lo que
+    usó este documento, que es lo que pyhanko embebe en su DSS.
+    """
+
+    def __init__(self, inner: OCSPFetcher, cache: RevocationCache) -> None:
+        self._inner = inner
+        self._cache = cache
+        self._served: dict[str, list[ocsp.OCSPResponse]] = {}
+
+    async def fetch(self, cert: Any, authority: Any) -> ocsp.OCSPResponse:
+        cached = self._cache.ocsp_for(cert)
+        if not cached:
+            response = await self._inner.fetch(cert, authority)
+            self._cache.store_ocsp(cert, response)
+            cached = [response]
+        self._served[self._cache.key(cert)] = cached
+        return cached[0]
+
+    def fetched_responses(self) -> Iterable[ocsp.OCSPResponse]:
+        return [resp for responses in self._served.values() for resp in responses]
+
+    def fetched_responses_for_cert(self, cert: Any) -> Iterable[ocsp.OCSPResponse]:
+        responses = self._cache.ocsp_for(cert) or list(self._inner.fetched_responses_for_cert(cert))
+        if responses:
+            self._served[self._cache.key(cert)] = responses
+        return responses
+
+
+class CachingCRLFetcher(CRLFetcher):
+    """Como ``CachingOCSPFetcher``, para listas de revocación."""
+
+    def __init__(self, inner: CRLFetcher, cache: RevocationCache) -> None:
+        self._inner = inner
+        self._cache = cache
+        self._served: dict[str, list[crl.CertificateList]] = {}
+
+    async def fetch(self, cert: Any, *, use_deltas: bool = True) -> Iterable[crl.CertificateList]:
+        crls = self._cache.crls_for(cert)
+        if not crls:
+            crls = list(await self._inner.fetch(cert, use_deltas=use_deltas))
+            self._cache.store_crls(cert, crls)
+        self._served[self._cache.key(cert)] = crls
+        return crls
+
+    def fetched_crls(self) -> Iterable[crl.CertificateList]:
+        return [item for crls in self._served.values() for item in crls]
+
+    def fetched_crls_for_cert(self, cert: Any) -> Iterable[crl.CertificateList]:
+        crls = self._cache.crls_for(cert) or list(self._inner.fetched_crls_for_cert(cert))  # KeyError si nunca se consultó
+        self._served[self._cache.key(cert)] = crls
+        return crls
+
+
+class SessionTimeStamper(HTTPTimeStamper):
+    """Cliente RFC 3161 con keep-alive; prueba las URLs en orden."""
+
+    def __init__(self, urls: Sequence[str], session: requests.Session, timeout: int) -> None:
+        super().__init__(urls[0], timeout=timeout)
+        self.urls = tuple(urls)
+        self._session = session
+
+    async def async_request_tsa_response(self, req: tsp.TimeStampReq) -> tsp.TimeStampResp:
+        return await asyncio.to_thread(self._request, req.dump())
+
+    def _request(self, body: bytes) -> tsp.TimeStampResp:
+        last: Exception | None = None
+        for url in self.urls:
+            try:
+                raw = self._session.post(url, body, headers=self.request_headers(), timeout=self.timeout)
+            except requests.RequestException as exc:
+                last = exc
+                continue
+            if raw.status_code == 200 and raw.headers.get("Content-Type") == "application/timestamp-reply":
+                return tsp.TimeStampResp.load(raw.content)
+            last = TimestampRequestError(f"Respuesta inválida de {url} (HTTP {raw.status_code})")
+        raise TimestampRequestError("Ningún servidor de sellos de tiempo respondió.") from last
+
+
+# ═════════════════════ servicio ══════════════════════════════════════════════
+class LtvService:
+    """Sesión HTTP, caché de revocación y cliente TSA compartidos por el proceso."""
+
+    def __init__(
+        self,
+        *,
+        tsa_urls: Sequence[str] | None = None,
+        cache: RevocationCache | None = None,
+        trust_roots_dir: str | Path | None = None,
+        timeout: int | None = None,
+    ) -> None:
+        timeout = config.NETWORK_TIMEOUT if timeout is None else timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cache = cache or RevocationCache()
+        self._ocsp = _SessionOCSPFetcher(self.session, timeout)
+        self._crl = _SessionCRLFetcher(self.session, timeout)
+        self._certs = _SessionCertificateFetcher(self.session, timeout)
+        urls = config.TSA_URLS if tsa_urls is None else tuple(tsa_urls)
+        self.timestamper = SessionTimeStamper(urls, self.session, timeout) if urls else None
+        self._trust_roots = self._load_roots(Path(trust_roots_dir or config.TRUST_ROOTS_DIR))
+
+    @staticmethod
+    def _load_roots(folder: Path) -> list[x509.Certificate]:
+        if not folder.is_dir():
+            return []
+        files = sorted(p for p in folder.iterdir() if p.suffix.lower() in _ROOT_SUFFIXES)
+        return list(load_certs_from_pemder(str(p) for p in files))
+
+    def validation_context(self, certs: Iterable[x509.Certificate] = ()) -> ValidationContext:
+        """Contexto nuevo sobre la caché y las conexiones compartidas.
+
+        Sin raíces configuradas en ``WOLFSIGHT_TRUST_ROOTS`` se toman como
+        raíz los certificados autofirmados de ``certs`` (la cadena del PFX o
+        de la firma), suficiente para reunir la revocación a embeber.
+        """
+        certs = list(certs)
+        roots = self._trust_roots or [c for c in certs if c.self_signed != "no"]
+        return ValidationContext(
+            trust_roots=roots or None,
+            other_certs=certs,
+            allow_fetching=True,
+            fetchers=Fetchers(
+                ocsp_fetcher=CachingOCSPFetcher(self._ocsp, self.cache),
+                crl_fetcher=CachingCRLFetcher(self._crl, self.cache),
+                cert_fetcher=self._certs,
+            ),
+            revocation_mode="soft-fail",
+        )
+
+    def require_timestamper(self) -> HTTPTimeStamper:
+        if self.timestamper is None:
+            raise ValueError("Los niveles B-T, B-LT y B-LTA requieren WOLFSIGHT_TSA_URLS.")
+        return self.timestamper
+
+    def add_ltv(self, pdf_in: str | Path, pdf_out: str | Path, *, archival: bool = False) -> str:
+        """Embebe la revocación de todas las firmas de ``pdf_in`` (B-LT).
+
+        Una firma B-B no tiene fecha cierta: tras la revocación se agrega un
+        sello de tiempo de documento que la cubre. Con ``archival`` se agrega
+        además un sello de archivo (B-LTA); antes, la revocación de la TSA
+        del primer sello va al DSS para que el de archivo la cubra. Todo va
+        como revisiones incrementales: las firmas previas quedan intactas.
+        Devuelve el SHA-256 del resultado.
+        """
+        with hold(Path(pdf_in).resolve()) as session:
+            stream: Any = session.stream()
+            signatures = PdfFileReader(stream).embedded_signatures
+            if not signatures:
+                raise ValueError("El documento no tiene firmas.")
+            dated = any(s.sig_object_type == "/DocTimeStamp" or s.attached_timestamp_data for s in signatures)
+
+            for index in range(len(signatures)):
+                signature = PdfFileReader(stream).embedded_signatures[index]
+                context = self.validation_context([signature.signer_cert, *signature.other_embedded_certs])
+                stream = add_validation_info(signature, context, output=BytesIO())
+            if not dated:
+                stream = self._timestamp(stream)
+                if archival:
+                    stream = self._add_timestamp_validation(stream)
+            if archival:
+                stream = self._timestamp(stream)
+
+        data = stream.getbuffer()
+        digest = hashlib.sha256(data).hexdigest()
+        out_path = Path(pdf_out).resolve()
+        release(out_path)
+        write_atomic(out_path, data)
+        get_hash_service().remember(out_path, digest)
+        return digest
+
+    def _add_timestamp_validation(self, stream: Any) -> BytesIO:
+        """Revocación de la cadena de la TSA del último sello, al DSS."""
+        timestamp = PdfFileReader(stream).embedded_signatures[-1]
+        context = self.validation_context([timestamp.signer_cert, *timestamp.other_embedded_certs])
+        return add_validation_info(timestamp, context, output=BytesIO())
+
+    def _timestamp(self, stream: Any) -> BytesIO:
+        # La cadena de la TSA sólo se valida (y se embebe) si hay raíces
+        # configuradas; sin ellas el sello va igual.
+        stamped = BytesIO()
+        signers.PdfTimeStamper(self.require_timestamper()).timestamp_pdf(
+            IncrementalPdfFileWriter(stream), "sha256",
+            self.validation_context() if self._trust_roots else None, output=stamped,
+        )
+        return stamped
+
+
+_DEFAULT: LtvService | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_ltv_service() -> LtvService:
+    """Instancia compartida por todo el proceso."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = LtvService()
+        return _DEFAULT
+
+
+def _forget_after_fork() -> None:
+    # Un proceso hijo no debe reusar las conexiones abiertas del padre.
+    global _DEFAULT, _DEFAULT_LOCK
+    _DEFAULT = None
+    _DEFAULT_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_after_fork)
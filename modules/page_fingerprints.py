@@ -0,0 +1,240 @@
+# coding: utf-8
+# modules/page_fingerprints.py · WolfSight-PDF
+"""
+Huellas por página para comparar versiones de un expediente.
+
+La huella de una página es un BLAKE2b de:
+
+* su contenido (streams de ``/Contents`` decodificados, con los espacios
+  normalizados, así que recomprimir o reordenar el xref no la cambia);
+* sus recursos, recorridos en profundidad: diccionarios por clave ordenada
+  y streams por sus bytes codificados (las imágenes no se decodifican). Los
+  números de objeto no intervienen, sólo el contenido alcanzable;
+* ``/MediaBox``, ``/CropBox`` y ``/Rotate`` efectivos.
+
+El sello de validación no cuenta (ver ``modules.stamping``): se descartan
+sus streams ``q`` / ``Q q … cm /WSQR… Do Q`` y sus entradas ``/WSQR…`` en
+``/XObject``, así una página firmada conserva la huella de la original y
+comparar ``foo`` con ``foo-firmado`` no marca todas las páginas.
+
+Las huellas de un documento se guardan en ``CACHE_DIR/huellas/<sha256>.json``:
+el SHA-256 sale del servicio de hashes (cacheado por identidad de archivo),
+por lo que comparar dos versiones ya vistas es leer dos JSON y alinear dos
+listas con ``difflib`` — milisegundos, aun con miles de páginas.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Final
+
+from pyhanko.pdf_utils import generic
+
+from modules import config
+from modules.document_session import hold
+from modules.hashing import get_hash_service
+from modules.pdf_tools import iter_pages
+
+_LOG = logging.getLogger("PageFingerprints")
+_FORMAT: Final[int] = 2
+_DIGEST_SIZE: Final[int] = 16
+_MEMORY_ENTRIES: Final[int] = 32
+_BOX_KEYS: Final[tuple[str, ...]] = ("/MediaBox", "/CropBox", "/Rotate")
+_STAMP_PREFIX: Final[str] = "/WSQR"
+# Stream de cierre que agrega ``stamping.stamp_pages`` (ya normalizado).
+_STAMP_CONTENT: Final = re.compile(rb"Q q 1 0 0 1 \S+ \S+ cm /WSQR\w* Do Q")
+
+
+@dataclass(slots=True, frozen=True)
+class PageDiff:
+    """Diferencias entre dos versiones. Índices de página en base 0."""
+    added: tuple[int, ...]                 # en la versión nueva
+    removed: tuple[int, ...]               # en la versión anterior
+    changed: tuple[tuple[int, int], ...]   # (anterior, nueva)
+    unchanged: int
+
+    @property
+    def identical(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    @property
+    def old_pages(self) -> list[int]:
+        """Páginas de la versión anterior que hay que mostrar."""
+        return sorted({old for old, _new in self.changed} | set(self.removed))
+
+    @property
+    def new_pages(self) -> list[int]:
+        """Páginas de la versión nueva que hay que mostrar."""
+        return sorted({new for _old, new in self.changed} | set(self.added))
+
+
+# ═════════════════════ huellas ═══════════════════════════════════════════════
+class _Hasher:
+    """Digiere objetos PDF memorizando los indirectos (recursos compartidos)."""
+
+    def __init__(self) -> None:
+        self._memo: dict[tuple[int, int], bytes] = {}
+        self._active: set[tuple[int, int]] = set()
+
+    def digest(self, obj: Any) -> bytes:
+        if isinstance(obj, generic.IndirectObject):
+            key = (obj.idnum, obj.generation)
+            cached = self._memo.get(key)
+            if cached is not None:
+                return cached
+            if key in self._active:
+                return b"<ciclo>"
+            self._active.add(key)
+            try:
+                cached = self._memo[key] = self.digest(obj.get_object())
+            finally:
+                self._active.discard(key)
+            return cached
+
+        h = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+        if isinstance(obj, generic.StreamObject):
+            h.update(b"S")
+            h.update(self._dict_digest(obj, skip=("/Length",)))
+            h.update(obj.encoded_data)
+        elif isinstance(obj, generic.DictionaryObject):
+            h.update(b"D")
+            h.update(self._dict_digest(obj))
+        elif isinstance(obj, generic.ArrayObject):
+            h.update(b"A")
+            for item in obj:
+                h.update(self.digest(item))
+        else:
+            h.update(repr(obj).encode("utf-8", "replace"))
+        return h.digest()
+
+    def _dict_digest(self, obj: generic.DictionaryObject, skip: tuple[str, ...] = ()) -> bytes:
+        h = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+        for key in sorted(k for k in obj if k not in skip):
+            h.update(key.encode("utf-8", "replace"))
+            h.update(self.digest(obj.raw_get(key)))
+        return h.digest()
+
+
+def _normalized_content(page: Any) -> bytes:
+    contents = page.get("/Contents")
+    if contents is None:
+        return b""
+    streams = contents if isinstance(contents, generic.ArrayObject) else [contents]
+    parts = [b" ".join(s.get_object().data.split()) for s in streams]
+    # Cada sello agrega un «q» al principio y su stream de dibujo al final.
+    stamps = sum(1 for part in parts if _STAMP_CONTENT.fullmatch(part))
+    if stamps:
+        parts = [part for part in parts if not _STAMP_CONTENT.fullmatch(part)]
+        while stamps and parts and parts[0] == b"q":
+            parts.pop(0)
+            stamps -= 1
+    return b" ".join(part for part in parts if part)
+
+
+def _unstamped_resources(resources: Any) -> Any:
+    """``resources`` sin las entradas ``/WSQR…`` de ``/XObject``."""
+    res = resources.get_object()
+    if not isinstance(res, generic.DictionaryObject) or "/XObject" not in res:
+        return resources
+    xobjects = res["/XObject"]
+    if not any(str(name).startswith(_STAMP_PREFIX) for name in xobjects):
+        return resources  # sin copiar: conserva la memorización de los indirectos
+    kept = generic.DictionaryObject(
+        {name: xobjects.raw_get(name) for name in xobjects if not str(name).startswith(_STAMP_PREFIX)}
+    )
+    filtered = generic.DictionaryObject({key: res.raw_get(key) for key in res if key != "/XObject"})
+    if kept:
+        filtered[generic.pdf_name("/XObject")] = kept
+    # Una página sin recursos propios recibe un diccionario nuevo al sellarse.
+    return filtered if filtered else generic.NullObject()
+
+
+def compute_fingerprints(path: str | Path) -> list[str]:
+    """Huella hexadecimal de cada página, sin caché."""
+    hasher = _Hasher()
+    result: list[str] = []
+    with hold(path) as session:
+        for page, inherited in iter_pages(session.hanko_reader):
+            h = hashlib.blake2b(_normalized_content(page), digest_size=_DIGEST_SIZE)
+            h.update(b"\0R")
+            h.update(hasher.digest(_unstamped_resources(inherited.get("/Resources", generic.NullObject()))))
+            for key in _BOX_KEYS:
+                if key in inherited:
+                    h.update(key.encode())
+                    h.update(hasher.digest(inherited[key]))
+            result.append(h.hexdigest())
+    return result
+
+
+# ═════════════════════ caché ═════════════════════════════════════════════════
+_MEMORY: OrderedDict[str, list[str]] = OrderedDict()
+_MEMORY_LOCK = threading.Lock()
+
+
+def _cache_file(doc_sha256: str) -> Path:
+    return config.CACHE_DIR / "huellas" / f"{doc_sha256}.json"
+
+
+def page_fingerprints(path: str | Path) -> list[str]:
+    """Huellas de ``path``, desde memoria, disco o calculándolas (en ese orden)."""
+    doc_sha256 = get_hash_service().sha256(path)
+    with _MEMORY_LOCK:
+        cached = _MEMORY.get(doc_sha256)
+        if cached is not None:
+            _MEMORY.move_to_end(doc_sha256)
+            return cached
+
+    cache_file = _cache_file(doc_sha256)
+    fingerprints: list[str] | None = None
+    try:
+        data = json.loads(cache_file.read_text("utf-8"))
+        if data.get("format") == _FORMAT:
+            fingerprints = list(data["pages"])
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    if fingerprints is None:
+        fingerprints = compute_fingerprints(path)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"format": _FORMAT, "pages": fingerprints}), encoding="utf-8")
+            tmp.replace(cache_file)
+        except OSError as exc:
+            _LOG.warning("No se pudieron guardar las huellas de %s: %s", path, exc)
+
+    with _MEMORY_LOCK:
+        _MEMORY[doc_sha256] = fingerprints
+        while len(_MEMORY) > _MEMORY_ENTRIES:
+            _MEMORY.popitem(last=False)
+    return fingerprints
+
+
+# ═════════════════════ comparación ═══════════════════════════════════════════
+def diff_fingerprints(old: list[str], new: list[str]) -> PageDiff:
+    """Alinea las dos secuencias: páginas insertadas, quitadas y modificadas."""
+    added: list[int] = []
+    removed: list[int] = []
+    changed: list[tuple[int, int]] = []
+    unchanged = 0
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            unchanged += i2 - i1
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        changed.extend(zip(range(i1, i1 + paired), range(j1, j1 + paired)))
+        removed.extend(range(i1 + paired, i2))
+        added.extend(range(j1 + paired, j2))
+    return PageDiff(tuple(added), tuple(removed), tuple(changed), unchanged)
+
+
+def compare_versions(old_path: str | Path, new_path: str | Path) -> PageDiff:
+    return diff_fingerprints(page_fingerprints(old_path), page_fingerprints(new_path))
@@ -0,0 +1,162 @@
+# coding: utf-8
+# modules/pdf_render.py · WolfSight-PDF
+"""
+Rasterizado de páginas con PyMuPDF.
+
+MuPDF no admite uso concurrente desde varios hilos, por lo que todo acceso
+a ``fitz`` desde hilos de trabajo debe hacerse bajo ``FITZ_LOCK``.
+
+Vista previa rápida: la mayoría de las fojas son un escaneo JPEG a página
+completa. Para esas páginas ``render_page_preview`` no rasteriza el PDF:
+toma el JPEG tal cual está en el archivo y lo decodifica ya reducido a 1/2,
+1/4 u 1/8 con el escalado DCT de libjpeg (``Image.draft`` de Pillow), que
+se saltea casi todo el trabajo de la decodificación completa. Cualquier
+otra página (texto, varias imágenes, anotaciones, CMYK…) va por MuPDF.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Any, Final
+
+from modules.render_cache import RenderKey, get_render_cache
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # pragma: no cover
+    fitz = None  # type: ignore[assignment]
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None  # type: ignore[assignment]
+
+_LOG = logging.getLogger("PdfRender")
+FITZ_LOCK: Final[threading.RLock] = threading.RLock()
+
+# Un escaneo dibuja una imagen y nada más: su contenido es unas pocas
+# decenas de bytes de estado gráfico alrededor de un único ``Do``.
+_SCAN_CONTENT_MAX: Final[int] = 1024
+_SCAN_OPERATORS: Final[frozenset[bytes]] = frozenset(
+    {b"q", b"Q", b"cm", b"Do", b"gs", b"re", b"W", b"W*", b"n", b"w", b"J", b"j", b"M", b"d", b"ri", b"i"}
+)
+_OPERATOR: Final = re.compile(rb"(?<![/\w.+-])[A-Za-z'\"][A-Za-z*'\"]*")
+_MIN_COVERAGE: Final[float] = 0.98
+# La vista previa de un escaneo se entrega como JPEG: como PNG pesaría diez
+# veces más en la caché de render y tardaría otro tanto en codificarse.
+_PREVIEW_QUALITY: Final[int] = 90
+
+
+def is_available() -> bool:
+    return fitz is not None
+
+
+def open_document(path: str | Path) -> Any:
+    if fitz is None:
+        raise RuntimeError("PyMuPDF no está instalado.")
+    return fitz.open(str(path))
+
+
+def render_page_png(doc: Any, index: int, zoom: float = 1.0, rotation: int = 0) -> bytes:
+    """Devuelve la página ``index`` de ``doc`` rasterizada como PNG."""
+    with FITZ_LOCK:
+        matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+        pix = doc[index].get_pixmap(matrix=matrix, alpha=False)
+        return pix.tobytes("png")
+
+
+def render_page_png_cached(doc: Any, doc_sha256: str, index: int, zoom: float = 1.0, rotation: int = 0) -> bytes:
+    """Como ``render_page_preview``, pero a través de la caché de render compartida."""
+    key = RenderKey(doc_sha256, index, round(zoom, 3), rotation % 360)
+    return get_render_cache().get_or_render(key, lambda: render_page_preview(doc, index, zoom, rotation))
+
+
+def render_page_rgb(doc: Any, index: int, dpi: float) -> tuple[bytes, int, int, int]:
+    """Rasteriza la página a ``dpi`` y devuelve ``(muestras RGB, ancho, alto, stride)``."""
+    with FITZ_LOCK:
+        zoom = dpi / 72.0
+        pix = doc[index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return bytes(pix.samples), pix.width, pix.height, pix.stride
+
+
+# ═════════════════════ vista previa rápida ═══════════════════════════════════
+def _scan_jpeg(doc: Any, page: Any) -> bytes | None:
+    """El JPEG de la página si es un escaneo a página completa; si no, ``None``."""
+    if page.first_annot is not None or page.get_xobjects():
+        return None
+    content = page.read_contents()
+    if len(content) > _SCAN_CONTENT_MAX:
+        return None
+    operators = _OPERATOR.findall(content)
+    if operators.count(b"Do") != 1 or not set(operators) <= _SCAN_OPERATORS:
+        return None
+    images = page.get_images(full=True)
+    if len(images) != 1:
+        return None
+    xref, smask = images[0][0], images[0][1]
+    if smask or doc.xref_get_key(xref, "Filter") != ("name", "/DCTDecode"):
+        return None
+    if doc.xref_get_key(xref, "Decode")[0] != "null" or doc.xref_get_key(xref, "ImageMask")[1] == "true":
+        return None
+
+    infos = page.get_image_info()
+    if len(infos) != 1:
+        return None
+    a, b, c, d, _e, _f = infos[0]["transform"]
+    if abs(b) > 1e-3 or abs(c) > 1e-3 or a <= 0 or d <= 0:
+        return None  # girada o espejada dentro de la página: que la dibuje MuPDF
+    area = page.rect * page.derotation_matrix
+    bbox = fitz.Rect(infos[0]["bbox"])
+    if (bbox & area).get_area() < _MIN_COVERAGE * area.get_area():
+        return None
+    return doc.xref_stream_raw(xref)
+
+
+def _decode_scaled(jpeg: bytes, width: int, height: int, turns: int) -> bytes | None:
+    """Decodifica ``jpeg`` a la escala DCT justa, lo gira y lo lleva a ``width``×``height``."""
+    with Image.open(io.BytesIO(jpeg)) as img:
+        if img.format != "JPEG" or img.mode not in ("L", "RGB"):
+            return None  # CMYK/Adobe invertido: MuPDF lo resuelve mejor
+        src_w, src_h = (height, width) if turns % 2 else (width, height)
+        img.draft(img.mode, (src_w, src_h))
+        if turns:
+            img = img.rotate(-90 * turns, expand=True)  # múltiplos de 90°: transposición exacta
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.Resampling.BILINEAR)
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=_PREVIEW_QUALITY)
+        return out.getvalue()
+
+
+def render_page_preview(doc: Any, index: int, zoom: float = 1.0, rotation: int = 0) -> bytes:
+    """Como ``render_page_png``, pero los escaneos salen del JPEG, sin rasterizar.
+
+    Devuelve PNG, o JPEG si la página es un escaneo: quien la muestra
+    (``QPixmap.loadFromData``) detecta el formato solo.
+    """
+    if Image is not None and rotation % 90 == 0:
+        with FITZ_LOCK:
+            page = doc[index]
+            try:
+                jpeg = _scan_jpeg(doc, page)
+            except Exception as exc:  # noqa: BLE001
+                _LOG.debug("Página %d: sin vista rápida (%s)", index, exc)
+                jpeg = None
+            if jpeg is not None:
+                matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+                target = page.rect.transform(matrix).irect
+                turns = (page.rotation + rotation) % 360 // 90
+        if jpeg is not None:
+            # Decodificar no toca MuPDF: se hace fuera del candado.
+            try:
+                png = _decode_scaled(jpeg, target.width, target.height, turns)
+            except (OSError, ValueError) as exc:
+                _LOG.debug("Página %d: JPEG no decodificable con Pillow (%s)", index, exc)
+                png = None
+            if png is not None:
+                return png
+    return render_page_png(doc, index, zoom, rotation)
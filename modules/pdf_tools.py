@@ -0,0 +1,218 @@
+# coding: utf-8
+# modules/pdf_tools.py · WolfSight-PDF
+"""
+Operaciones sobre documentos PDF que no involucran la firma: anexado,
+extracción y división por páginas, y optimización. Sin dependencias de Qt,
+para poder usarse desde la CLI.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Final, Iterable, Iterator, Sequence
+
+from pyhanko.pdf_utils import generic
+from pyhanko.pdf_utils.generic import pdf_name
+from pyhanko.pdf_utils.writer import PdfFileWriter
+from PyPDF2 import PdfWriter
+
+from modules import pdf_render
+from modules.document_session import hold, release
+
+_LOG = logging.getLogger("PdfTools")
+
+# Atributos que una página puede heredar de sus nodos /Pages.
+_INHERITABLE: Final[tuple[str, ...]] = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+# Anotaciones que apuntan al árbol de páginas de origen y no sobreviven al anexado.
+_UNPORTABLE_ANNOTS: Final[frozenset[str]] = frozenset({"/Link", "/Widget", "/Popup"})
+
+
+def merge_pdfs(base_pdf_path: str | Path, files_to_annex: Iterable[str | Path], output_path: str | Path) -> int:
+    """Anexa ``files_to_annex`` al final del expediente base. Devuelve el total de páginas.
+
+    Los documentos de origen se toman de sus sesiones compartidas: si el
+    visor o la firma ya los parsearon, no se vuelven a leer.
+    """
+    writer = PdfWriter()
+    # Las sesiones quedan retenidas hasta escribir: los objetos se leen ahí.
+    with ExitStack() as held:
+        for src in (base_pdf_path, *files_to_annex):
+            writer.append(held.enter_context(hold(src)).reader)
+        release(output_path)
+        with Path(output_path).open("wb") as fp:
+            writer.write(fp)
+    return len(writer.pages)
+
+
+def _portable_page(node: Any, inherited: dict[str, Any]) -> generic.DictionaryObject:
+    """Copia superficial de una página sin ``/Parent`` y con lo heredado resuelto."""
+    page = generic.DictionaryObject(inherited)
+    for key in node:
+        if key not in ("/Parent", "/Annots"):
+            page[key] = node.raw_get(key)
+    page[pdf_name("/Type")] = pdf_name("/Page")
+    annots = generic.ArrayObject()
+    for annot in node.get("/Annots", ()):
+        annot = annot.get_object()
+        if annot.get("/Subtype") in _UNPORTABLE_ANNOTS:
+            continue
+        annots.append(generic.DictionaryObject(
+            {k: annot.raw_get(k) for k in annot if k not in ("/P", "/Popup", "/IRT")}
+        ))
+    if annots:
+        page[pdf_name("/Annots")] = annots
+    return page
+
+
+def iter_pages(reader: Any) -> Iterator[tuple[Any, dict[str, Any]]]:
+    """Recorre el árbol de páginas (pyhanko) en orden, una sola pasada.
+
+    Devuelve ``(página, heredados)`` donde ``heredados`` son los atributos
+    de ``_INHERITABLE`` vigentes para esa página (los propios incluidos).
+    """
+    stack: list[tuple[Any, dict[str, Any]]] = [(reader.root.raw_get("/Pages"), {})]
+    while stack:
+        node_ref, inherited = stack.pop()
+        node = node_ref.get_object()
+        inherited = {**inherited, **{k: node.raw_get(k) for k in _INHERITABLE if k in node}}
+        if "/Kids" in node:
+            stack.extend((kid, inherited) for kid in reversed(node["/Kids"]))
+        else:
+            yield node, inherited
+
+
+def append_pages(writer: Any, reader: Any) -> int:
+    """Agrega al final de ``writer`` (pyhanko) todas las páginas de ``reader``.
+
+    Sobre un ``IncrementalPdfFileWriter`` las páginas quedan en la revisión
+    incremental en curso; el contenido original no se toca. Todo se importa
+    en una sola llamada para que los recursos compartidos (fuentes,
+    imágenes) no se dupliquen. Devuelve la cantidad de páginas agregadas.
+    """
+    pages = generic.ArrayObject(_portable_page(node, inherited) for node, inherited in iter_pages(reader))
+    for page in writer.import_object(pages):
+        writer.insert_page(page)
+    return len(pages)
+
+
+def parse_page_ranges(spec: str, page_count: int) -> list[int]:
+    """Convierte «1-3, 7, 10-» (fojas desde 1) en índices base 0, en orden.
+
+    Un tramo abierto («10-») llega hasta la última página. Lanza
+    ``ValueError`` con un mensaje para el operador si algo no es válido.
+    """
+    pages: list[int] = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        first_raw, sep, last_raw = part.partition("-")
+        try:
+            first = int(first_raw) if first_raw.strip() else 1
+            last = (int(last_raw) if last_raw.strip() else page_count) if sep else first
+        except ValueError:
+            raise ValueError(f"Rango inválido: «{part}».") from None
+        if not 1 <= first <= last <= page_count:
+            raise ValueError(f"Rango fuera del documento (1-{page_count}): «{part}».")
+        pages.extend(range(first - 1, last))
+    if not pages:
+        raise ValueError("No se indicó ninguna página.")
+    return pages
+
+
+def extract_pages(src: str | Path, pages: Sequence[int], output_path: str | Path) -> int:
+    """Escribe en ``output_path`` sólo las páginas ``pages`` (base 0) de ``src``.
+
+    Se copian únicamente los objetos que esas páginas alcanzan (contenido,
+    fuentes, imágenes), y los streams pasan tal cual, sin descomprimir ni
+    recomprimir. El árbol de páginas se recorre sólo hasta la última pedida.
+    """
+    wanted = list(pages)
+    if not wanted:
+        raise ValueError("No se indicó ninguna página.")
+    with hold(src) as session:
+        catalog = list(itertools.islice(iter_pages(session.hanko_reader), max(wanted) + 1))
+        if min(wanted) < 0 or max(wanted) >= len(catalog):
+            raise IndexError(f"Página fuera de rango en {Path(src).name}.")
+        writer = PdfFileWriter()
+        imported = writer.import_object(generic.ArrayObject(_portable_page(*catalog[i]) for i in wanted))
+    tree_ref = writer.root.raw_get("/Pages")
+    tree = tree_ref.get_object()
+    kids = generic.ArrayObject()
+    for page in imported:
+        page[pdf_name("/Parent")] = tree_ref
+        kids.append(writer.add_object(page))
+    tree[pdf_name("/Kids")] = kids
+    tree[pdf_name("/Count")] = generic.NumberObject(len(kids))
+
+    release(output_path)
+    with Path(output_path).open("wb") as fp:
+        writer.write(fp)
+    return len(kids)
+
+
+def split_pdf(
+    src: str | Path,
+    parts: int,
+    output_dir: str | Path,
+    *,
+    workers: int | None = None,
+) -> list[Path]:
+    """Divide ``src`` en ``parts`` archivos de tamaño parejo, en paralelo.
+
+    Cada parte se extrae en su propio proceso (el parseo de pyhanko es
+    Python puro y no se beneficiaría de hilos). Devuelve las rutas en orden.
+    """
+    src = Path(src).resolve()
+    with hold(src) as session:
+        count = int(session.hanko_reader.root["/Pages"]["/Count"])
+    parts = max(1, min(parts, count))
+    size = math.ceil(count / parts)
+    ranges = [list(range(first, min(first + size, count))) for first in range(0, count, size)]
+    folder = Path(output_dir)
+    folder.mkdir(parents=True, exist_ok=True)
+    outputs = [folder / f"{src.stem}-parte{n:02d}{src.suffix}" for n in range(1, len(ranges) + 1)]
+
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers <= 1:
+        for pages, out in zip(ranges, outputs):
+            extract_pages(src, pages, out)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(extract_pages, [src] * len(ranges), ranges, outputs))
+    _LOG.info("%s dividido en %d partes", src.name, len(outputs))
+    return outputs
+
+
+def is_signed(pdf_path: str | Path) -> bool:
+    with pdf_render.FITZ_LOCK:
+        doc = pdf_render.open_document(pdf_path)
+        try:
+            return doc.get_sigflags() > 0
+        finally:
+            doc.close()
+
+
+def optimize_pdf(pdf_in: str | Path, pdf_out: str | Path, *, force: bool = False) -> tuple[int, int]:
+    """
+    Reescribe el PDF eliminando objetos huérfanos/duplicados y comprimiendo
+    los streams. Devuelve ``(bytes_antes, bytes_después)``.
+
+    Reescribir un documento firmado invalida sus firmas, por lo que se
+    rechaza salvo que se indique ``force``.
+    """
+    src = Path(pdf_in)
+    if not force and is_signed(src):
+        raise ValueError(f"{src.name} está firmado; optimizarlo invalidaría la firma.")
+    with pdf_render.FITZ_LOCK:
+        doc = pdf_render.open_document(src)
+        try:
+            doc.save(str(pdf_out), garbage=4, deflate=True, clean=True)
+        finally:
+            doc.close()
+    before, after = src.stat().st_size, Path(pdf_out).stat().st_size
+    _LOG.info("Optimizado %s: %d → %d bytes", src.name, before, after)
+    return before, after
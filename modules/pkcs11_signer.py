@@ -0,0 +1,348 @@
+# coding: utf-8
+# modules/pkcs11_signer.py · WolfSight-PDF
+"""
+Firma con token o HSM (PKCS#11) sobre un grupo de sesiones ya autenticadas.
+
+Abrir una sesión, ingresar el PIN y buscar certificado y clave cuesta, en
+un token USB o un HSM de red, mucho más que la firma en sí. ``Pkcs11Pool``
+lo hace una vez y presta las sesiones a cada firma:
+
+* hasta ``config.PKCS11_SESSIONS`` sesiones por proceso, abiertas a demanda
+  y devueltas al grupo al terminar (una sesión PKCS#11 no admite dos hilos
+  a la vez, así que cada firma tiene la suya mientras dura);
+* el certificado y la cadena se leen del token una sola vez;
+* antes de prestar una sesión se busca la clave privada: es lo único que
+  se pide al token por firma y sirve de prueba de vida. Si la sesión se
+  cayó (token desconectado, HSM reiniciado, sesión cerrada) se descartan
+  todas, se vuelve a conectar y se reintenta una vez. Cada reconexión abre
+  una generación nueva: las sesiones prestadas de la anterior se cierran al
+  devolverse en vez de volver al grupo, y la biblioteca sólo se reinicia si
+  no hay otra firma en curso (reiniciarla invalida todas las sesiones);
+* un PIN incorrecto nunca se reintenta, para no bloquear el token.
+
+Cada proceso tiene su propio grupo (``get_pkcs11_pool``): los procesos de
+trabajo de la CLI lo reutilizan para todos los archivos de su lote.
+
+Requiere ``python-pkcs11`` (opcional). Para probar sin hardware, SoftHSM2::
+
+    softhsm2-util --init-token --free --label wolfsight --pin 1234 --so-pin 4321
+    export WOLFSIGHT_PKCS11_LIB=/usr/lib/softhsm/libsofthsm2.so
+    export WOLFSIGHT_PKCS11_TOKEN=wolfsight WOLFSIGHT_PKCS11_KEY_LABEL=firmante
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, Final, Iterator
+
+from modules import config
+
+try:
+    import pkcs11
+    from pkcs11 import exceptions as p11_errors
+except ImportError:  # pragma: no cover
+    pkcs11 = None  # type: ignore[assignment]
+    p11_errors = None  # type: ignore[assignment]
+
+_LOG = logging.getLogger("Pkcs11Signer")
+_ACQUIRE_TIMEOUT: Final[float] = 120.0
+
+
+class TokenLoginError(ValueError):
+    """El token rechazó el PIN (incorrecto o bloqueado)."""
+
+
+def is_available() -> bool:
+    return pkcs11 is not None
+
+
+def _dropped_errors() -> tuple[type[BaseException], ...]:
+    """Errores que indican que la sesión (o el token entero) ya no sirve."""
+    return (
+        p11_errors.SessionHandleInvalid,
+        p11_errors.SessionClosed,
+        p11_errors.DeviceRemoved,
+        p11_errors.DeviceError,
+        p11_errors.TokenNotPresent,
+        p11_errors.TokenNotRecognised,
+        p11_errors.UserNotLoggedIn,
+        p11_errors.KeyHandleInvalid,
+        p11_errors.ObjectHandleInvalid,
+        # Sin sesión autenticada la clave privada deja de ser visible.
+        p11_errors.NoSuchKey,
+    )
+
+
+@dataclass(slots=True, frozen=True)
+class Pkcs11Settings:
+    """Qué módulo, token y clave usar. ``None`` = sin restricción."""
+    lib: str
+    slot: int | None = None
+    token_label: str | None = None
+    key_label: str | None = None
+    cert_label: str | None = None
+    key_id: bytes | None = None
+    sessions: int = 4
+
+    @classmethod
+    def from_config(cls, **overrides: Any) -> "Pkcs11Settings":
+        settings = cls(
+            lib=config.PKCS11_LIB,
+            slot=config.PKCS11_SLOT if config.PKCS11_SLOT >= 0 else None,
+            token_label=config.PKCS11_TOKEN_LABEL or None,
+            key_label=config.PKCS11_KEY_LABEL or None,
+            cert_label=config.PKCS11_CERT_LABEL or None,
+            key_id=bytes.fromhex(config.PKCS11_KEY_ID) if config.PKCS11_KEY_ID else None,
+            sessions=max(1, config.PKCS11_SESSIONS),
+        )
+        return replace(settings, **{k: v for k, v in overrides.items() if v is not None})
+
+    def check(self) -> None:
+        if not self.lib:
+            raise ValueError("Falta el módulo PKCS#11 (WOLFSIGHT_PKCS11_LIB).")
+        if not (self.key_label or self.cert_label or self.key_id):
+            raise ValueError("Indique la etiqueta o el ID de la clave del token (WOLFSIGHT_PKCS11_KEY_LABEL).")
+
+
+@dataclass(slots=True)
+class PoolStats:
+    opened: int = 0
+    borrowed: int = 0
+    reconnects: int = 0
+    dropped: int = 0
+    waits_s: float = field(default=0.0)
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class Pkcs11Pool:
+    """Sesiones autenticadas de un token, prestadas de a una por firma."""
+
+    def __init__(self, settings: Pkcs11Settings, pin: str) -> None:
+        if pkcs11 is None:
+            raise RuntimeError("python-pkcs11 no está instalado (pip install python-pkcs11).")
+        settings.check()
+        self.settings = settings
+        self._pin = pin
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(settings.sessions)
+        self._idle: list[tuple[int, Any]] = []  # (generación, sesión)
+        self._generation = 0
+        self._live = 0     # sesiones abiertas de la generación actual
+        self._on_loan = 0  # prestadas o abriéndose, de cualquier generación
+        self._token: Any = None
+        self._identity: tuple[Any, list[Any]] | None = None  # (certificado, cadena)
+        self.stats = PoolStats()
+
+    # ——— API pública ——————————————————————————————————————————————
+    @contextmanager
+    def signer(self) -> Iterator[Any]:
+        """Presta un ``PKCS11Signer`` de pyhanko sobre una sesión viva."""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=_ACQUIRE_TIMEOUT):
+            raise TimeoutError("No se liberó ninguna sesión del token a tiempo.")
+        self.stats.waits_s += time.perf_counter() - started
+        entry = None
+        try:
+            entry, signer = self._borrow()
+            try:
+                yield signer
+            except _dropped_errors():
+                self._discard(entry)
+                entry = None
+                raise
+        finally:
+            if entry is not None:
+                self._give_back(entry)
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._generation += 1  # las prestadas se cierran al devolverse
+            self._live = 0
+            self._token = None
+        for _, session in idle:
+            self._close_session(session)
+
+    # ——— sesiones ————————————————————————————————————————————————————
+    def _borrow(self) -> tuple[tuple[int, Any], Any]:
+        self.stats.borrowed += 1
+        for attempt in (1, 2):
+            entry = self._take()
+            try:
+                return entry, self._make_signer(entry[1])
+            except _dropped_errors() as exc:
+                self._discard(entry)
+                if attempt == 2:
+                    raise RuntimeError(f"El token no responde: {exc!r}") from exc
+                _LOG.warning("Sesión PKCS#11 caída (%r); reconectando", exc)
+                self._reset()
+            except BaseException:
+                self._give_back(entry)
+                raise
+        raise AssertionError("inalcanzable")
+
+    def _take(self) -> tuple[int, Any]:
+        with self._lock:
+            self._on_loan += 1
+            if self._idle:
+                return self._idle.pop()
+            generation = self._generation
+            try:
+                token = self._token or self._connect()
+            except BaseException:
+                self._on_loan -= 1
+                raise
+        try:
+            # Al iniciar sesión en una, el token queda autenticado para todas
+            # las del proceso: sólo la primera necesita el PIN (y dos hilos no
+            # deben intentarlo a la vez).
+            with self._open_lock:
+                with self._lock:
+                    logged_in = self._live > 0
+                session = self._open(token, logged_in)
+                with self._lock:
+                    if generation == self._generation:
+                        self._live += 1
+                    self.stats.opened += 1
+        except BaseException:
+            with self._lock:
+                self._on_loan -= 1
+            raise
+        return generation, session
+
+    def _open(self, token: Any, logged_in: bool) -> Any:
+        try:
+            return token.open(user_pin=None if logged_in else self._pin)
+        except p11_errors.UserAlreadyLoggedIn:
+            # Una sesión de antes de reconectar sigue abierta y autenticada.
+            return token.open()
+        except (p11_errors.PinIncorrect, p11_errors.PinInvalid, p11_errors.PinLenRange) as exc:
+            raise TokenLoginError("PIN del token incorrecto.") from exc
+        except p11_errors.PinLocked as exc:
+            raise TokenLoginError("El PIN del token está bloqueado.") from exc
+
+    def _make_signer(self, session: Any) -> Any:
+        from pyhanko.sign.pkcs11 import PKCS11Signer
+
+        s = self.settings
+        if self._identity is None:
+            # Primera vez: certificado del firmante y todos los del token (cadena).
+            probe = PKCS11Signer(
+                session, cert_label=s.cert_label, key_label=s.key_label, key_id=s.key_id,
+                other_certs_to_pull=None,
+            )
+            cert = probe.signing_cert
+            self._identity = (cert, [c for c in probe.cert_registry if c.dump() != cert.dump()])
+            return probe
+        cert, chain = self._identity
+        signer = PKCS11Signer(
+            session, signing_cert=cert, ca_chain=chain, key_label=s.key_label or s.cert_label,
+            key_id=s.key_id, other_certs_to_pull=(),
+        )
+        _ = signer.signing_cert  # busca la clave privada: prueba de vida de la sesión
+        return signer
+
+    def _connect(self) -> Any:
+        """Localiza el token (con ``self._lock`` tomado)."""
+        from pyhanko.sign.pkcs11 import TokenCriteria, find_token
+
+        lib = pkcs11.lib(self.settings.lib)
+        if _reinit_pending.pop(self.settings.lib, False):
+            # Proceso hijo: el estado de la biblioteca heredado del padre no sirve.
+            try:
+                lib.reinitialize()
+            except p11_errors.PKCS11Error:
+                lib.initialize()
+        criteria = TokenCriteria(label=self.settings.token_label) if self.settings.token_label else None
+        token = find_token(lib.get_slots(token_present=True), slot_no=self.settings.slot, token_criteria=criteria)
+        if token is None:
+            raise RuntimeError("No se encontró el token PKCS#11 configurado.")
+        self._token = token
+        return token
+
+    def _give_back(self, entry: tuple[int, Any]) -> None:
+        generation, session = entry
+        with self._lock:
+            self._on_loan -= 1
+            if generation == self._generation:
+                self._idle.append(entry)
+                return
+        self._close_session(session)  # de antes de reconectar: no vuelve al grupo
+
+    def _discard(self, entry: tuple[int, Any]) -> None:
+        generation, session = entry
+        with self._lock:
+            self._on_loan -= 1
+            if generation == self._generation:
+                self._live = max(0, self._live - 1)
+            self.stats.dropped += 1
+        self._close_session(session)
+
+    def _reset(self) -> None:
+        # Con el lock tomado nadie presta ni abre sesiones mientras tanto.
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._generation += 1
+            self._live = 0
+            self._token = None
+            self.stats.reconnects += 1
+            for _, session in idle:
+                self._close_session(session)
+            if self._on_loan:
+                # Reiniciar la biblioteca invalidaría las sesiones de las
+                # firmas en curso; se reconecta sin reiniciar.
+                return
+            # Si el token se desconectó, la biblioteca puede quedar inservible.
+            lib = pkcs11.lib(self.settings.lib)
+            try:
+                lib.reinitialize()
+            except p11_errors.PKCS11Error as exc:
+                _LOG.debug("No se pudo reiniciar la biblioteca PKCS#11: %r", exc)
+                lib.initialize()
+
+    @staticmethod
+    def _close_session(session: Any) -> None:
+        try:
+            session.close()
+        except Exception:  # noqa: BLE001 – la sesión ya estaba muerta
+            pass
+
+
+# ═════════════════════ grupo del proceso ═════════════════════════════════════
+_DEFAULT: Pkcs11Pool | None = None
+_DEFAULT_LOCK = threading.Lock()
+_reinit_pending: dict[str, bool] = {}
+
+
+def get_pkcs11_pool(pin: str, settings: Pkcs11Settings | None = None) -> Pkcs11Pool:
+    """Grupo de sesiones del proceso; se rehace si cambian la configuración o el PIN."""
+    global _DEFAULT
+    settings = settings or Pkcs11Settings.from_config()
+    with _DEFAULT_LOCK:
+        current = _DEFAULT
+        if current is not None and current.settings == settings and current._pin == pin:
+            return current
+        _DEFAULT = Pkcs11Pool(settings, pin)
+    if current is not None:
+        current.close()
+    return _DEFAULT
+
+
+def _forget_after_fork() -> None:
+    # Las sesiones del padre no son del hijo, y la biblioteca se reinicia.
+    global _DEFAULT, _DEFAULT_LOCK
+    if _DEFAULT is not None:
+        _reinit_pending[_DEFAULT.settings.lib] = True
+    _DEFAULT = None
+    _DEFAULT_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_after_fork)
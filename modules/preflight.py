@@ -0,0 +1,284 @@
+# coding: utf-8
+# modules/preflight.py · WolfSight-PDF
+"""
+Control previo de los documentos a anexar.
+
+Antes de unir, cada archivo se abre con PyMuPDF y se revisa:
+
+* que se pueda abrir y tenga páginas;
+* que no esté cifrado (la unión no descifra: fallaría al anexar);
+* tamaños de página distintos (en puntos, redondeados);
+* resolución efectiva de las imágenes (mínima y máxima, en DPI);
+* tamaño total en bytes;
+* fuentes usadas y cuáles no están incrustadas.
+
+Cada revisión se guarda en ``CACHE_DIR/preflight/<sha256>.json``: volver a
+elegir el mismo archivo es leer un JSON. ``preflight_many`` revisa los que
+faltan en procesos aparte (MuPDF no admite hilos concurrentes y el análisis
+de escaneos grandes es CPU pura) y devuelve los informes en el orden pedido.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Final, Iterable
+
+from modules import config, pdf_render
+from modules.hashing import get_hash_service
+
+_LOG = logging.getLogger("Preflight")
+_FORMAT: Final[int] = 1
+_MEMORY_ENTRIES: Final[int] = 128
+_MAX_PAGE_PT: Final[float] = 1191.0 * 1.02  # lado mayor de un A3, con tolerancia
+# Las 14 fuentes estándar no hace falta incrustarlas: todo lector las tiene.
+_BASE14: Final[frozenset[str]] = frozenset({
+    "Courier", "Courier-Bold", "Courier-Oblique", "Courier-BoldOblique",
+    "Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique",
+    "Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic", "Symbol", "ZapfDingbats",
+})
+
+
+@dataclass(slots=True, frozen=True)
+class PreflightReport:
+    """Resultado de revisar un documento. ``errors`` impide anexarlo."""
+    path: str
+    sha256: str
+    size_bytes: int
+    page_count: int
+    encrypted: bool
+    page_sizes: tuple[tuple[int, int], ...]   # distintos, en puntos (ancho, alto)
+    min_dpi: int | None                       # ``None`` si no hay imágenes
+    max_dpi: int | None
+    fonts: tuple[str, ...]
+    unembedded_fonts: tuple[str, ...]
+    errors: tuple[str, ...] = ()
+    warnings: tuple[str, ...] = ()
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> str:
+        """Una línea para listas: páginas, tamaño y resolución."""
+        if self.page_count == 0 and self.errors:
+            return self.errors[0]
+        parts = [f"{self.page_count} pág.", f"{self.size_bytes / (1024 * 1024):.1f} MB"]
+        if self.min_dpi is not None:
+            dpi = f"{self.min_dpi}" if self.min_dpi == self.max_dpi else f"{self.min_dpi}–{self.max_dpi}"
+            parts.append(f"{dpi} dpi")
+        return " · ".join(parts)
+
+    def details(self) -> str:
+        """Texto completo para descripciones emergentes."""
+        lines = [Path(self.path).name, self.summary()]
+        if self.page_sizes:
+            lines.append("Tamaños: " + ", ".join(f"{w}×{h} pt" for w, h in self.page_sizes))
+        if self.fonts:
+            lines.append(f"Fuentes: {len(self.fonts)} ({len(self.unembedded_fonts)} sin incrustar)")
+        lines.extend(f"✖ {msg}" for msg in self.errors)
+        lines.extend(f"⚠ {msg}" for msg in self.warnings)
+        return "\n".join(lines)
+
+    def to_json(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "PreflightReport":
+        return cls(
+            path=data["path"],
+            sha256=data["sha256"],
+            size_bytes=int(data["size_bytes"]),
+            page_count=int(data["page_count"]),
+            encrypted=bool(data["encrypted"]),
+            page_sizes=tuple((int(w), int(h)) for w, h in data["page_sizes"]),
+            min_dpi=data["min_dpi"],
+            max_dpi=data["max_dpi"],
+            fonts=tuple(data["fonts"]),
+            unembedded_fonts=tuple(data["unembedded_fonts"]),
+            errors=tuple(data["errors"]),
+            warnings=tuple(data["warnings"]),
+        )
+
+
+# ═════════════════════ revisión ══════════════════════════════════════════════
+def _image_dpi(info: dict[str, Any]) -> int | None:
+    x0, y0, x1, y1 = info["bbox"]
+    width_in, height_in = abs(x1 - x0) / 72.0, abs(y1 - y0) / 72.0
+    if width_in < 0.1 or height_in < 0.1:
+        return None  # íconos y adornos: no dicen nada de la calidad del escaneo
+    return round(min(info["width"] / width_in, info["height"] / height_in))
+
+
+def compute_report(path: str | Path, sha256: str) -> PreflightReport:
+    """Revisa ``path`` sin caché. No lanza: los problemas van en ``errors``."""
+    path = Path(path)
+    try:
+        size_bytes = path.stat().st_size
+    except OSError as exc:
+        return PreflightReport(str(path), sha256, 0, 0, False, (), None, None, (), (), (f"No se puede leer: {exc}",))
+
+    errors: list[str] = []
+    warnings: list[str] = []
+    sizes: dict[tuple[int, int], None] = {}
+    fonts: dict[str, bool] = {}
+    dpis: list[int] = []
+    page_count, encrypted = 0, False
+    with pdf_render.FITZ_LOCK:
+        try:
+            doc = pdf_render.open_document(path)
+        except Exception as exc:  # noqa: BLE001
+            errors.append(f"No es un PDF válido: {exc}")
+        else:
+            try:
+                encrypted = bool(doc.needs_pass or (doc.metadata or {}).get("encryption"))
+                if encrypted:
+                    errors.append("Está cifrado: quite la protección antes de anexarlo.")
+                else:
+                    page_count = doc.page_count
+                    for page in doc:
+                        rect = page.rect
+                        sizes.setdefault((round(rect.width), round(rect.height)), None)
+                        for info in page.get_image_info():
+                            dpi = _image_dpi(info)
+                            if dpi is not None:
+                                dpis.append(dpi)
+                        for _xref, ext, _type, basefont, *_rest in page.get_fonts():
+                            name = basefont.split("+", 1)[-1] or "(sin nombre)"
+                            fonts[name] = fonts.get(name, False) or ext != "n/a" or name in _BASE14
+            except Exception as exc:  # noqa: BLE001
+                errors.append(f"PDF dañado: {exc}")
+            finally:
+                doc.close()
+
+    if not errors and page_count == 0:
+        errors.append("No tiene páginas.")
+    min_dpi, max_dpi = (min(dpis), max(dpis)) if dpis else (None, None)
+    if min_dpi is not None and min_dpi < config.PREFLIGHT_MIN_DPI:
+        warnings.append(f"Imágenes de baja resolución ({min_dpi} dpi): puede ser ilegible.")
+    if max_dpi is not None and max_dpi > config.PREFLIGHT_MAX_DPI:
+        warnings.append(f"Imágenes de {max_dpi} dpi: el expediente crecerá de más.")
+    if size_bytes > config.PREFLIGHT_MAX_MB * 1024 * 1024:
+        warnings.append(f"Pesa {size_bytes / (1024 * 1024):.0f} MB (límite sugerido {config.PREFLIGHT_MAX_MB} MB).")
+    if any(max(w, h) > _MAX_PAGE_PT for w, h in sizes):
+        warnings.append("Tiene páginas más grandes que A3.")
+    unembedded = tuple(sorted(name for name, embedded in fonts.items() if not embedded))
+    if unembedded:
+        warnings.append("Fuentes sin incrustar: " + ", ".join(unembedded[:5]) + ("…" if len(unembedded) > 5 else ""))
+
+    return PreflightReport(
+        path=str(path),
+        sha256=sha256,
+        size_bytes=size_bytes,
+        page_count=page_count,
+        encrypted=encrypted,
+        page_sizes=tuple(sizes),
+        min_dpi=min_dpi,
+        max_dpi=max_dpi,
+        fonts=tuple(sorted(fonts)),
+        unembedded_fonts=unembedded,
+        errors=tuple(errors),
+        warnings=tuple(warnings),
+    )
+
+
+# ═════════════════════ caché ═════════════════════════════════════════════════
+_MEMORY: OrderedDict[str, PreflightReport] = OrderedDict()
+_MEMORY_LOCK = threading.Lock()
+
+
+def _cache_file(doc_sha256: str) -> Path:
+    return config.CACHE_DIR / "preflight" / f"{doc_sha256}.json"
+
+
+def _remember(report: PreflightReport) -> None:
+    with _MEMORY_LOCK:
+        _MEMORY[report.sha256] = report
+        _MEMORY.move_to_end(report.sha256)
+        while len(_MEMORY) > _MEMORY_ENTRIES:
+            _MEMORY.popitem(last=False)
+
+
+def _cached(path: Path, doc_sha256: str) -> PreflightReport | None:
+    with _MEMORY_LOCK:
+        report = _MEMORY.get(doc_sha256)
+        if report is not None:
+            _MEMORY.move_to_end(doc_sha256)
+    if report is None:
+        try:
+            data = json.loads(_cache_file(doc_sha256).read_text("utf-8"))
+            if data.get("format") == _FORMAT:
+                report = PreflightReport.from_json(data["report"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        if report is not None:
+            _remember(report)
+    if report is None:
+        return None
+    # El mismo contenido puede llegar con otro nombre.
+    return report if report.path == str(path) else _replace_path(report, path)
+
+
+def _replace_path(report: PreflightReport, path: Path) -> PreflightReport:
+    data = report.to_json()
+    data["path"] = str(path)
+    return PreflightReport.from_json(data)
+
+
+def _store(report: PreflightReport) -> None:
+    _remember(report)
+    if not report.sha256:
+        return
+    cache_file = _cache_file(report.sha256)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"format": _FORMAT, "report": report.to_json()}), encoding="utf-8")
+        tmp.replace(cache_file)
+    except OSError as exc:
+        _LOG.warning("No se pudo guardar el control previo de %s: %s", report.path, exc)
+
+
+def preflight(path: str | Path) -> PreflightReport:
+    """Informe de ``path``, desde memoria, disco o revisándolo (en ese orden)."""
+    return preflight_many([path], workers=1)[0]
+
+
+def preflight_many(paths: Iterable[str | Path], workers: int | None = None) -> list[PreflightReport]:
+    """Informes de ``paths`` en el mismo orden; los que faltan, en paralelo.
+
+    Los procesos se crean con ``spawn``: la interfaz tiene hilos de Qt vivos
+    y heredarlos con ``fork`` no es seguro.
+    """
+    paths = [Path(p).resolve() for p in paths]
+    # Ilegibles quedan con "" y sin caché: la revisión informa el error.
+    hashes = {path: digest or "" for path, digest in get_hash_service().sha256_many(paths).items()}
+
+    reports: dict[Path, PreflightReport] = {}
+    pending: list[Path] = []
+    for path in dict.fromkeys(paths):
+        cached = _cached(path, hashes[path]) if hashes[path] else None
+        if cached is not None:
+            reports[path] = cached
+        else:
+            pending.append(path)
+
+    workers = min(workers or config.PREFLIGHT_WORKERS or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        computed = [compute_report(path, hashes[path]) for path in pending]
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            computed = list(pool.map(compute_report, pending, [hashes[p] for p in pending]))
+    for report in computed:
+        reports[Path(report.path)] = report
+        _store(report)
+    _LOG.info("Control previo: %d archivos, %d revisados", len(reports), len(computed))
+    return [reports[path] for path in paths]
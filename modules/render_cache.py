@@ -0,0 +1,230 @@
+# coding: utf-8
+# modules/render_cache.py · WolfSight-PDF
+"""
+Caché de páginas rasterizadas compartida por todo el proceso.
+
+* Clave ``(hash del documento, página, zoom, rotación)``: la misma página
+  del mismo archivo se rasteriza una sola vez aunque la pidan varios
+  visores, la precarga o la impresión.
+* Presupuesto en bytes. Al excederlo se desaloja por LRU ponderado por
+  costo: entre las entradas menos usadas recientemente se descarta primero
+  la que menos tiempo de render ahorra por byte ocupado.
+* ``relieve_pressure`` reduce la caché cuando el proceso supera el límite
+  blando de memoria (ver ``MainWindow._check_memory_pressure``). Se mide
+  el RSS del proceso más el de sus hijos: los renderers de QtWebEngine son
+  procesos aparte y suelen ocupar más que la propia aplicación.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Final, NamedTuple
+
+from modules import config
+
+try:
+    import psutil  # opcional
+except ImportError:  # pragma: no cover
+    psutil = None  # type: ignore[assignment]
+
+_LOG = logging.getLogger("RenderCache")
+# Cuántas entradas del extremo frío del LRU compiten por ser desalojadas.
+_EVICTION_WINDOW: Final[int] = 8
+
+
+class RenderKey(NamedTuple):
+    doc_sha256: str
+    page: int
+    zoom: float
+    rotation: int = 0
+
+
+@dataclass(slots=True)
+class _Entry:
+    data: bytes
+    cost_s: float  # tiempo que costó rasterizarla
+
+
+@dataclass(slots=True, frozen=True)
+class CacheStats:
+    entries: int
+    bytes_used: int
+    budget: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class RenderCache:
+    """LRU con presupuesto en bytes y desalojo ponderado por costo."""
+
+    def __init__(self, budget_bytes: int | None = None) -> None:
+        self._budget = budget_bytes if budget_bytes is not None else config.RENDER_CACHE_BUDGET
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[RenderKey, _Entry] = OrderedDict()
+        self._used = 0
+        self._hits = self._misses = self._evictions = 0
+
+    # ——— API pública ——————————————————————————————————————————————
+    def get(self, key: RenderKey) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.data
+
+    def put(self, key: RenderKey, data: bytes, cost_s: float = 0.0) -> None:
+        size = len(data)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._used -= len(old.data)
+            # Una entrada que ocuparía más de un cuarto de la caché la vaciaría.
+            if size > self._budget // 4:
+                return
+            self._entries[key] = _Entry(data, cost_s)
+            self._used += size
+            self._evict_to(self._budget)
+
+    def get_or_render(self, key: RenderKey, render: Callable[[], bytes]) -> bytes:
+        data = self.get(key)
+        if data is None:
+            started = time.perf_counter()
+            data = render()
+            self.put(key, data, time.perf_counter() - started)
+        return data
+
+    def invalidate(self, doc_sha256: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.doc_sha256 == doc_sha256]:
+                self._used -= len(self._entries.pop(key).data)
+
+    def trim(self, target_bytes: int) -> int:
+        """Reduce la caché a ``target_bytes``; devuelve los bytes liberados."""
+        with self._lock:
+            before = self._used
+            self._evict_to(max(target_bytes, 0))
+            return before - self._used
+
+    def clear(self) -> None:
+        self.trim(0)
+
+    def set_budget(self, budget_bytes: int) -> None:
+        with self._lock:
+            self._budget = max(budget_bytes, 0)
+            self._evict_to(self._budget)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                entries=len(self._entries),
+                bytes_used=self._used,
+                budget=self._budget,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+            )
+
+    def relieve_pressure(self, rss: int | None = None, soft_limit: int | None = None) -> int:
+        """Si el proceso supera el límite blando, libera la mitad de la caché."""
+        rss = process_rss(children=True) if rss is None else rss
+        limit = config.MEMORY_SOFT_LIMIT if soft_limit is None else soft_limit
+        if rss is None or limit <= 0 or rss <= limit:
+            return 0
+        freed = self.trim(self._used // 2)
+        if freed:
+            _LOG.info("Presión de memoria (RSS %d MiB): se liberaron %d KiB de la caché.", rss >> 20, freed >> 10)
+        return freed
+
+    # ——— desalojo ——————————————————————————————————————————————————
+    def _evict_to(self, target: int) -> None:
+        while self._used > target and self._entries:
+            cold = []
+            for key in self._entries:  # del menos al más usado recientemente
+                cold.append(key)
+                if len(cold) == _EVICTION_WINDOW:
+                    break
+            victim = min(cold, key=lambda k: self._entries[k].cost_s / max(len(self._entries[k].data), 1))
+            self._used -= len(self._entries.pop(victim).data)
+            self._evictions += 1
+
+
+def process_rss(*, children: bool = False) -> int | None:
+    """Memoria residente del proceso en bytes (``None`` si no se puede medir).
+
+    Con ``children`` suma la de todos los descendientes (los procesos de
+    Chromium de QtWebEngine).
+    """
+    if psutil is not None:
+        me = psutil.Process()
+        total = int(me.memory_info().rss)
+        for child in me.children(recursive=True) if children else []:
+            try:
+                total += int(child.memory_info().rss)
+            except psutil.Error:
+                continue  # terminó entre la enumeración y la lectura
+        return total
+    if sys.platform.startswith("linux"):
+        own = _proc_rss(os.getpid())
+        if own is None or not children:
+            return own
+        return own + sum(_proc_rss(pid) or 0 for pid in _proc_descendants(os.getpid()))
+    return None
+
+
+def _proc_rss(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _proc_descendants(pid: int) -> list[int]:
+    """Descendientes de ``pid`` según ``/proc/<pid>/stat`` (sin psutil)."""
+    kids: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as fp:
+                # El nombre va entre paréntesis y puede tener espacios.
+                parent = int(fp.read().rsplit(b")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        kids.setdefault(parent, []).append(int(entry))
+    found: list[int] = []
+    pending = [pid]
+    while pending:
+        children = kids.get(pending.pop(), [])
+        found.extend(children)
+        pending.extend(children)
+    return found
+
+
+_DEFAULT: RenderCache | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Instancia compartida por todos los visores y servicios del proceso."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = RenderCache()
+        return _DEFAULT
@@ -8,26 +8,40 @@ from __future__ import annotations
 
 import datetime as _dt
 import hashlib
+import itertools
 import json
 import logging
+import threading
+import time
 import uuid
+from contextlib import ExitStack
 from dataclasses import dataclass, asdict  # <-- 1. IMPORTAR asdict
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Final, Tuple
+from typing import Any, Final, Iterable, Mapping, Tuple, cast
 
 import qrcode
 import qrcode.constants as qr_const
-from PyPDF2 import PdfReader, PdfWriter
 from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
-from pyhanko.sign import signers
-from pyhanko.sign.fields import SigFieldSpec
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfgen import canvas
+from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.sign import fields, signers
+from pyhanko.sign.fields import SigFieldSpec, enumerate_sig_fields
+from pyhanko.sign.validation import validate_pdf_signature, validate_pdf_timestamp
+
+from modules import config
+from modules.analytics import analytics_dir_for, get_signing_stats
+from modules.atomic_io import write_atomic
+from modules.document_session import DocumentSession, acquire, hold, release
+from modules.hashing import get_hash_service
+from modules.ltv import check_level, get_ltv_service
+from modules.pdf_tools import append_pages
+from modules.pkcs11_signer import Pkcs11Pool
+from modules.stamping import build_stamp, stamp_pages
 
 _LOG = logging.getLogger("SignatureManager")
 _JSON_FILE: Final[Path] = Path("validaciones.json")
 
+
 @dataclass(slots=True, frozen=True)
 class ValidationRecord:
     code: str
@@ -35,53 +49,188 @@ class ValidationRecord:
     datetime_utc: str
     file_name: str
     sha256: str
+    # Para estadísticas; los registros anteriores no los tienen.
+    office: str = ""
+    size_bytes: int = 0
+    elapsed_ms: float | None = None
+
+    @classmethod
+    def from_dict(cls, item: Mapping[str, Any]) -> "ValidationRecord":
+        """Desde el JSON del almacén, ignorando claves de otras versiones.
+
+        Lanza ``TypeError`` si falta algún campo obligatorio.
+        """
+        return cls(**{k: v for k, v in item.items() if k in cls.__dataclass_fields__})
+
+@dataclass(slots=True, frozen=True)
+class SignatureStatus:
+    field_name: str
+    signer: str
+    signing_time: str | None
+    intact: bool
+    trusted: bool
+    coverage: str
 
 class SignatureManager:
     def __init__(self, store_path: str | Path | None = None) -> None:
         self._store = Path(store_path or _JSON_FILE).resolve()
+        self._store_lock = threading.Lock()
         if not self._store.exists():
             self._store.write_text("[]", encoding="utf-8")
 
+    @property
+    def store_path(self) -> Path:
+        return self._store
+
     def sign_pdf(
         self,
         *,
         pdf_in: str | Path,
         pdf_out: str | Path,
-        pfx_path: str | Path,
-        pfx_password: str,
+        pfx_path: str | Path | None = None,
+        pfx_password: str = "",
+        pkcs11: Pkcs11Pool | None = None,
+        user: str = "demo_user",
+        qr_pos: tuple[float, float] = (50.0, 50.0),
+        qr_size: float = 100.0,
+        validation_base_url: str = "https://intranet-demo/validar?codigo=",
+        reason: str = "Firma de conformidad",
+        persist: bool = True,
+        session: DocumentSession | None = None,
+        all_pages: bool | None = None,
+        level: str | None = None,
+    ) -> Tuple[ValidationRecord, bytes]:
+        """Estampa el QR y firma como actualización incremental de ``pdf_in``.
+
+        Con ``all_pages`` (por defecto ``config.STAMP_ALL_PAGES``) el sello
+        va en todas las páginas; si no, sólo en la primera. ``level`` es el
+        nivel PAdES (por defecto ``config.PADES_LEVEL``, ver ``modules.ltv``).
+        Se firma con ``pfx_path`` o, si se pasa ``pkcs11``, con una sesión
+        prestada del token (ver ``modules.pkcs11_signer``).
+        """
+        # Retenida mientras el escritor lee de su mapa.
+        session = session.acquire() if session is not None else acquire(Path(pdf_in).resolve())
+        try:
+            return self._stamp_and_sign(
+                IncrementalPdfFileWriter(session.stream()),
+                pdf_out=pdf_out,
+                pfx_path=pfx_path,
+                pfx_password=pfx_password,
+                pkcs11=pkcs11,
+                user=user,
+                qr_pos=qr_pos,
+                qr_size=qr_size,
+                validation_base_url=validation_base_url,
+                reason=reason,
+                persist=persist,
+                all_pages=all_pages,
+                level=level,
+            )
+        finally:
+            session.release()
+
+    def annex_and_sign(
+        self,
+        *,
+        pdf_in: str | Path,
+        annex_paths: Iterable[str | Path],
+        pdf_out: str | Path,
+        pfx_path: str | Path | None = None,
+        pfx_password: str = "",
+        pkcs11: Pkcs11Pool | None = None,
         user: str = "demo_user",
         qr_pos: tuple[float, float] = (50.0, 50.0),
         qr_size: float = 100.0,
         validation_base_url: str = "https://intranet-demo/validar?codigo=",
         reason: str = "Firma de conformidad",
+        persist: bool = True,
+        all_pages: bool | None = None,
+        level: str | None = None,
     ) -> Tuple[ValidationRecord, bytes]:
-        in_path = Path(pdf_in).resolve()
+        """Anexa, estampa el QR y firma en una única revisión incremental.
+
+        El expediente original queda intacto como primera revisión; las
+        páginas anexadas, el sello y la firma se escriben de una sola vez.
+        """
+        with ExitStack() as held:
+            base = held.enter_context(hold(Path(pdf_in).resolve()))
+            w = IncrementalPdfFileWriter(base.stream())
+            for annex in annex_paths:
+                append_pages(w, held.enter_context(hold(annex)).hanko_reader)
+            return self._stamp_and_sign(
+                w,
+                pdf_out=pdf_out,
+                pfx_path=pfx_path,
+                pfx_password=pfx_password,
+                pkcs11=pkcs11,
+                user=user,
+                qr_pos=qr_pos,
+                qr_size=qr_size,
+                validation_base_url=validation_base_url,
+                reason=reason,
+                persist=persist,
+                all_pages=all_pages,
+                level=level,
+            )
+
+    def _stamp_and_sign(
+        self,
+        w: IncrementalPdfFileWriter,
+        *,
+        pdf_out: str | Path,
+        pfx_path: str | Path | None,
+        pfx_password: str,
+        pkcs11: Pkcs11Pool | None,
+        user: str,
+        qr_pos: tuple[float, float],
+        qr_size: float,
+        validation_base_url: str,
+        reason: str,
+        persist: bool,
+        all_pages: bool | None,
+        level: str | None,
+    ) -> Tuple[ValidationRecord, bytes]:
+        # El sello es un único Form XObject; cada página sólo lo referencia,
+        # así que estampar todas cuesta casi lo mismo que estampar una.
+        started = time.perf_counter()
         out_path = Path(pdf_out).resolve()
-        pfx_path = Path(pfx_path).resolve()
+        level = check_level(level)
+        if (pfx_path is None) == (pkcs11 is None):
+            raise ValueError("Indique un certificado .pfx o un token PKCS#11 (uno de los dos).")
         code = uuid.uuid4().hex
         qr_png_data = self._generate_qr(validation_base_url + code)
-        pdf_with_qr_data = self._overlay_qr_in_memory(
-            pdf_in_path=in_path,
-            qr_png_data=qr_png_data,
-            code=code,
-            qr_pos=qr_pos,
-            qr_size=qr_size,
-        )
-        self._sign_with_pfx(
-            pdf_in_data=pdf_with_qr_data,
-            pdf_out_path=out_path,
-            pfx_path=pfx_path,
-            pfx_password=pfx_password,
-            reason=reason,
-        )
+        if all_pages is None:
+            all_pages = config.STAMP_ALL_PAGES
+        stamp = build_stamp(w, qr_png=qr_png_data, code=code, size=qr_size)
+        stamp_pages(w, stamp, position=qr_pos, pages=None if all_pages else (0,))
+
+        # Se firma en memoria: el SHA-256 del registro sale del mismo buffer
+        # que se escribe, sin releer el archivo de salida.
+        signed = BytesIO()
+        if pkcs11 is not None:
+            with pkcs11.signer() as signer:
+                self._sign_incremental(w, signed, signer=signer, reason=reason, level=level)
+        else:
+            signer = self._load_pfx(Path(cast(str, pfx_path)).resolve(), pfx_password)
+            self._sign_incremental(w, signed, signer=signer, reason=reason, level=level)
+        data = signed.getbuffer()
+        digest = hashlib.sha256(data).hexdigest()
+        release(out_path)
+        write_atomic(out_path, data)
+        get_hash_service().remember(out_path, digest)
+
         record = ValidationRecord(
             code=code,
             user=user,
             datetime_utc=_dt.datetime.now(_dt.timezone.utc).isoformat(),
             file_name=out_path.name,
-            sha256=self._sha256(out_path),
+            sha256=digest,
+            office=config.OFFICE,
+            size_bytes=len(data),
+            elapsed_ms=round((time.perf_counter() - started) * 1000.0, 1),
         )
-        self._append_record(record)
+        if persist:
+            self._append_record(record)
         return record, qr_png_data
 
     @staticmethod
@@ -95,93 +244,160 @@ class SignatureManager:
             return buf.getvalue()
 
     @staticmethod
-    def _overlay_qr_in_memory(
-        *,
-        pdf_in_path: Path,
-        qr_png_data: bytes,
-        code: str,
-        qr_pos: tuple[float, float],
-        qr_size: float,
-    ) -> BytesIO:
-        reader = PdfReader(pdf_in_path)
-        first_page = reader.pages[0]
-        overlay_bio = BytesIO()
-        w, h = (float(first_page.mediabox.width), float(first_page.mediabox.height))
-        c = canvas.Canvas(overlay_bio, pagesize=(w, h))
-        x, y = qr_pos
-        c.drawImage(ImageReader(BytesIO(qr_png_data)), x, y, width=qr_size, height=qr_size, mask="auto")
-        c.setFont("Helvetica", 8)
-        c.drawString(x, y - 10, f"Código de validación: {code}")
-        c.save()
-        overlay_bio.seek(0)
-        overlay_pdf = PdfReader(overlay_bio)
-        first_page.merge_page(overlay_pdf.pages[0])
-        writer = PdfWriter()
-        writer.clone_document_from_reader(reader)
-        output_pdf_bio = BytesIO()
-        writer.write(output_pdf_bio)
-        output_pdf_bio.seek(0)
-        return output_pdf_bio
-
-    @staticmethod
-    def _sign_with_pfx(
-        *,
-        pdf_in_data: BytesIO,
-        pdf_out_path: Path,
-        pfx_path: Path,
-        pfx_password: str,
-        reason: str
-    ) -> None:
+    def _load_pfx(pfx_path: Path, pfx_password: str) -> signers.Signer:
         signer = signers.SimpleSigner.load_pkcs12(
             pfx_file=pfx_path,
             passphrase=pfx_password.encode('utf-8')
         )
         if not signer:
             raise ValueError("No se pudo cargar el firmante desde el archivo PFX.")
+        return signer
 
+    @staticmethod
+    def _sign_incremental(
+        w: IncrementalPdfFileWriter,
+        output: Any,
+        *,
+        signer: signers.Signer,
+        reason: str,
+        level: str = "B-B",
+    ) -> None:
+        # Un documento ya firmado conserva su firma: la nueva va en otro campo.
+        taken = {name for name, _value, _ref in enumerate_sig_fields(w)}
+        field_name = next(f"Signature{n}" for n in itertools.count(1) if f"Signature{n}" not in taken)
+        timestamper = None
+        long_term: dict[str, Any] = {}
+        if level != "B-B":
+            # Sello de tiempo y revocación salen del servicio compartido: la
+            # sesión HTTP y la caché OCSP/CRL sirven para todo el lote.
+            ltv = get_ltv_service()
+            timestamper = ltv.require_timestamper()
+            long_term["subfilter"] = fields.SigSeedSubFilter.PADES
+            if level in ("B-LT", "B-LTA"):
+                long_term["embed_validation_info"] = True
+                long_term["validation_context"] = ltv.validation_context(
+                    [signer.signing_cert, *signer.cert_registry]
+                )
+                long_term["use_pades_lta"] = level == "B-LTA"
         signature_meta = signers.PdfSignatureMetadata(
             reason=reason,
             location="Resistencia, Chaco, Argentina",
-            field_name='Signature1'
+            field_name=field_name,
+            **long_term,
         )
         field_spec = SigFieldSpec(
-            sig_field_name='Signature1',
+            sig_field_name=field_name,
             box=(0, 0, 0, 0)
         )
-        w = IncrementalPdfFileWriter(pdf_in_data)
-        with pdf_out_path.open("wb") as outf:
-            signers.sign_pdf(
-                w,
-                signature_meta=signature_meta,
-                signer=signer,
-                new_field_spec=field_spec,
-                output=outf
-            )
+        signers.sign_pdf(
+            w,
+            signature_meta=signature_meta,
+            signer=signer,
+            timestamper=timestamper,
+            new_field_spec=field_spec,
+            output=output
+        )
 
     @staticmethod
-    def _sha256(path: Path) -> str:
-        digest = hashlib.sha256()
-        with path.open("rb") as fp:
-            for chunk in iter(lambda: fp.read(8192), b""):
-                digest.update(chunk)
-        return digest.hexdigest()
+    def verify_signatures(pdf_path: str | Path) -> tuple[SignatureStatus, ...]:
+        """Valida criptográficamente las firmas embebidas (sin raíces de confianza)."""
+        result: list[SignatureStatus] = []
+        with Path(pdf_path).open("rb") as fp:
+            reader = PdfFileReader(fp)
+            for sig in reader.embedded_signatures:
+                # Los sellos de archivo (PAdES B-LTA) también son firmas embebidas.
+                if sig.sig_object_type == "/DocTimeStamp":
+                    status = validate_pdf_timestamp(sig)
+                    signed_at = status.timestamp
+                else:
+                    status = validate_pdf_signature(sig)
+                    signed_at = status.signer_reported_dt
+                result.append(SignatureStatus(
+                    field_name=str(sig.field_name),
+                    signer=str(status.signing_cert.subject.human_friendly),
+                    signing_time=signed_at.isoformat() if signed_at else None,
+                    intact=bool(status.intact),
+                    trusted=bool(status.trusted),
+                    coverage=status.coverage.name if status.coverage else "",
+                ))
+        return tuple(result)
 
-    def _append_record(self, rec: ValidationRecord) -> None:
+    def load_records(self) -> list[ValidationRecord]:
         try:
             data = json.loads(self._store.read_text("utf-8"))
-            if not isinstance(data, list):
-                raise ValueError("La raíz del JSON no es una lista")
-        except (json.JSONDecodeError, ValueError, FileNotFoundError) as exc:
-            _LOG.warning("Archivo de validaciones corrupto o no encontrado, se reiniciará: %s", exc)
-            data: list[dict[str, Any]] = []
-        
-        # --- 2. USAR asdict(rec) EN LUGAR DE rec.__dict__ ---
-        data.append(asdict(rec))
-        
-        self._store.write_text(
-            json.dumps(data, indent=2, ensure_ascii=False),
-            encoding="utf-8"
-        )
+        except (json.JSONDecodeError, FileNotFoundError):
+            return []
+        records: list[ValidationRecord] = []
+        skipped = 0
+        for item in data if isinstance(data, list) else ():
+            try:
+                records.append(ValidationRecord.from_dict(item))
+            except (TypeError, AttributeError):
+                skipped += 1
+        if skipped:
+            _LOG.warning("%d registros ilegibles en %s; se ignoran", skipped, self._store)
+        return records
+
+    def append_records(self, records: Iterable[ValidationRecord]) -> None:
+        """Agrega varios registros con una única lectura y escritura del almacén."""
+        records = list(records)
+        with self._store_lock:
+            try:
+                data = json.loads(self._store.read_text("utf-8"))
+                if not isinstance(data, list):
+                    raise ValueError("La raíz del JSON no es una lista")
+            except FileNotFoundError:
+                data: list[dict[str, Any]] = []
+            except (json.JSONDecodeError, ValueError) as exc:
+                # Nunca se descarta un almacén ilegible: se aparta para poder
+                # recuperarlo (o reconstruirlo con «wolfsight rebuild-store»).
+                backup = self._backup_corrupt_store()
+                _LOG.error("Archivo de validaciones corrupto (%s); copia de resguardo en %s", exc, backup)
+                data = []
+
+            data.extend(asdict(rec) for rec in records)
+
+            self._store.write_text(
+                json.dumps(data, indent=2, ensure_ascii=False),
+                encoding="utf-8"
+            )
+        if config.ANALYTICS_ENABLED and records:
+            # Las estadísticas son derivadas: nunca impiden registrar una firma.
+            try:
+                get_signing_stats(analytics_dir_for(self._store)).append(records)
+            except (OSError, ValueError) as exc:
+                _LOG.warning("No se actualizaron las estadísticas de firma: %s", exc)
+
+    def update_hashes(self, changes: Mapping[str, tuple[str, str]]) -> int:
+        """Cambia ``sha256`` y ``file_name`` de los registros cuyo documento se
+        reescribió sin cambiar de firma (p. ej. al agregarle validación de
+        largo plazo). ``changes``: hash anterior → (hash nuevo, nombre nuevo).
+        """
+        if not changes:
+            return 0
+        with self._store_lock:
+            try:
+                data = json.loads(self._store.read_text("utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                return 0
+            updated = 0
+            for item in data:
+                change = changes.get(item.get("sha256")) if isinstance(item, dict) else None
+                if change is not None:
+                    item["sha256"], item["file_name"] = change
+                    updated += 1
+            if updated:
+                self._store.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+            return updated
+
+    def _backup_corrupt_store(self) -> Path:
+        stamp = _dt.datetime.now(_dt.timezone.utc).strftime("%Y%m%dT%H%M%S")
+        backup = self._store.with_name(f"{self._store.name}.corrupto-{stamp}")
+        self._store.replace(backup)
+        return backup
+
+    def _append_record(self, rec: ValidationRecord) -> None:
+        self.append_records((rec,))
 
 
 if __name__ == '__main__':
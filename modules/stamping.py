@@ -0,0 +1,192 @@
+# coding: utf-8
+# modules/stamping.py · WolfSight-PDF
+"""
+Sello de validación (QR + código) como *Form XObject* compartido.
+
+El sello se define una sola vez en el documento: un XObject de formulario
+con la imagen del QR y el texto «Código de validación: <código>». Cada
+página estampada recibe únicamente:
+
+* un stream ``q`` antepuesto (aísla el estado gráfico del contenido
+  original) y otro ``Q q 1 0 0 1 x y cm /WSQR… Do Q`` al final, ambos
+  compartidos entre todas las páginas con la misma posición;
+* la entrada ``/WSQR…`` en su diccionario ``/XObject`` de recursos.
+
+Nada del contenido existente se reescribe, así que sobre un
+``IncrementalPdfFileWriter`` el costo y el crecimiento del archivo son
+prácticamente constantes por página. Sin dependencias de Qt.
+"""
+
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Final, Iterable, Iterator
+
+from PIL import Image
+from pyhanko.pdf_utils import generic
+from pyhanko.pdf_utils.generic import pdf_name
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+_FONT_SIZE: Final[float] = 8.0
+_TEXT_GAP: Final[float] = 10.0
+_LABEL: Final[str] = "Código de validación: "
+
+
+@dataclass(slots=True, frozen=True)
+class Stamp:
+    """Sello ya agregado al escritor: nombre de recurso y referencia."""
+    name: str
+    ref: generic.IndirectObject
+
+
+def _image_xobject(qr_png: bytes) -> generic.StreamObject:
+    img = Image.open(BytesIO(qr_png))
+    if img.mode != "1":
+        img = img.convert("L")
+    return generic.StreamObject(
+        {
+            pdf_name("/Type"): pdf_name("/XObject"),
+            pdf_name("/Subtype"): pdf_name("/Image"),
+            pdf_name("/Width"): generic.NumberObject(img.width),
+            pdf_name("/Height"): generic.NumberObject(img.height),
+            pdf_name("/ColorSpace"): pdf_name("/DeviceGray"),
+            pdf_name("/BitsPerComponent"): generic.NumberObject(1 if img.mode == "1" else 8),
+            pdf_name("/Filter"): pdf_name("/FlateDecode"),
+        },
+        encoded_data=zlib.compress(img.tobytes()),
+    )
+
+
+def build_stamp(writer: Any, *, qr_png: bytes, code: str, size: float) -> Stamp:
+    """Agrega al escritor el XObject del sello (una vez por documento)."""
+    text = _LABEL + code
+    width = max(size, stringWidth(text, "Helvetica", _FONT_SIZE))
+    font = generic.DictionaryObject({
+        pdf_name("/Type"): pdf_name("/Font"),
+        pdf_name("/Subtype"): pdf_name("/Type1"),
+        pdf_name("/BaseFont"): pdf_name("/Helvetica"),
+        pdf_name("/Encoding"): pdf_name("/WinAnsiEncoding"),
+    })
+    content = (
+        f"q {size:g} 0 0 {size:g} 0 0 cm /Im0 Do Q "
+        f"BT /F1 {_FONT_SIZE:g} Tf 0 {-_TEXT_GAP:g} Td ("
+    ).encode("ascii") + text.encode("cp1252") + b") Tj ET"
+    form = generic.StreamObject(
+        {
+            pdf_name("/Type"): pdf_name("/XObject"),
+            pdf_name("/Subtype"): pdf_name("/Form"),
+            pdf_name("/BBox"): generic.ArrayObject(
+                generic.FloatObject(v) for v in (0, -_TEXT_GAP - 2, width, size)
+            ),
+            pdf_name("/Resources"): generic.DictionaryObject({
+                pdf_name("/XObject"): generic.DictionaryObject({
+                    pdf_name("/Im0"): writer.add_object(_image_xobject(qr_png)),
+                }),
+                pdf_name("/Font"): generic.DictionaryObject({
+                    pdf_name("/F1"): writer.add_object(font),
+                }),
+            }),
+        },
+        stream_data=content,
+    )
+    form.compress()
+    # Nombre único por código: un documento ya sellado puede volver a sellarse.
+    return Stamp(name=f"/WSQR{code[:8]}", ref=writer.add_object(form))
+
+
+# ═════════════════════ árbol de páginas ══════════════════════════════════════
+def _iter_pages(writer: Any) -> Iterator[tuple[int, generic.IndirectObject, Any, generic.IndirectObject]]:
+    """Recorre el árbol una sola vez: ``(índice, página, recursos, dueño)``.
+
+    ``recursos`` es el valor crudo (heredado si la página no tiene propio) y
+    ``dueño`` la referencia del nodo que lo contiene.
+    """
+    root_ref = writer.root.raw_get("/Pages")
+    stack: list[tuple[generic.IndirectObject, Any, Any]] = [(root_ref, None, None)]
+    index = 0
+    while stack:
+        node_ref, resources, owner = stack.pop()
+        node = node_ref.get_object()
+        if "/Resources" in node:
+            resources, owner = node.raw_get("/Resources"), node_ref
+        if "/Kids" in node:
+            stack.extend((kid, resources, owner) for kid in reversed(node["/Kids"]))
+        else:
+            yield index, node_ref, resources, owner
+            index += 1
+
+
+def _register(writer: Any, page_ref: generic.IndirectObject, resources: Any,
+              owner: Any, stamp: Stamp, seen: set[int]) -> None:
+    """Agrega ``stamp`` al ``/XObject`` de recursos que ve la página."""
+    page = page_ref.get_object()
+    if resources is None:
+        resources = generic.DictionaryObject()
+        page[pdf_name("/Resources")] = resources
+        owner = page_ref
+    if isinstance(resources, generic.IndirectObject):
+        owner, resources = resources, resources.get_object()
+    xobjects = resources.raw_get("/XObject") if "/XObject" in resources else None
+    if isinstance(xobjects, generic.IndirectObject):
+        owner, xobjects = xobjects, xobjects.get_object()
+    elif xobjects is None:
+        xobjects = resources[pdf_name("/XObject")] = generic.DictionaryObject()
+    # Los diccionarios de recursos suelen compartirse entre páginas.
+    if id(xobjects) in seen:
+        return
+    seen.add(id(xobjects))
+    xobjects[pdf_name(stamp.name)] = stamp.ref
+    if owner is not None:
+        writer.mark_update(owner)
+
+
+def _wrap_contents(writer: Any, page_ref: generic.IndirectObject,
+                   before: generic.IndirectObject, after: generic.IndirectObject, seen: set[int]) -> None:
+    page = page_ref.get_object()
+    raw = page.raw_get("/Contents") if "/Contents" in page else None
+    target = raw.get_object() if isinstance(raw, generic.IndirectObject) else raw
+    if isinstance(target, generic.ArrayObject):
+        if id(target) in seen:
+            return
+        seen.add(id(target))
+        target.insert(0, before)
+        target.append(after)
+        writer.mark_update(raw if isinstance(raw, generic.IndirectObject) else page_ref)
+        return
+    parts = [before, raw, after] if raw is not None else [after]
+    page[pdf_name("/Contents")] = generic.ArrayObject(parts)
+    writer.mark_update(page_ref)
+
+
+def stamp_pages(
+    writer: Any,
+    stamp: Stamp,
+    *,
+    position: tuple[float, float],
+    pages: Iterable[int] | None = None,
+) -> int:
+    """Estampa ``stamp`` en ``pages`` (todas si es ``None``). Devuelve cuántas.
+
+    Los dos streams de contenido se crean una vez y se referencian desde cada
+    página; sólo cambian los diccionarios de página y de recursos.
+    """
+    wanted = None if pages is None else set(pages)
+    x, y = position
+    before = writer.add_object(generic.StreamObject(stream_data=b"q\n"))
+    after = writer.add_object(generic.StreamObject(
+        stream_data=f"\nQ q 1 0 0 1 {x:g} {y:g} cm {stamp.name} Do Q\n".encode("ascii")
+    ))
+    seen_resources: set[int] = set()
+    seen_contents: set[int] = set()
+    count = 0
+    for index, page_ref, resources, owner in _iter_pages(writer):
+        if wanted is not None and index not in wanted:
+            continue
+        _register(writer, page_ref, resources, owner, stamp, seen_resources)
+        _wrap_contents(writer, page_ref, before, after, seen_contents)
+        count += 1
+        if wanted is not None and count == len(wanted):
+            break
+    return count
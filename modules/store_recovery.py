@@ -0,0 +1,174 @@
+# coding: utf-8
+# modules/store_recovery.py · WolfSight-PDF
+"""
+Reconstrucción del almacén de validaciones a partir de los PDF firmados.
+
+De cada archivo se lee sólo lo imprescindible, con el lector perezoso de
+PyPDF2 (tabla xref + los objetos pedidos, nunca el documento entero):
+
+* el código de validación, del sello de la página 1 (el XObject ``/WSQR…``
+  que dibuja, o el contenido de la página en los archivos más viejos);
+* el firmante y la hora de firma, del CMS embebido en ``/Contents`` de la
+  última firma (``asn1crypto``, sin validar la cadena); los sellos de
+  tiempo de documento (``/DocTimeStamp``) no cuentan como firmas;
+* el SHA-256 del archivo, mediante el servicio de hashes compartido.
+
+``recover_record`` es una función de módulo para poder ejecutarse en un
+``ProcessPoolExecutor`` (ver ``python -m wolfsight rebuild-store``).
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import re
+from pathlib import Path
+from typing import Final
+
+from asn1crypto import cms
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject
+
+from modules.hashing import get_hash_service
+from modules.signature_manager import ValidationRecord
+
+# reportlab escribe «Código de validación: <código>» con escapes octales
+# (``\040`` = espacio, ``\072`` = dos puntos) y la «ó» como byte WinAnsi.
+_CODE_IN_STREAM: Final = re.compile(rb"validaci.{1,4}?n(?::|\\072)(?:\s|\\040)*([0-9a-f]{32})")
+_CODE_IN_TEXT: Final = re.compile(r"validaci[oó]n:\s*([0-9a-f]{32})")
+_PDF_DATE: Final = re.compile(r"D:(\d{14})(Z|[+-]\d{2}'?\d{2}'?)?")
+_STAMP_DO: Final = re.compile(rb"/(WSQR[0-9A-Za-z]*)\s+Do\b")
+
+
+def _page_content(page: DictionaryObject) -> bytes:
+    contents = page.get("/Contents")
+    if contents is None:
+        return b""
+    contents = contents.get_object()
+    streams = contents if isinstance(contents, ArrayObject) else [contents]
+    return b"".join(s.get_object().get_data() for s in streams)
+
+
+def extract_code(reader: PdfReader) -> str | None:
+    """Código de validación estampado en la página 1 (el último, si hay varios)."""
+    page = reader.pages[0]
+    content = _page_content(page)
+    codes = _CODE_IN_STREAM.findall(content)
+    if codes:
+        return codes[-1].decode("ascii")
+    # Sello actual: el texto vive en el XObject /WSQR… que dibuja la página.
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources is not None else None
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in reversed(_STAMP_DO.findall(content)):
+            form = xobjects.get("/" + name.decode("ascii"))
+            if form is None:
+                continue
+            codes = _CODE_IN_STREAM.findall(form.get_object().get_data())
+            if codes:
+                return codes[-1].decode("ascii")
+    # Respaldo: otros diseños de estampado.
+    texts = _CODE_IN_TEXT.findall(page.extract_text() or "")
+    return texts[-1] if texts else None
+
+
+def _signature_dicts(reader: PdfReader) -> list[DictionaryObject]:
+    acroform = reader.trailer["/Root"].get("/AcroForm")
+    if acroform is None:
+        return []
+    found: list[DictionaryObject] = []
+    pending = list(acroform.get_object().get("/Fields", []))
+    while pending:
+        field = pending.pop().get_object()
+        pending.extend(field.get("/Kids", []))
+        value = field.get("/V")
+        if field.get("/FT") != "/Sig" or value is None:
+            continue
+        value = value.get_object()
+        if value.get("/Type") == "/DocTimeStamp" or value.get("/SubFilter") == "/ETSI.RFC3161":
+            continue  # sello de tiempo de documento: el firmante sería la TSA
+        found.append(value)
+    return found
+
+
+def _parse_pdf_date(raw: str) -> _dt.datetime | None:
+    match = _PDF_DATE.match(raw)
+    if not match:
+        return None
+    stamp = _dt.datetime.strptime(match.group(1), "%Y%m%d%H%M%S")
+    tz = (match.group(2) or "Z").replace("'", "")
+    if tz == "Z":
+        return stamp.replace(tzinfo=_dt.timezone.utc)
+    sign = 1 if tz[0] == "+" else -1
+    offset = _dt.timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5] or 0))
+    return stamp.replace(tzinfo=_dt.timezone(sign * offset))
+
+
+def extract_signer(reader: PdfReader) -> tuple[str, _dt.datetime | None]:
+    """Firmante y hora de la firma más reciente (la que cubre más bytes)."""
+    sigs = _signature_dicts(reader)
+    if not sigs:
+        raise ValueError("El PDF no tiene firmas.")
+    signed_data = None
+    for sig in sorted(sigs, key=lambda d: sum(d.get("/ByteRange", [0, 0, 0, 0])[2:4]), reverse=True):
+        signed_data = cms.ContentInfo.load(bytes(sig["/Contents"]), strict=False)["content"]
+        # Un sello de tiempo sin /Type: su contenido encapsulado es un TSTInfo.
+        if signed_data["encap_content_info"]["content_type"].native != "tst_info":
+            break
+    else:
+        raise ValueError("El PDF sólo tiene sellos de tiempo, no firmas.")
+    signer_info = signed_data["signer_infos"][0]
+
+    signer = ""
+    sid = signer_info["sid"].chosen
+    for cert in signed_data["certificates"]:
+        cert = cert.chosen
+        if isinstance(sid, cms.IssuerAndSerialNumber):
+            matches = cert.issuer == sid["issuer"] and cert.serial_number == sid["serial_number"].native
+        else:
+            matches = cert.key_identifier == sid.native
+        if matches:
+            signer = cert.subject.native.get("common_name") or cert.subject.human_friendly
+            break
+
+    signed_at: _dt.datetime | None = None
+    for attr in signer_info["signed_attrs"] or []:
+        if attr["type"].native == "signing_time":
+            signed_at = attr["values"][0].native
+            break
+    if signed_at is None and "/M" in sig:
+        signed_at = _parse_pdf_date(str(sig["/M"]))
+    return signer, signed_at
+
+
+def recover_record(path: str | Path) -> ValidationRecord:
+    """Reconstruye el registro de validación de un PDF firmado por WolfSight."""
+    path = Path(path)
+    with path.open("rb") as fp:
+        reader = PdfReader(fp)
+        code = extract_code(reader)
+        if code is None:
+            raise ValueError("No se encontró el código de validación en la página 1.")
+        signer, signed_at = extract_signer(reader)
+    if signed_at is None:
+        signed_at = _dt.datetime.fromtimestamp(path.stat().st_mtime, _dt.timezone.utc)
+    return ValidationRecord(
+        code=code,
+        user=signer,
+        datetime_utc=signed_at.astimezone(_dt.timezone.utc).isoformat(),
+        file_name=path.name,
+        sha256=get_hash_service().sha256(path),
+        size_bytes=path.stat().st_size,
+    )
+
+
+def merge_into_store(existing: list[ValidationRecord], recovered: list[ValidationRecord]) -> list[ValidationRecord]:
+    """Registros recuperados que el almacén todavía no tiene (por código y hash)."""
+    known: set[str] = {r.code for r in existing} | {r.sha256 for r in existing}
+    fresh: list[ValidationRecord] = []
+    for rec in recovered:
+        if rec.code in known or rec.sha256 in known:
+            continue
+        known.update((rec.code, rec.sha256))
+        fresh.append(rec)
+    return fresh
@@ -0,0 +1,314 @@
+# coding: utf-8
+# modules/version_store.py · WolfSight-PDF
+"""
+Historial de versiones de expedientes almacenado por diferencias.
+
+El original se guarda una sola vez. Cada versión posterior se guarda como:
+
+* ``inc``   – sólo los bytes agregados, cuando la nueva versión es una
+  actualización incremental (empieza exactamente con su versión base);
+* ``delta`` – una diferencia binaria contra su versión base, cuando el
+  documento se reescribió.
+
+La base es la versión de la que partió la operación (``base``; 0 = la
+anterior, como en los índices viejos): firmar de nuevo una versión previa
+no encadena contra la última. Cualquier versión se reconstruye bajo demanda
+recorriendo sus bases hasta el original, y ``timeline`` lista quién firmó o
+anexó qué y cuándo.
+
+Estructura en disco::
+
+    <raíz>/<expediente>/index.json
+                       /v0001.pdf      (original)
+                       /v0002.inc
+                       /v0003.delta
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import hashlib
+import json
+import re
+import shutil
+import struct
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Final, Iterator
+
+from modules import config
+from modules.hashing import get_hash_service
+
+_INDEX: Final[str] = "index.json"
+_DELTA_MAGIC: Final[bytes] = b"WSD1"
+_MAX_CHUNK: Final[int] = 64 * 1024
+# Los límites de objetos y streams PDF sirven de puntos de corte estables:
+# un objeto renumerado o desplazado conserva intacto el cuerpo de su stream.
+_BOUNDARY: Final = re.compile(rb"endobj|stream\r?\n|endstream")
+_COPY: Final[bytes] = b"C"
+_INSERT: Final[bytes] = b"I"
+
+
+@dataclass(slots=True, frozen=True)
+class VersionEntry:
+    version: int
+    kind: str  # "full" | "inc" | "delta"
+    action: str  # "original" | "anexado" | "firmado" | …
+    user: str
+    datetime_utc: str
+    file_name: str
+    sha256: str
+    size: int
+    stored_bytes: int
+    note: str = ""
+    base: int = 0  # versión de partida; 0 = la anterior
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "VersionEntry":
+        return cls(**{k: v for k, v in item.items() if k in cls.__dataclass_fields__})
+
+    @property
+    def base_version(self) -> int:
+        return self.base or self.version - 1
+
+
+# ═════════════════════ diferencias binarias ══════════════════════════════════
+def _chunks(data: bytes) -> Iterator[tuple[int, int]]:
+    """Parte ``data`` en ``(inicio, fin)`` en los límites de objetos/streams."""
+    start = 0
+    for match in _BOUNDARY.finditer(data):
+        end = match.end()
+        while end - start > _MAX_CHUNK:
+            yield start, start + _MAX_CHUNK
+            start += _MAX_CHUNK
+        if end > start:
+            yield start, end
+            start = end
+    while start < len(data):
+        yield start, min(start + _MAX_CHUNK, len(data))
+        start += _MAX_CHUNK
+
+
+def make_delta(base: bytes, target: bytes) -> bytes:
+    """Codifica ``target`` como copias de ``base`` más inserciones literales."""
+    index: dict[bytes, int] = {}
+    for start, end in _chunks(base):
+        index.setdefault(base[start:end], start)
+
+    ops: list[bytes] = []
+    copy_off = copy_len = 0
+    pending = bytearray()
+
+    def flush_copy() -> None:
+        nonlocal copy_len
+        if copy_len:
+            ops.append(_COPY + struct.pack(">QI", copy_off, copy_len))
+            copy_len = 0
+
+    def flush_insert() -> None:
+        if pending:
+            ops.append(_INSERT + struct.pack(">I", len(pending)) + bytes(pending))
+            pending.clear()
+
+    for start, end in _chunks(target):
+        chunk = target[start:end]
+        found = index.get(chunk)
+        if found is None:
+            flush_copy()
+            pending += chunk
+        elif copy_len and copy_off + copy_len == found:
+            copy_len += len(chunk)
+        else:
+            flush_insert()
+            flush_copy()
+            copy_off, copy_len = found, len(chunk)
+    flush_insert()
+    flush_copy()
+    return _DELTA_MAGIC + zlib.compress(b"".join(ops), 6)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    if not delta.startswith(_DELTA_MAGIC):
+        raise ValueError("Formato de diferencia desconocido.")
+    ops = zlib.decompress(delta[len(_DELTA_MAGIC):])
+    out = bytearray()
+    pos = 0
+    while pos < len(ops):
+        op = ops[pos:pos + 1]
+        if op == _COPY:
+            offset, length = struct.unpack_from(">QI", ops, pos + 1)
+            out += base[offset:offset + length]
+            pos += 13
+        elif op == _INSERT:
+            (length,) = struct.unpack_from(">I", ops, pos + 1)
+            out += ops[pos + 5:pos + 5 + length]
+            pos += 5 + length
+        else:
+            raise ValueError(f"Operación de diferencia inválida en {pos}.")
+    return bytes(out)
+
+
+def _sha256_prefix(path: Path, size: int) -> str:
+    digest = hashlib.sha256()
+    remaining = size
+    with path.open("rb") as fp:
+        while remaining:
+            chunk = fp.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class VersionStore:
+    """Historial por expediente con almacenamiento proporcional a los cambios."""
+
+    def __init__(self, root: str | Path | None = None) -> None:
+        self._root = Path(root or config.VERSIONS_DIR).resolve()
+
+    # ——— consulta ——————————————————————————————————————————————————
+    def timeline(self, expediente: str) -> list[VersionEntry]:
+        index = self._dir(expediente) / _INDEX
+        if not index.exists():
+            return []
+        return [VersionEntry.from_dict(item) for item in json.loads(index.read_text("utf-8"))]
+
+    def latest(self, expediente: str) -> VersionEntry | None:
+        entries = self.timeline(expediente)
+        return entries[-1] if entries else None
+
+    def stored_bytes(self, expediente: str) -> int:
+        return sum(e.stored_bytes for e in self.timeline(expediente))
+
+    def reconstruct(self, expediente: str, version: int | None = None) -> bytes:
+        """Devuelve los bytes de ``version`` (la última si es ``None``)."""
+        entries = self.timeline(expediente)
+        if not entries:
+            raise KeyError(expediente)
+        by_version = {e.version: e for e in entries}
+        target = version or entries[-1].version
+        if target not in by_version:
+            raise KeyError(f"{expediente} v{target}")
+        chain = [by_version[target]]
+        while chain[-1].kind != "full":
+            base = by_version.get(chain[-1].base_version)
+            if base is None or base.version >= chain[-1].version:
+                raise ValueError(f"La versión {chain[-1].version} de {expediente} no tiene base.")
+            chain.append(base)
+
+        data = b""
+        for entry in reversed(chain):
+            blob = (self._dir(expediente) / self._blob_name(entry)).read_bytes()
+            if entry.kind == "full":
+                data = blob
+            elif entry.kind == "inc":
+                data = data + blob
+            else:
+                data = apply_delta(data, blob)
+            if hashlib.sha256(data).hexdigest() != entry.sha256:
+                raise ValueError(f"La versión {entry.version} de {expediente} está dañada.")
+        return data
+
+    def export(self, expediente: str, version: int, dest: str | Path) -> Path:
+        out = Path(dest)
+        out.write_bytes(self.reconstruct(expediente, version))
+        return out
+
+    # ——— alta de versiones —————————————————————————————————————————
+    def add_version(
+        self,
+        expediente: str,
+        pdf_path: str | Path,
+        *,
+        action: str,
+        user: str,
+        note: str = "",
+        base: VersionEntry | None = None,
+    ) -> VersionEntry:
+        """Agrega ``pdf_path`` derivada de ``base`` (la última versión si es ``None``)."""
+        path = Path(pdf_path)
+        folder = self._dir(expediente)
+        folder.mkdir(parents=True, exist_ok=True)
+        entries = self.timeline(expediente)
+        size = path.stat().st_size
+        sha = get_hash_service().sha256(path)
+        previous = base or (entries[-1] if entries else None)
+        if previous is not None and previous.sha256 == sha:
+            return previous
+
+        number = len(entries) + 1
+        if previous is None:
+            kind = "full"
+            blob_path = folder / f"v{number:04d}.pdf"
+            shutil.copyfile(path, blob_path)
+        elif size > previous.size and _sha256_prefix(path, previous.size) == previous.sha256:
+            kind = "inc"
+            blob_path = folder / f"v{number:04d}.inc"
+            with path.open("rb") as src, blob_path.open("wb") as dst:
+                src.seek(previous.size)
+                shutil.copyfileobj(src, dst)
+        else:
+            kind = "delta"
+            blob_path = folder / f"v{number:04d}.delta"
+            blob_path.write_bytes(
+                make_delta(self.reconstruct(expediente, previous.version), path.read_bytes())
+            )
+
+        entry = VersionEntry(
+            version=number,
+            kind=kind,
+            action=action,
+            user=user,
+            datetime_utc=_dt.datetime.now(_dt.timezone.utc).isoformat(),
+            file_name=path.name,
+            sha256=sha,
+            size=size,
+            stored_bytes=blob_path.stat().st_size,
+            note=note,
+            base=previous.version if previous is not None and previous.version != number - 1 else 0,
+        )
+        self._write_index(expediente, [*entries, entry])
+        return entry
+
+    def record_operation(
+        self,
+        expediente: str,
+        source: str | Path,
+        result: str | Path,
+        *,
+        action: str,
+        user: str,
+        note: str = "",
+    ) -> VersionEntry:
+        """Registra ``result`` como derivada de ``source``.
+
+        La versión de partida se busca por el hash de ``source``; si no está
+        en el historial (expediente nuevo o archivo modificado por fuera) se
+        guarda antes como versión propia.
+        """
+        sha = get_hash_service().sha256(source)
+        parent = next((e for e in reversed(self.timeline(expediente)) if e.sha256 == sha), None)
+        if parent is None:
+            parent = self.add_version(
+                expediente, source, action="original" if not self.timeline(expediente) else "externo", user=user
+            )
+        return self.add_version(expediente, result, action=action, user=user, note=note, base=parent)
+
+    # ——— utilidades ————————————————————————————————————————————————
+    def _dir(self, expediente: str) -> Path:
+        safe = re.sub(r"[^\w.-]", "_", expediente)
+        return self._root / safe
+
+    @staticmethod
+    def _blob_name(entry: VersionEntry) -> str:
+        suffix = {"full": "pdf", "inc": "inc", "delta": "delta"}[entry.kind]
+        return f"v{entry.version:04d}.{suffix}"
+
+    def _write_index(self, expediente: str, entries: list[VersionEntry]) -> None:
+        index = self._dir(expediente) / _INDEX
+        tmp = index.with_suffix(".tmp")
+        tmp.write_text(json.dumps([asdict(e) for e in entries], indent=2, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(index)
@@ -0,0 +1,284 @@
+# coding: utf-8
+# modules/worklist.py · WolfSight-PDF
+"""
+Lista de trabajo de expedientes con precarga en segundo plano.
+
+Mientras el operador trabaja sobre un expediente, los siguientes N de la
+cola se descargan, se verifica su hash, se parsea la xref, se rasteriza
+la primera página y se leen los datos del encabezado. Al avanzar, la
+pestaña muestra ese render al instante mientras el visor carga detrás.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Final, Iterable
+
+from modules import config, pdf_render
+from modules.document_session import hold
+from modules.hashing import HashCancelled, get_hash_service
+
+_LOG = logging.getLogger("Worklist")
+_ACTUACION_RE: Final = re.compile(r"[A-Z]-\d{6}-\d{4}")
+_FIRST_PAGE_ZOOM: Final[float] = 1.0
+
+Fetcher = Callable[[str, Path], Path]
+
+
+class PrefetchCancelled(Exception):
+    """La precarga se canceló porque el operador cambió de expediente."""
+
+
+@dataclass(slots=True, frozen=True)
+class WorklistItem:
+    ref: str  # ID del expediente o ruta local
+    expected_sha256: str | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class PrefetchedExpediente:
+    ref: str
+    local_path: Path
+    sha256: str
+    page_count: int
+    actuacion: str
+    titular: str
+    first_page_png: bytes  # vista previa mientras carga el visor
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.first_page_png)
+
+
+def local_fetcher(ref: str, cache_dir: Path) -> Path:
+    """Fetcher por defecto: el ``ref`` es una ruta local accesible."""
+    path = Path(ref)
+    if not path.is_file():
+        raise FileNotFoundError(ref)
+    return path
+
+
+def guess_actuacion(path: Path) -> str:
+    match = _ACTUACION_RE.search(path.stem)
+    return match.group(0) if match else path.stem
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class Worklist:
+    """Cola ordenada de expedientes con un cursor sobre el actual."""
+
+    def __init__(self, items: Iterable[WorklistItem | str] = ()) -> None:
+        self._items: list[WorklistItem] = []
+        self._index = -1
+        self.set_items(items)
+
+    def set_items(self, items: Iterable[WorklistItem | str]) -> None:
+        self._items = [i if isinstance(i, WorklistItem) else WorklistItem(str(i)) for i in items]
+        self._index = -1
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def current(self) -> WorklistItem | None:
+        if 0 <= self._index < len(self._items):
+            return self._items[self._index]
+        return None
+
+    def advance(self) -> WorklistItem | None:
+        if self._index + 1 >= len(self._items):
+            return None
+        self._index += 1
+        return self._items[self._index]
+
+    def jump_to(self, index: int) -> WorklistItem:
+        if not 0 <= index < len(self._items):
+            raise IndexError(index)
+        self._index = index
+        return self._items[index]
+
+    def refs(self) -> list[str]:
+        return [item.ref for item in self._items]
+
+    def upcoming(self, count: int) -> list[WorklistItem]:
+        start = self._index + 1
+        return self._items[start : start + max(count, 0)]
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class WorklistPrefetcher:
+    """
+    Precarga en segundo plano los próximos expedientes de una ``Worklist``.
+
+    Los resultados ocupan como máximo ``memory_budget`` bytes en RAM y las
+    copias descargadas ``disk_budget`` bytes en ``cache_dir``. Cada llamada a
+    ``schedule`` cancela lo que ya no forma parte de la ventana pedida.
+    """
+
+    def __init__(
+        self,
+        *,
+        depth: int = config.PREFETCH_DEPTH,
+        memory_budget: int = config.PREFETCH_MEMORY_BUDGET,
+        disk_budget: int = config.PREFETCH_DISK_BUDGET,
+        cache_dir: str | Path | None = None,
+        fetcher: Fetcher = local_fetcher,
+    ) -> None:
+        self.depth = depth
+        self._memory_budget = memory_budget
+        self._disk_budget = disk_budget
+        self._cache_dir = Path(cache_dir or config.CACHE_DIR / "prefetch")
+        self._fetcher = fetcher
+
+        self._lock = threading.RLock()
+        self._ready: OrderedDict[str, PrefetchedExpediente] = OrderedDict()
+        self._jobs: dict[str, tuple[Future[PrefetchedExpediente], threading.Event]] = {}
+        self._wanted: list[str] = []
+        self._pinned: set[Path] = set()
+        self._memory_used = 0
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+
+    # ——— API pública ——————————————————————————————————————————————
+    def schedule(self, items: Iterable[WorklistItem]) -> None:
+        """Precarga exactamente ``items`` (hasta ``depth``) y cancela el resto."""
+        wanted = list(items)[: self.depth]
+        with self._lock:
+            self._wanted = [i.ref for i in wanted]
+            for ref in [r for r in self._jobs if r not in self._wanted]:
+                future, cancel = self._jobs.pop(ref)
+                cancel.set()
+                future.cancel()
+            for item in wanted:
+                if item.ref in self._ready or item.ref in self._jobs:
+                    continue
+                cancel = threading.Event()
+                future = self._pool.submit(self._prefetch, item, cancel)
+                self._jobs[item.ref] = (future, cancel)
+                future.add_done_callback(lambda f, ref=item.ref: self._on_done(ref, f))
+
+    def cancel_all(self) -> None:
+        self.schedule(())
+
+    def take(self, ref: str) -> PrefetchedExpediente | None:
+        """Entrega (y retira de la caché) el expediente precargado, si está listo."""
+        with self._lock:
+            item = self._ready.pop(ref, None)
+            if item is None:
+                return None
+            self._memory_used -= item.nbytes
+            self._pinned = {item.local_path}
+            return item
+
+    def fetch_now(self, ref: str) -> Path:
+        """Camino en frío: obtiene el archivo sin esperar a la precarga."""
+        return self._fetcher(ref, self._cache_dir)
+
+    def shutdown(self) -> None:
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # ——— trabajo en segundo plano ——————————————————————————————————
+    def _prefetch(self, item: WorklistItem, cancel: threading.Event) -> PrefetchedExpediente:
+        self._check(cancel)
+        local = self._fetcher(item.ref, self._cache_dir)
+        self._trim_disk()
+
+        try:
+            digest = get_hash_service().sha256(local, cancel)
+        except HashCancelled:
+            raise PrefetchCancelled() from None
+        if item.expected_sha256 and digest != item.expected_sha256.lower():
+            raise ValueError(f"El hash de {item.ref} no coincide con el esperado.")
+
+        actuacion = guess_actuacion(local)
+        titular = "(sin datos)"
+        page_count = 0
+        first_page = b""
+        if pdf_render.is_available():
+            self._check(cancel)
+            # La sesión queda en el registro: al abrirse el expediente se reutiliza.
+            with hold(local) as session:
+                doc = session.fitz_document
+                with pdf_render.FITZ_LOCK:
+                    page_count = doc.page_count
+                    meta = doc.metadata or {}
+                titular = meta.get("author") or meta.get("subject") or titular
+                if page_count:
+                    self._check(cancel)
+                    first_page = pdf_render.render_page_png_cached(doc, digest, 0, _FIRST_PAGE_ZOOM)
+
+        return PrefetchedExpediente(
+            ref=item.ref,
+            local_path=local,
+            sha256=digest,
+            page_count=page_count,
+            actuacion=actuacion,
+            titular=titular,
+            first_page_png=first_page,
+        )
+
+    def _on_done(self, ref: str, future: Future[PrefetchedExpediente]) -> None:
+        try:
+            result = future.result()
+        except (CancelledError, PrefetchCancelled):
+            return
+        except Exception as exc:  # noqa: BLE001
+            _LOG.warning("Precarga fallida para %s: %s", ref, exc)
+            with self._lock:
+                self._jobs.pop(ref, None)
+            return
+
+        with self._lock:
+            job = self._jobs.get(ref)
+            if job is None or job[0] is not future:
+                return
+            del self._jobs[ref]
+            if ref not in self._wanted:
+                return
+            self._ready[ref] = result
+            self._memory_used += result.nbytes
+            self._trim_memory()
+
+    # ——— presupuestos ——————————————————————————————————————————————
+    def _trim_memory(self) -> None:
+        """Desaloja primero lo que salió de la ventana y luego lo más lejano."""
+        def distance(ref: str) -> int:
+            return self._wanted.index(ref) if ref in self._wanted else len(self._wanted)
+
+        while self._memory_used > self._memory_budget and self._ready:
+            victim = max(self._ready, key=distance)
+            self._memory_used -= self._ready.pop(victim).nbytes
+
+    def _trim_disk(self) -> None:
+        if not self._cache_dir.is_dir():
+            return
+        with self._lock:
+            keep = self._pinned | {item.local_path for item in self._ready.values()}
+        files = sorted(
+            (p for p in self._cache_dir.iterdir() if p.is_file()),
+            key=lambda p: p.stat().st_mtime,
+        )
+        total = sum(p.stat().st_size for p in files)
+        for path in files:
+            if total <= self._disk_budget:
+                break
+            if path in keep:
+                continue
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+    # ——— utilidades ————————————————————————————————————————————————
+    @staticmethod
+    def _check(cancel: threading.Event) -> None:
+        if cancel.is_set():
+            raise PrefetchCancelled()
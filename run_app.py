@@ -1,27 +1,62 @@
 # Archivo: run_app.py
+import multiprocessing
 import sys
-from PyQt6.QtWidgets import QApplication
-from ui.main_window import MainWindow
-from utils.resource_handler import resource_path
+from modules import config
+from utils.single_instance import InstanceServer, document_args, forward_to_running
 
 def load_main_stylesheet():
     """Carga la hoja de estilos principal de la aplicación."""
-    try:
-        qss_path = resource_path("ui/styles/main_style.qss")
-        # Se especifica la codificación UTF-8 para evitar errores
-        with open(qss_path, "r", encoding="utf-8") as f: # <<<--- CAMBIO AQUÍ
-            return f.read()
-    except FileNotFoundError:
+    qss = resources.stylesheet("styles/main_style.qss")
+    if not qss:
         print("Advertencia: No se encontró la hoja de estilos principal 'main_style.qss'.")
-        return ""
+    return qss
 
 if __name__ == '__main__':
+    # El control previo de anexos usa procesos «spawn» (necesario al empaquetar).
+    multiprocessing.freeze_support()
+    files = document_args(sys.argv[1:])
+    single = config.SINGLE_INSTANCE and "--new-instance" not in sys.argv
+
+    # Si ya hay una ventana abierta, le pasamos los archivos y terminamos
+    # antes de cargar la interfaz (QtWebEngine es lo que tarda).
+    if single and forward_to_running(files):
+        sys.exit(0)
+
+    from PyQt6.QtWidgets import QApplication
+    from ui import resources
+    from ui.main_window import MainWindow
+    from utils.responsiveness import ResponsivenessMonitor
+
     app = QApplication(sys.argv)
-    
+
+    # Escuchar antes de construir la ventana: lo que llegue mientras tanto
+    # se entrega apenas arranque el bucle de eventos.
+    server = None
+    if single:
+        server = InstanceServer(app)
+        if not server.listen():
+            if forward_to_running(files):
+                sys.exit(0)  # dos arranques simultáneos: ganó el otro
+            server = None
+        else:
+            app.aboutToQuit.connect(server.close)
+
+    resources.preload()
+
     stylesheet = load_main_stylesheet()
     if stylesheet:
         app.setStyleSheet(stylesheet)
-    
+
+    # Monitor de respuesta opcional (Ctrl+Shift+R muestra el resumen)
+    if config.RESPONSIVENESS_ENABLED or "--monitor" in sys.argv:
+        monitor = ResponsivenessMonitor()
+        monitor.start()
+        app.aboutToQuit.connect(monitor.stop)
+
     window = MainWindow()
+    if server is not None:
+        server.filesReceived.connect(window.open_files)
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    if files:
+        window.open_files(files)
+    sys.exit(app.exec())
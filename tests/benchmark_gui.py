@@ -0,0 +1,392 @@
+# coding: utf-8
+# tests/benchmark_gui.py · WolfSight-PDF
+"""
+Benchmark de punta a punta de la interfaz, sin pantalla.
+
+Maneja ``MainWindow`` como lo haría un operador y mide:
+
+* ``first_paint_ms``   – desde el arranque hasta el primer ``Paint`` de la ventana;
+* ``open_ms``          – por cada expediente de ``tests/``: abrirlo en una pestaña
+  hasta que el visor termina de cargar;
+* ``scroll_dispatch_ms`` – ruedas del mouse enviadas al visor hasta que el hilo
+  de la interfaz las despachó (latencia de entrada, no de pintado de Chromium);
+* ``annex_ms``         – cargar un documento al panel de anexo hasta que muestra
+  contenido;
+* ``sign_ms`` / ``sign_total_ms`` – firmar el expediente activo, y eso más
+  recargarlo en el visor;
+* pico de RSS del proceso y de sus hijos (los procesos de QtWebEngine),
+  muestreado cada 100 ms.
+
+Los documentos se copian a una carpeta temporal (nada se escribe en
+``tests/``) y la caché, el historial y el almacén de validaciones también
+van ahí, así que cada corrida arranca en frío. El resultado se guarda como
+JSON; con ``--compare`` se imprimen las diferencias contra una corrida
+anterior.
+
+    QT_QPA_PLATFORM=offscreen python tests/benchmark_gui.py -o bench.json
+    python tests/benchmark_gui.py -o bench2.json --compare bench.json
+
+No se llama ``test_*`` a propósito: no es parte de la suite de pytest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+_STARTED = time.perf_counter()
+_ROOT = Path(__file__).resolve().parent.parent
+_TESTS = _ROOT / "tests"
+_PFX = _TESTS / "credencials" / "certificado_prueba.pfx"
+_PFX_PASSWORD = "123456"
+
+# Antes de importar Qt y los módulos de la aplicación (leen el entorno al importarse).
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+_WORK = Path(tempfile.mkdtemp(prefix="wolfsight-bench-"))
+os.environ.setdefault("WOLFSIGHT_CACHE_DIR", str(_WORK / "cache"))
+os.environ.setdefault("WOLFSIGHT_VERSIONS_DIR", str(_WORK / "versiones"))
+sys.path.insert(0, str(_ROOT))
+os.chdir(_ROOT)  # resource_path() resuelve contra el directorio actual
+
+from PyQt6.QtCore import QEvent, QEventLoop, QObject, QPoint, QPointF, Qt, QTimer, pyqtBoundSignal  # noqa: E402
+from PyQt6.QtGui import QWheelEvent  # noqa: E402
+from PyQt6.QtWidgets import QApplication, QFileDialog, QInputDialog, QWidget  # noqa: E402
+
+try:
+    import psutil  # type: ignore
+except ImportError:  # pragma: no cover
+    psutil = None  # type: ignore[assignment]
+
+
+# ═════════════════════ memoria ═══════════════════════════════════════════════
+def _proc_tree_rss(pid: int) -> tuple[int, int]:
+    """RSS en bytes de ``pid`` y de todos sus descendientes (sin psutil: /proc)."""
+    page = os.sysconf("SC_PAGE_SIZE")
+    parents: dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as fp:
+                # El nombre va entre paréntesis y puede tener espacios.
+                parents[int(entry)] = int(fp.read().rsplit(b")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+
+    def rss(p: int) -> int:
+        try:
+            with open(f"/proc/{p}/statm", "rb") as fp:
+                return int(fp.read().split()[1]) * page
+        except (OSError, ValueError, IndexError):
+            return 0
+
+    children: list[int] = []
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        kids = [p for p, parent in parents.items() if parent == current]
+        children.extend(kids)
+        pending.extend(kids)
+    return rss(pid), sum(rss(p) for p in children)
+
+
+def tree_rss() -> tuple[int, int]:
+    """``(rss_propio, rss_hijos)`` en bytes."""
+    if psutil is not None:
+        me = psutil.Process()
+        total_children = 0
+        for child in me.children(recursive=True):
+            try:
+                total_children += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return me.memory_info().rss, total_children
+    if sys.platform.startswith("linux"):
+        return _proc_tree_rss(os.getpid())
+    return 0, 0
+
+
+class MemorySampler(QObject):
+    """Muestrea el RSS del árbol de procesos y conserva los picos."""
+
+    def __init__(self, interval_ms: int = 100) -> None:
+        super().__init__()
+        self.peak_self = self.peak_children = self.peak_total = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.sample)
+
+    def start(self) -> None:
+        self.sample()
+        self._timer.start()
+
+    def stop(self) -> None:
+        self._timer.stop()
+        self.sample()
+
+    def sample(self) -> None:
+        own, children = tree_rss()
+        self.peak_self = max(self.peak_self, own)
+        self.peak_children = max(self.peak_children, children)
+        self.peak_total = max(self.peak_total, own + children)
+
+    def as_dict(self) -> dict[str, float]:
+        mib = 1024 * 1024
+        return {
+            "peak_rss_self_mb": round(self.peak_self / mib, 1),
+            "peak_rss_children_mb": round(self.peak_children / mib, 1),
+            "peak_rss_total_mb": round(self.peak_total / mib, 1),
+        }
+
+
+# ═════════════════════ esperas ═══════════════════════════════════════════════
+def wait_for(signal: pyqtBoundSignal, timeout_s: float) -> float | None:
+    """Corre el bucle de eventos hasta que ``signal`` se emite. Devuelve ms o ``None``."""
+    loop = QEventLoop()
+    fired: list[float] = []
+    started = time.perf_counter()
+
+    def done(*_args: Any) -> None:
+        fired.append((time.perf_counter() - started) * 1000)
+        loop.quit()
+
+    signal.connect(done)
+    QTimer.singleShot(int(timeout_s * 1000), loop.quit)
+    loop.exec()
+    signal.disconnect(done)
+    return round(fired[0], 1) if fired else None
+
+
+def timed(action: Callable[[], Any], signal: pyqtBoundSignal, timeout_s: float) -> float | None:
+    """Conecta antes de actuar (la señal podría llegar dentro de ``action``)."""
+    loop = QEventLoop()
+    fired: list[float] = []
+    started = time.perf_counter()
+
+    def done(*_args: Any) -> None:
+        if not fired:
+            fired.append((time.perf_counter() - started) * 1000)
+        loop.quit()
+
+    signal.connect(done)
+    action()
+    if not fired:
+        QTimer.singleShot(int(timeout_s * 1000), loop.quit)
+        loop.exec()
+    signal.disconnect(done)
+    return round(fired[0], 1) if fired else None
+
+
+class _FirstPaint(QObject):
+    def __init__(self) -> None:
+        super().__init__()
+        self.at: float | None = None
+
+    def eventFilter(self, obj: QObject | None, event: QEvent | None) -> bool:  # noqa: N802
+        if self.at is None and event is not None and event.type() == QEvent.Type.Paint:
+            self.at = time.perf_counter()
+        return False
+
+
+# ═════════════════════ recorrido ═════════════════════════════════════════════
+def run(timeout_s: float, scroll_steps: int) -> dict[str, Any]:
+    samples = sorted(p for p in _TESTS.glob("*.pdf"))
+    if not samples:
+        raise SystemExit("No hay expedientes de muestra en tests/.")
+    docs = _WORK / "docs"
+    docs.mkdir()
+    copies = [Path(shutil.copy2(p, docs / p.name)) for p in samples]
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    from modules.signature_manager import SignatureManager
+    from ui import resources
+    from ui.main_window import MainWindow
+
+    memory = MemorySampler()
+    memory.start()
+    resources.preload()
+    qss = resources.stylesheet("styles/main_style.qss")
+    if qss:
+        app.setStyleSheet(qss)
+
+    first_paint = _FirstPaint()
+    window = MainWindow()
+    window.installEventFilter(first_paint)
+    window.signature_manager = SignatureManager(store_path=_WORK / "validaciones.json")
+    startup: list[float] = []
+    if window.main_viewer is not None:  # el documento de demostración que abre al arrancar
+        window.main_viewer.loadFinished.connect(lambda _ok: startup.append(time.perf_counter()))
+    window.show()
+    deadline = time.perf_counter() + timeout_s
+    while first_paint.at is None and time.perf_counter() < deadline:
+        app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 50)
+    metrics: dict[str, Any] = {
+        "first_paint_ms": round((first_paint.at - _STARTED) * 1000, 1) if first_paint.at else None,
+    }
+    if window.main_viewer is not None:
+        deadline = time.perf_counter() + timeout_s
+        while not startup and time.perf_counter() < deadline:
+            app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 50)
+        metrics["startup_document_ms"] = round((startup[0] - _STARTED) * 1000, 1) if startup else None
+
+    # ——— abrir cada expediente en su pestaña ———
+    open_ms: dict[str, float | None] = {}
+    for doc in copies:
+        # El visor nuevo se crea dentro de open_document: se espera la
+        # primera carga de la pestaña recién activada.
+        started = time.perf_counter()
+        window.tabs.open_document(str(doc), doc.stem, "BENCHMARK")
+        current = window.main_viewer
+        elapsed = wait_for(current.loadFinished, timeout_s) if current is not None else None
+        open_ms[doc.name] = round((time.perf_counter() - started) * 1000, 1) if elapsed is not None else None
+    metrics["open_ms"] = open_ms
+
+    # ——— desplazamiento ———
+    metrics["scroll_dispatch_ms"] = _scroll(app, window.main_viewer, scroll_steps)
+
+    # ——— panel de anexo ———
+    annex = copies[0]
+    _answer_open_dialog(str(annex))
+    metrics["annex_ms"] = timed(window._load_document_to_annex, window.annex_viewer.loadFinished, timeout_s)
+    window._close_annex_pane()
+
+    # ——— firma ———
+    _answer_open_dialog(str(_PFX))
+    QInputDialog.getText = staticmethod(lambda *a, **k: (_PFX_PASSWORD, True))  # type: ignore[method-assign]
+    import ui.main_window as main_window_module
+
+    main_window_module.SignedResultDialog.exec = lambda self: 0  # type: ignore[method-assign]
+    # Se firma el último expediente abierto (pestaña activa, visor ya cargado).
+    metrics["sign_document"] = Path(window.current_expediente_path or "").name
+    sign_pdf = window.signature_manager.sign_pdf
+    sign_times: list[float] = []
+
+    def timed_sign(**kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return sign_pdf(**kwargs)
+        finally:
+            sign_times.append((time.perf_counter() - started) * 1000)
+
+    window.signature_manager.sign_pdf = timed_sign  # type: ignore[method-assign]
+    viewer = window.main_viewer
+    total_ms = timed(window._sign_current_pdf, viewer.loadFinished, timeout_s) if viewer is not None else None
+    metrics["sign_ms"] = round(sign_times[0], 1) if sign_times else None
+    metrics["sign_total_ms"] = total_ms  # firma + recarga del visor
+    signed = window.current_expediente_path or ""
+    metrics["signed_ok"] = signed.endswith("-firmado.pdf") and Path(signed).exists() and total_ms is not None
+
+    memory.stop()
+    metrics.update(memory.as_dict())
+    window.close()
+    app.processEvents()
+    return metrics
+
+
+def _scroll(app: QApplication, viewer: QWidget | None, steps: int) -> dict[str, float] | None:
+    if viewer is None or steps <= 0:
+        return None
+    target = viewer.focusProxy() or viewer
+    center = QPointF(target.width() / 2, target.height() / 2)
+    times: list[float] = []
+    for _ in range(steps):
+        event = QWheelEvent(
+            center, target.mapToGlobal(center), QPoint(0, 0), QPoint(0, -120),
+            Qt.MouseButton.NoButton, Qt.KeyboardModifier.NoModifier, Qt.ScrollPhase.NoScrollPhase, False,
+        )
+        started = time.perf_counter()
+        app.sendEvent(target, event)
+        app.processEvents()
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "steps": steps,
+        "mean": round(statistics.fmean(times), 2),
+        "p95": round(sorted(times)[int(len(times) * 0.95) - 1], 2),
+        "max": round(max(times), 2),
+    }
+
+
+def _answer_open_dialog(path: str) -> None:
+    QFileDialog.getOpenFileName = staticmethod(lambda *a, **k: (path, ""))  # type: ignore[method-assign]
+    QFileDialog.getOpenFileNames = staticmethod(lambda *a, **k: ([path], ""))  # type: ignore[method-assign]
+
+
+# ═════════════════════ informe ═══════════════════════════════════════════════
+def _environment() -> dict[str, Any]:
+    from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=_ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "pyqt": PYQT_VERSION_STR,
+        "platform": platform.platform(),
+        "qpa": os.environ.get("QT_QPA_PLATFORM"),
+    }
+
+
+def _flatten(prefix: str, value: Any, out: dict[str, float]) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = float(value)
+
+
+def compare(previous: dict[str, Any], current: dict[str, Any]) -> list[str]:
+    before: dict[str, float] = {}
+    after: dict[str, float] = {}
+    _flatten("", previous.get("metrics", {}), before)
+    _flatten("", current.get("metrics", {}), after)
+    lines = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "—"
+        lines.append(f"{key:45s} {old:>10.1f} → {new:>10.1f}  {change}")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de la interfaz sin pantalla.")
+    parser.add_argument("-o", "--output", default=f"benchmark_gui-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Segundos máximos por espera.")
+    parser.add_argument("--scroll-steps", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="No borrar la carpeta temporal de trabajo.")
+    args = parser.parse_args(argv)
+
+    try:
+        result = {"environment": _environment(), "metrics": run(args.timeout, args.scroll_steps)}
+    finally:
+        if not args.keep:
+            shutil.rmtree(_WORK, ignore_errors=True)
+
+    output = Path(args.output).resolve()
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(json.dumps(result["metrics"], indent=2, ensure_ascii=False))
+    print(f"Resultado guardado en {output}")
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text("utf-8"))
+        print("\n".join(compare(previous, result)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# coding: utf-8
+# tests/test_cli.py · WolfSight-PDF
+"""
+Prueba de humo de la CLI: cada subcomando de archivos, de punta a punta.
+
+    python -m pytest tests/test_cli.py
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from wolfsight.cli import main
+
+_HERE = Path(__file__).parent
+_SAMPLE = _HERE / "E-010529-2025.pdf"
+_PFX = _HERE / "credencials" / "certificado_prueba.pfx"
+
+
+def _run(capsys: pytest.CaptureFixture[str], *argv: str) -> tuple[int, dict]:
+    code = main(list(argv))
+    out = capsys.readouterr().out
+    summary = json.loads(out[out.index("{"):])  # PyMuPDF puede avisar por stdout al importarse
+    return code, summary
+
+
+@pytest.fixture()
+def inbox(tmp_path: Path) -> Path:
+    folder = tmp_path / "expedientes"
+    folder.mkdir()
+    for n in range(2):
+        shutil.copyfile(_SAMPLE, folder / f"doc{n}.pdf")
+    return folder
+
+
+def test_sign_then_verify(inbox: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str],
+                          monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("WOLFSIGHT_PFX_PASSWORD", "123456")
+    store = str(tmp_path / "validaciones.json")
+    signed = tmp_path / "firmados"
+
+    code, summary = _run(capsys, "sign", str(inbox), "--pfx", str(_PFX), "--level", "B-B",
+                         "--store", store, "-o", str(signed))
+    assert code == 0, summary
+    assert summary["ok"] == 2
+
+    # Con procesos de trabajo, como en los lotes reales.
+    code, summary = _run(capsys, "verify", str(signed), "--store", store, "--jobs", "2")
+    assert code == 0, summary
+    assert all(r["record"] is not None and r["signatures"] for r in summary["results"])
+
+
+def test_page_commands(inbox: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    out = tmp_path / "salida"
+    code, summary = _run(capsys, "extract", str(inbox), "--pages", "1", "-o", str(out))
+    assert code == 0, summary
+    assert all(r["pages"] == 1 for r in summary["results"])
+
+    code, summary = _run(capsys, "split", str(inbox / "doc0.pdf"), "--parts", "2", "-o", str(out))
+    assert code == 0, summary
+
+    code, summary = _run(capsys, "annex", str(inbox / "doc0.pdf"), "--annex", str(inbox / "doc1.pdf"),
+                         "-o", str(out))
+    assert code == 0, summary
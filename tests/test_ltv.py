@@ -0,0 +1,246 @@
+# coding: utf-8
+# tests/test_ltv.py · WolfSight-PDF
+"""
+Firma de largo plazo contra un respondedor OCSP y una TSA locales.
+
+Se arma una PKI de prueba (raíz, firmante y TSA, con el OCSP apuntando a
+``127.0.0.1``) y un servidor HTTP que cuenta las consultas por número de
+serie: firmar un lote de N documentos tiene que consultar cada certificado
+una sola vez, y un proceso nuevo con la misma caché en disco, ninguna.
+
+    python -m pytest tests/test_ltv.py
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import shutil
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
+from asn1crypto import keys as asn1_keys
+from asn1crypto import tsp
+from asn1crypto import x509 as asn1_x509
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs12
+from cryptography.x509 import ocsp
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.sign.timestamps import DummyTimeStamper
+from pyhanko_certvalidator.registry import SimpleCertificateStore
+
+from modules import ltv
+from modules.ltv import LtvService, RevocationCache
+from modules.signature_manager import SignatureManager
+
+_SAMPLE = Path(__file__).with_name("E-010529-2025.pdf")
+_PASSWORD = "prueba"
+_DOCUMENTS = 4
+
+
+# ═════════════════════ PKI de prueba ═════════════════════════════════════════
+def _new_key() -> rsa.RSAPrivateKey:
+    # RSA: el sellador de prueba de pyHanko no firma con otras claves.
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _name(common_name: str) -> x509.Name:
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+
+def _issue(subject: str, key: Any, issuer: x509.Certificate | None, issuer_key: Any, *,
+           ocsp_url: str | None = None, ca: bool = False, tsa: bool = False) -> x509.Certificate:
+    now = _dt.datetime.now(_dt.timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(_name(subject))
+        .issuer_name(issuer.subject if issuer is not None else _name(subject))
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - _dt.timedelta(days=1))
+        .not_valid_after(now + _dt.timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .add_extension(x509.KeyUsage(
+            digital_signature=not ca, content_commitment=not ca and not tsa, key_encipherment=False,
+            data_encipherment=False, key_agreement=False, key_cert_sign=ca, crl_sign=ca,
+            encipher_only=False, decipher_only=False,
+        ), critical=True)
+    )
+    if ocsp_url:
+        builder = builder.add_extension(x509.AuthorityInformationAccess([
+            x509.AccessDescription(x509.AuthorityInformationAccessOID.OCSP, x509.UniformResourceIdentifier(ocsp_url)),
+        ]), critical=False)
+    if tsa:
+        builder = builder.add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.TIME_STAMPING]), critical=True)
+    return builder.sign(issuer_key, hashes.SHA256())
+
+
+def _asn1_cert(cert: x509.Certificate) -> asn1_x509.Certificate:
+    return asn1_x509.Certificate.load(cert.public_bytes(serialization.Encoding.DER))
+
+
+class _Pki:
+    """Raíz, firmante y TSA; el servidor responde OCSP y sellos de tiempo."""
+
+    def __init__(self, base_url: str) -> None:
+        self.root_key = _new_key()
+        self.root = _issue("Raíz de prueba", self.root_key, None, self.root_key, ca=True)
+        self.signer_key = _new_key()
+        self.signer = _issue("Firmante de prueba", self.signer_key, self.root, self.root_key,
+                             ocsp_url=f"{base_url}/ocsp")
+        self.tsa_key = _new_key()
+        self.tsa = _issue("TSA de prueba", self.tsa_key, self.root, self.root_key,
+                          ocsp_url=f"{base_url}/ocsp", tsa=True)
+        self.by_serial = {c.serial_number: c for c in (self.signer, self.tsa)}
+        self.ocsp_requests: Counter[int] = Counter()
+        self.tsa_requests = 0
+        self._stamper = DummyTimeStamper(
+            tsa_cert=_asn1_cert(self.tsa),
+            tsa_key=asn1_keys.PrivateKeyInfo.load(self.tsa_key.private_bytes(
+                serialization.Encoding.DER, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+            )),
+            certs_to_embed=SimpleCertificateStore.from_certs([_asn1_cert(self.root)]),
+        )
+
+    def write_pfx(self, path: Path) -> Path:
+        path.write_bytes(pkcs12.serialize_key_and_certificates(
+            b"firmante", self.signer_key, self.signer, [self.root],
+            serialization.BestAvailableEncryption(_PASSWORD.encode()),
+        ))
+        return path
+
+    def ocsp_response(self, body: bytes) -> bytes:
+        request = ocsp.load_der_ocsp_request(body)
+        self.ocsp_requests[request.serial_number] += 1
+        now = _dt.datetime.now(_dt.timezone.utc)
+        response = (
+            ocsp.OCSPResponseBuilder()
+            .add_response(
+                cert=self.by_serial[request.serial_number], issuer=self.root,
+                algorithm=request.hash_algorithm, cert_status=ocsp.OCSPCertStatus.GOOD,
+                this_update=now - _dt.timedelta(minutes=1), next_update=now + _dt.timedelta(hours=1),
+                revocation_time=None, revocation_reason=None,
+            )
+            .responder_id(ocsp.OCSPResponderEncoding.HASH, self.root)
+            .sign(self.root_key, hashes.SHA256())
+        )
+        return response.public_bytes(serialization.Encoding.DER)
+
+    def tsa_response(self, body: bytes) -> bytes:
+        self.tsa_requests += 1
+        return self._stamper.request_tsa_response(tsp.TimeStampReq.load(body)).dump()
+
+
+@pytest.fixture()
+def pki() -> Iterator[_Pki]:
+    holder: dict[str, _Pki] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if self.path == "/ocsp":
+                data, content_type = holder["pki"].ocsp_response(body), "application/ocsp-response"
+            else:
+                data, content_type = holder["pki"].tsa_response(body), "application/timestamp-reply"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *_args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    holder["pki"] = _Pki(f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        yield holder["pki"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture()
+def service(pki: _Pki, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> LtvService:
+    """Servicio compartido del proceso apuntando a la TSA local."""
+    port = pki.signer.extensions.get_extension_for_class(x509.AuthorityInformationAccess).value[0]
+    tsa_url = port.access_location.value.replace("/ocsp", "/tsa")
+    instance = LtvService(
+        tsa_urls=[tsa_url], cache=RevocationCache(tmp_path / "revocacion"), trust_roots_dir=tmp_path / "sin-raices",
+    )
+    monkeypatch.setattr(ltv, "_DEFAULT", instance)
+    return instance
+
+
+def _sign_batch(pki: _Pki, folder: Path, level: str) -> list[Path]:
+    pfx = pki.write_pfx(folder / "firmante.pfx")
+    manager = SignatureManager(store_path=folder / "validaciones.json")
+    outputs = []
+    for n in range(_DOCUMENTS):
+        src = shutil.copyfile(_SAMPLE, folder / f"doc{n}.pdf")
+        out = folder / f"doc{n}-firmado.pdf"
+        manager.sign_pdf(pdf_in=src, pdf_out=out, pfx_path=pfx, pfx_password=_PASSWORD,
+                         persist=False, level=level)
+        outputs.append(out)
+    return outputs
+
+
+# ═════════════════════ pruebas ═══════════════════════════════════════════════
+def test_batch_fetches_each_certificate_once(pki: _Pki, service: LtvService, tmp_path: Path) -> None:
+    outputs = _sign_batch(pki, tmp_path, "B-LT")
+
+    assert pki.ocsp_requests[pki.signer.serial_number] == 1
+    assert all(count == 1 for count in pki.ocsp_requests.values())
+    assert service.cache.fetches == len(pki.ocsp_requests)
+    for out in outputs:
+        with out.open("rb") as fp:
+            assert "/DSS" in PdfFileReader(fp).root
+
+    # Otro proceso con la misma caché en disco no vuelve a consultar.
+    before = sum(pki.ocsp_requests.values())
+    fresh = LtvService(tsa_urls=service.timestamper.urls, cache=RevocationCache(tmp_path / "revocacion"),
+                       trust_roots_dir=tmp_path / "sin-raices")
+    fresh.add_ltv(outputs[0], tmp_path / "otra-vez.pdf")
+    assert sum(pki.ocsp_requests.values()) == before
+    assert fresh.cache.fetches == 0 and fresh.cache.hits > 0
+
+
+def test_archival_covers_first_timestamp_tsa(pki: _Pki, service: LtvService, tmp_path: Path) -> None:
+    (signed,) = _sign_batch(pki, tmp_path, "B-B")[:1]
+    out = tmp_path / "lta.pdf"
+    service.add_ltv(signed, out, archival=True)
+
+    # Sin raíces configuradas igual se consulta la TSA del primer sello.
+    assert pki.ocsp_requests[pki.tsa.serial_number] == 1
+    with out.open("rb") as fp:
+        reader = PdfFileReader(fp)
+        kinds = [s.sig_object_type for s in reader.embedded_signatures]
+        assert kinds == ["/Sig", "/DocTimeStamp", "/DocTimeStamp"]
+        # La revisión previa al sello de archivo ya tiene la revocación de la TSA.
+        archival = reader.embedded_signatures[-1]
+        previous = reader.get_historical_resolver(archival.signed_revision - 1)
+        dss = previous.root["/DSS"]
+        assert len(dss["/OCSPs"]) >= 2
+
+
+def test_cache_reads_latest_generation(tmp_path: Path) -> None:
+    cache = RevocationCache(tmp_path)
+    folder = tmp_path / "ocsp"
+    folder.mkdir()
+    now = _dt.datetime.now(_dt.timezone.utc)
+    for hours, payload in ((1, b"vieja"), (5, b"nueva")):
+        stamp = (now + _dt.timedelta(hours=hours)).strftime("%Y%m%dT%H%M%SZ")
+        (folder / f"clave.{stamp}.0.der").write_bytes(payload)
+
+    entry = cache._read("ocsp", "clave", lambda ders: ders)
+    assert entry is not None
+    assert entry.items == [b"nueva"]
+    assert entry.expires > now + _dt.timedelta(hours=4)
@@ -0,0 +1,112 @@
+# coding: utf-8
+# tests/test_pkcs11.py · WolfSight-PDF
+"""
+Grupo de sesiones PKCS#11 contra SoftHSM2 (se omite sin ``WOLFSIGHT_PKCS11_LIB``).
+
+    softhsm2-util --init-token --free --label wolfsight --pin 1234 --so-pin 4321
+    export WOLFSIGHT_PKCS11_LIB=/usr/lib/softhsm/libsofthsm2.so
+    export WOLFSIGHT_PKCS11_TOKEN=wolfsight WOLFSIGHT_PKCS11_PIN=1234
+    python -m pytest tests/test_pkcs11.py
+
+Si el token no tiene la clave ``WOLFSIGHT_PKCS11_KEY_LABEL`` (``firmante``
+por defecto), se importa la del certificado de prueba.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+if not os.environ.get("WOLFSIGHT_PKCS11_LIB"):
+    pytest.skip("WOLFSIGHT_PKCS11_LIB no está definido (SoftHSM2)", allow_module_level=True)
+pkcs11 = pytest.importorskip("pkcs11")
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.serialization import pkcs12  # noqa: E402
+from pkcs11 import Attribute, ObjectClass  # noqa: E402
+from pkcs11.util.rsa import decode_rsa_private_key  # noqa: E402
+from pkcs11.util.x509 import decode_x509_certificate  # noqa: E402
+
+from modules.pkcs11_signer import Pkcs11Pool, Pkcs11Settings  # noqa: E402
+from modules.signature_manager import SignatureManager  # noqa: E402
+
+_HERE = Path(__file__).parent
+_SAMPLE = _HERE / "E-010529-2025.pdf"
+_PFX = _HERE / "credencials" / "certificado_prueba.pfx"
+_PFX_PASSWORD = b"123456"
+_PIN = os.environ.get("WOLFSIGHT_PKCS11_PIN", "1234")
+_KEY_ID = b"\x57\x53"
+
+
+@pytest.fixture(scope="module")
+def settings() -> Pkcs11Settings:
+    settings = Pkcs11Settings.from_config(key_label=os.environ.get("WOLFSIGHT_PKCS11_KEY_LABEL") or "firmante")
+    _provision(settings)
+    return settings
+
+
+def _provision(settings: Pkcs11Settings) -> None:
+    """Importa clave y certificado de prueba si el token todavía no los tiene."""
+    lib = pkcs11.lib(settings.lib)
+    slots = lib.get_slots(token_present=True)
+    tokens = [slot.get_token() for slot in slots]
+    token = next(t for t in tokens if settings.token_label in (None, t.label))
+    with token.open(rw=True, user_pin=_PIN) as session:
+        found = list(session.get_objects({Attribute.CLASS: ObjectClass.PRIVATE_KEY, Attribute.LABEL: settings.key_label}))
+        if found:
+            return
+        key, cert, _extra = pkcs12.load_key_and_certificates(_PFX.read_bytes(), _PFX_PASSWORD)
+        der_key = key.private_bytes(
+            serialization.Encoding.DER, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption(),
+        )
+        common = {Attribute.TOKEN: True, Attribute.LABEL: settings.key_label, Attribute.ID: _KEY_ID}
+        session.create_object({**decode_rsa_private_key(der_key), **common, Attribute.PRIVATE: True})
+        session.create_object({**decode_x509_certificate(cert.public_bytes(serialization.Encoding.DER)), **common})
+
+
+@pytest.fixture()
+def pool(settings: Pkcs11Settings) -> Iterator[Pkcs11Pool]:
+    pool = Pkcs11Pool(settings, _PIN)
+    yield pool
+    pool.close()
+
+
+def _sign(pool: Pkcs11Pool, manager: SignatureManager, folder: Path, n: int) -> Path:
+    src = shutil.copyfile(_SAMPLE, folder / f"doc{n}.pdf")
+    out = folder / f"doc{n}-firmado.pdf"
+    manager.sign_pdf(pdf_in=src, pdf_out=out, pkcs11=pool, persist=False, level="B-B")
+    return out
+
+
+def test_batch_reuses_sessions(pool: Pkcs11Pool, tmp_path: Path) -> None:
+    manager = SignatureManager(store_path=tmp_path / "validaciones.json")
+    documents = pool.settings.sessions * 3
+    with ThreadPoolExecutor(pool.settings.sessions) as executor:
+        outputs = list(executor.map(lambda n: _sign(pool, manager, tmp_path, n), range(documents)))
+
+    assert all(out.stat().st_size > _SAMPLE.stat().st_size for out in outputs)
+    assert pool.stats.borrowed == documents
+    assert pool.stats.opened <= pool.settings.sessions
+    assert pool.stats.reconnects == 0
+
+
+def test_reconnect_drops_sessions_on_loan(pool: Pkcs11Pool, tmp_path: Path) -> None:
+    manager = SignatureManager(store_path=tmp_path / "validaciones.json")
+    with pool.signer():
+        # Otra firma reconecta mientras ésta sigue en curso: no se reinicia
+        # la biblioteca y la sesión prestada no vuelve al grupo.
+        pool._reset()
+        out = _sign(pool, manager, tmp_path, 0)
+        assert len(pool._idle) == 1
+    assert len(pool._idle) == 1
+    assert pool.stats.reconnects == 1
+
+    opened = pool.stats.opened
+    _sign(pool, manager, tmp_path, 1)
+    assert pool.stats.opened == opened
+    assert out.exists()
@@ -0,0 +1,216 @@
+# coding: utf-8
+# ui/annex_list.py · WolfSight-PDF
+"""
+Lista ordenable de documentos a anexar, con control previo en segundo plano.
+
+Al agregar archivos se muestran al instante como «revisando…» y un
+``QThread`` corre ``preflight_many`` (que a su vez reparte entre procesos),
+así la ventana no se congela con escaneos grandes. Cada fila muestra el
+resumen del informe y, al pasar el mouse, el detalle completo. Los archivos
+con errores quedan en la lista, marcados, pero no se anexan.
+
+El operador reordena arrastrando y quita con el botón o con Supr; cada
+cambio emite ``orderChanged`` con las rutas anexables en orden.
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Final
+
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtGui import QKeySequence, QShortcut
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QHBoxLayout,
+    QLabel,
+    QListWidget,
+    QListWidgetItem,
+    QPushButton,
+    QStyle,
+    QVBoxLayout,
+    QWidget,
+)
+
+from modules.preflight import PreflightReport, preflight_many
+
+_LOG = logging.getLogger("AnnexList")
+_PATH_ROLE: Final[int] = Qt.ItemDataRole.UserRole
+_REPORT_ROLE: Final[int] = Qt.ItemDataRole.UserRole + 1
+_FAILED_ROLE: Final[int] = Qt.ItemDataRole.UserRole + 2
+
+
+class PreflightJob(QThread):
+    """Revisa una tanda de archivos fuera del hilo de la interfaz."""
+
+    done = pyqtSignal(int, object)  # generación, list[PreflightReport]
+    failed = pyqtSignal(int, object, str)  # generación, list[str] de la tanda, mensaje
+
+    def __init__(self, generation: int, paths: list[str], parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._generation = generation
+        self._paths = paths
+
+    def run(self) -> None:
+        try:
+            reports = preflight_many(self._paths)
+        except Exception as exc:  # noqa: BLE001
+            self.failed.emit(self._generation, self._paths, str(exc))
+        else:
+            self.done.emit(self._generation, reports)
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class AnnexList(QWidget):
+    """Documentos a anexar, en el orden en que se unirán."""
+
+    orderChanged = pyqtSignal(list)  # list[str] de rutas anexables
+
+    def __init__(self, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.setObjectName("annexList")
+        self._generation = 0
+        self._jobs: set[PreflightJob] = set()
+
+        self.list = QListWidget()
+        self.list.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
+        self.list.setDefaultDropAction(Qt.DropAction.MoveAction)
+        self.list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.list.model().rowsMoved.connect(lambda *_: self._emit_order())
+
+        self.status = QLabel()
+        self.btn_remove = QPushButton(self.style().standardIcon(QStyle.StandardPixmap.SP_TrashIcon), "")
+        self.btn_remove.setToolTip("Quitar de la lista (Supr)")
+        self.btn_remove.clicked.connect(self.remove_selected)
+        QShortcut(QKeySequence.StandardKey.Delete, self.list, activated=self.remove_selected)
+
+        footer = QHBoxLayout()
+        footer.setContentsMargins(5, 2, 5, 2)
+        footer.addWidget(self.status, 1)
+        footer.addWidget(self.btn_remove)
+
+        vbox = QVBoxLayout(self)
+        vbox.setContentsMargins(0, 0, 0, 0)
+        vbox.setSpacing(0)
+        vbox.addWidget(self.list)
+        vbox.addLayout(footer)
+
+    # ——— API pública ——————————————————————————————————————————————
+    def add_files(self, paths: list[str]) -> None:
+        """Agrega al final los archivos que aún no estén y los revisa."""
+        present = {self.list.item(row).data(_PATH_ROLE) for row in range(self.list.count())}
+        new = [p for p in dict.fromkeys(str(Path(p).resolve()) for p in paths) if p not in present]
+        if not new:
+            return
+        pending = self.style().standardIcon(QStyle.StandardPixmap.SP_BrowserReload)
+        for path in new:
+            item = QListWidgetItem(pending, f"{Path(path).name}  —  revisando…")
+            item.setData(_PATH_ROLE, path)
+            item.setToolTip(path)
+            self.list.addItem(item)
+
+        job = PreflightJob(self._generation, new, self)
+        job.done.connect(self._on_reports)
+        job.failed.connect(self._on_failed)
+        job.finished.connect(lambda: self._forget(job))
+        self._jobs.add(job)
+        self._update_status()
+        job.start()
+
+    def paths(self) -> list[str]:
+        """Rutas revisadas y sin errores, en el orden de la lista."""
+        result: list[str] = []
+        for row in range(self.list.count()):
+            report: PreflightReport | None = self.list.item(row).data(_REPORT_ROLE)
+            if report is not None and report.ok:
+                result.append(report.path)
+        return result
+
+    def reports(self) -> list[PreflightReport]:
+        items = (self.list.item(row).data(_REPORT_ROLE) for row in range(self.list.count()))
+        return [report for report in items if report is not None]
+
+    def is_busy(self) -> bool:
+        return bool(self._jobs)
+
+    def clear(self) -> None:
+        # Las revisiones en curso terminan solas; sus resultados se descartan.
+        self._generation += 1
+        self.list.clear()
+        self._update_status()
+
+    def remove_selected(self) -> None:
+        rows = sorted((self.list.row(item) for item in self.list.selectedItems()), reverse=True)
+        if not rows:
+            return
+        for row in rows:
+            self.list.takeItem(row)
+        self._update_status()
+        self._emit_order()
+
+    # ——— internos ———————————————————————————————————————————————————
+    def _on_reports(self, generation: int, reports: list[PreflightReport]) -> None:
+        if generation != self._generation:
+            return
+        by_path = {report.path: report for report in reports}
+        style = self.style()
+        for row in range(self.list.count()):
+            item = self.list.item(row)
+            report = by_path.get(item.data(_PATH_ROLE))
+            if report is None:
+                continue
+            if not report.ok:
+                icon = QStyle.StandardPixmap.SP_MessageBoxCritical
+                item.setForeground(Qt.GlobalColor.gray)
+            elif report.warnings:
+                icon = QStyle.StandardPixmap.SP_MessageBoxWarning
+            else:
+                icon = QStyle.StandardPixmap.SP_DialogApplyButton
+            item.setIcon(style.standardIcon(icon))
+            item.setText(f"{Path(report.path).name}  —  {report.summary()}")
+            item.setToolTip(report.details())
+            item.setData(_REPORT_ROLE, report)
+        for report in reports:
+            if not report.ok:
+                _LOG.warning("%s no se puede anexar: %s", report.path, "; ".join(report.errors))
+        self._update_status()
+        self._emit_order()
+
+    def _on_failed(self, generation: int, paths: list[str], message: str) -> None:
+        if generation != self._generation:
+            return
+        _LOG.error("Control previo fallido: %s", message)
+        failed = set(paths)
+        icon = self.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxCritical)
+        for row in range(self.list.count()):
+            item = self.list.item(row)
+            if item.data(_PATH_ROLE) in failed and item.data(_REPORT_ROLE) is None:
+                item.setIcon(icon)
+                item.setForeground(Qt.GlobalColor.gray)
+                item.setText(f"{Path(item.data(_PATH_ROLE)).name}  —  no se pudo revisar")
+                item.setToolTip(f"{item.data(_PATH_ROLE)}\n{message}")
+                item.setData(_FAILED_ROLE, True)
+        self._update_status()
+
+    def _forget(self, job: PreflightJob) -> None:
+        self._jobs.discard(job)
+        self._update_status()
+        job.deleteLater()
+
+    def _update_status(self) -> None:
+        reports = self.reports()
+        unchecked = sum(bool(self.list.item(row).data(_FAILED_ROLE)) for row in range(self.list.count()))
+        checking = self.list.count() - len(reports) - unchecked
+        if checking and self._jobs:
+            self.status.setText(f"Revisando {checking} de {self.list.count()} archivos…")
+            return
+        blocked = sum(not r.ok for r in reports) + unchecked
+        pages = sum(r.page_count for r in reports if r.ok)
+        text = f"{len(reports) + unchecked - blocked} archivos · {pages} págs."
+        if blocked:
+            text += f" · {blocked} con errores (no se anexan)"
+        self.status.setText(text if self.list.count() else "")
+
+    def _emit_order(self) -> None:
+        self.orderChanged.emit(self.paths())
@@ -0,0 +1,68 @@
+# coding: utf-8
+# ui/debug_overlay.py · WolfSight-PDF
+"""
+Indicador de depuración superpuesto: tamaño y tasa de aciertos de la caché
+de render y memoria residente del proceso. Se alterna con Ctrl+Shift+D (o
+arranca visible con ``WOLFSIGHT_DEBUG_OVERLAY=1``).
+"""
+
+from __future__ import annotations
+
+from PyQt6.QtCore import QEvent, QObject, Qt, QTimer
+from PyQt6.QtWidgets import QLabel, QWidget
+
+from modules.render_cache import get_render_cache, process_rss
+
+_MIB = 1024 * 1024
+
+
+class CacheDebugOverlay(QLabel):
+    """Etiqueta semitransparente anclada a la esquina superior derecha del padre."""
+
+    def __init__(self, parent: QWidget, interval_ms: int = 1000) -> None:
+        super().__init__(parent)
+        self.setObjectName("debugOverlay")
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents, True)
+        self.setStyleSheet(
+            "#debugOverlay { background: rgba(0, 0, 0, 170); color: #9f9; "
+            "font: 9pt monospace; padding: 4px 8px; border-radius: 4px; }"
+        )
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.refresh)
+        parent.installEventFilter(self)
+        self.hide()
+
+    def toggle(self) -> None:
+        self.setVisible(not self.isVisible())
+
+    def setVisible(self, visible: bool) -> None:  # noqa: N802
+        super().setVisible(visible)
+        if visible:
+            self.refresh()
+            self._timer.start()
+        else:
+            self._timer.stop()
+
+    def refresh(self) -> None:
+        stats = get_render_cache().stats()
+        rss = process_rss(children=True)
+        self.setText(
+            f"caché {stats.bytes_used / _MIB:6.1f}/{stats.budget / _MIB:.0f} MiB · "
+            f"{stats.entries} pág · aciertos {stats.hit_rate:5.1%} · "
+            f"desalojos {stats.evictions}"
+            + (f" · RSS {rss / _MIB:.0f} MiB" if rss is not None else "")
+        )
+        self.adjustSize()
+        self._reposition()
+        self.raise_()
+
+    def eventFilter(self, obj: QObject | None, event: QEvent | None) -> bool:  # noqa: N802
+        if event is not None and event.type() == QEvent.Type.Resize:
+            self._reposition()
+        return False
+
+    def _reposition(self) -> None:
+        parent = self.parentWidget()
+        if parent is not None:
+            self.move(parent.width() - self.width() - 8, 8)
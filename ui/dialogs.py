@@ -1,14 +1,17 @@
 # coding: utf-8
 from __future__ import annotations
 
-from typing import cast
+from typing import Any, cast
 
 from PyQt6.QtCore import Qt, QByteArray
 from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtWidgets import (
     QDialog,
     QDialogButtonBox,
+    QHeaderView,
     QLabel,
+    QTableWidget,
+    QTableWidgetItem,
     QVBoxLayout,
     QWidget,
     QPushButton,
@@ -82,3 +85,49 @@ class SignedResultDialog(QDialog):
         layout.addWidget(code_label)
         layout.addSpacing(15)
         layout.addWidget(btn_box)
+
+
+class ResponsivenessDialog(QDialog):
+    """Resumen del monitor de respuesta: manejadores y sitios más lentos."""
+    def __init__(self, *, summary: dict[str, Any], report_path: str, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Respuesta de la interfaz")
+        self.setMinimumSize(640, 480)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        layout.addWidget(QLabel(
+            f"<b>Bloqueos:</b> {summary['stalls']} de {summary['beats']} latidos · "
+            f"<b>peor:</b> {summary['worst_lag_ms']} ms · <b>p99:</b> {summary['p99_lag_ms']} ms"
+        ))
+        layout.addWidget(QLabel("<b>Manejadores más lentos</b>"))
+        layout.addWidget(self._table(
+            ["Manejador", "Llamadas", "Máx. (ms)", "Total (ms)"],
+            [[h["name"], h["calls"], h["max_ms"], h["total_ms"]] for h in summary["handlers"]],
+        ))
+        layout.addWidget(QLabel("<b>Dónde estaba el hilo principal durante los bloqueos</b>"))
+        layout.addWidget(self._table(
+            ["Sitio", "Bloqueos", "Atraso total (ms)"],
+            [[s["site"], s["stalls"], s["total_lag_ms"]] for s in summary["sites"]],
+        ))
+        path_label = QLabel(f"Informe completo: {report_path}")
+        path_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        layout.addWidget(path_label)
+
+        btn_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok)
+        btn_box.accepted.connect(self.accept)
+        layout.addWidget(btn_box)
+
+    @staticmethod
+    def _table(headers: list[str], rows: list[list[Any]]) -> QTableWidget:
+        table = QTableWidget(len(rows), len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        header = cast(QHeaderView, table.horizontalHeader())
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                table.setItem(r, c, QTableWidgetItem(str(value)))
+        return table
@@ -0,0 +1,339 @@
+# coding: utf-8
+# ui/document_tabs.py · WolfSight-PDF
+"""
+Pestañas de expedientes con carga diferida y descarga en segundo plano.
+
+Cada pestaña conserva siempre sus metadatos (ruta, encabezado, página de
+apertura, hash). El visor Chromium, en cambio, es lo caro: sólo hay
+``config.MAX_LIVE_TABS`` vivos a la vez y las pestañas inactivas por más de
+``config.TAB_IDLE_SECONDS`` lo liberan. Al volver a una pestaña liberada el
+visor se recarga con ``#page=N`` y, mientras tanto, se muestra el render de
+esa página, hecho en un hilo aparte (casi siempre sale de la caché).
+
+La posición de desplazamiento no se conserva: el visor PDF de Chromium no
+actualiza el fragmento de la URL al desplazarse y corre en un contenido
+invitado que ``runJavaScript`` no alcanza.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Final
+
+from PyQt6.QtCore import Qt, QThread, QTimer, QUrl, pyqtSignal
+from PyQt6.QtGui import QPixmap
+from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWidgets import QLabel, QStackedLayout, QTabWidget, QWidget
+
+from modules import config, pdf_render
+from modules.document_session import hold
+from modules.hashing import get_hash_service
+
+_LOG = logging.getLogger("DocumentTabs")
+_PREVIEW_ZOOM: Final[float] = 1.0
+
+ViewerFactory = Callable[[], QWebEngineView]
+
+
+@dataclass(slots=True)
+class TabState:
+    """Lo que una pestaña recuerda aunque su visor esté liberado."""
+
+    path: str
+    actuacion: str
+    titular: str
+    page: int = 1  # página con la que se abre el visor
+    sha256: str | None = None
+    last_active: float = field(default_factory=time.monotonic)
+
+
+def _render_preview(path: str, page: int, sha256: str | None) -> tuple[bytes | None, str | None]:
+    """``(png, sha256)`` de ``page``; casi siempre sale de la caché de render."""
+    if not pdf_render.is_available():
+        return None, sha256
+    try:
+        if sha256 is None:
+            sha256 = get_hash_service().sha256(path)
+        with hold(path) as session:
+            doc = session.fitz_document
+            with pdf_render.FITZ_LOCK:
+                index = min(max(page, 1), doc.page_count) - 1
+                return pdf_render.render_page_png_cached(doc, sha256, index, _PREVIEW_ZOOM), sha256
+    except (OSError, RuntimeError, ValueError) as exc:
+        _LOG.debug("Sin vista previa para %s: %s", path, exc)
+        return None, sha256
+
+
+class _PreviewJob(QThread):
+    """Rasteriza la vista previa de una pestaña fuera del hilo de la interfaz."""
+
+    done = pyqtSignal(int, object, object)  # generación, png | None, sha256 | None
+
+    def __init__(self, generation: int, state: TabState, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._generation = generation
+        self._args = (state.path, state.page, state.sha256)
+
+    def run(self) -> None:
+        png, sha256 = _render_preview(*self._args)
+        self.done.emit(self._generation, png, sha256)
+
+
+class _TabPage(QWidget):
+    """Contenedor de una pestaña: vista previa cacheada o visor vivo."""
+
+    def __init__(self, state: TabState, factory: ViewerFactory) -> None:
+        super().__init__()
+        self.state = state
+        self.viewer: QWebEngineView | None = None
+        self._factory = factory
+        self._stack = QStackedLayout(self)
+        self._preview = QLabel(alignment=Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignTop)
+        self._preview.setObjectName("tabPreview")
+        self._stack.addWidget(self._preview)
+        self._released = False
+        self._generation = 0
+        self._jobs: set[_PreviewJob] = set()
+
+    @property
+    def is_live(self) -> bool:
+        return self.viewer is not None
+
+    def activate(self) -> None:
+        self.state.last_active = time.monotonic()
+        if self.viewer is None:
+            # Sólo al restaurar: una pestaña nueva va directo al visor.
+            if self._released:
+                self._start_preview()
+            self.viewer = self._factory()
+            self.viewer.loadFinished.connect(lambda _ok: self._stack.setCurrentIndex(1))
+            self._stack.addWidget(self.viewer)
+            self._load()
+
+    def load(self, path: str, page: int = 1, *, preview_png: bytes | None = None, sha256: str | None = None) -> None:
+        """Cambia el documento de la pestaña (p. ej. tras anexar o firmar).
+
+        ``preview_png`` (p. ej. la primera página precargada) se muestra
+        hasta que el visor termina de cargar.
+        """
+        self.state.path = path
+        self.state.page = page
+        self.state.sha256 = sha256
+        self._generation += 1  # descarta una vista previa del documento anterior
+        if self.viewer is not None:
+            if preview_png:
+                self._set_preview(preview_png)
+            self._load()
+
+    def wait_jobs(self) -> None:
+        """Espera las vistas previas en curso (antes de destruir la pestaña)."""
+        for job in list(self._jobs):
+            job.wait()
+
+    def release(self) -> None:
+        """Libera el visor; la vista previa se arma recién al restaurarlo."""
+        if self.viewer is None:
+            return
+        self._set_preview(None)
+        self._stack.removeWidget(self.viewer)
+        self.viewer.deleteLater()
+        self.viewer = None
+        self._released = True
+
+    # ——— internos ——————————————————————————————————————————————————
+    def _load(self) -> None:
+        assert self.viewer is not None
+        url = QUrl.fromLocalFile(str(Path(self.state.path).resolve()))
+        if self.state.page > 1:
+            url.setFragment(f"page={self.state.page}")
+        self.viewer.load(url)
+
+    def _start_preview(self) -> None:
+        self._generation += 1
+        job = _PreviewJob(self._generation, self.state, self)
+        job.done.connect(self._on_preview)
+        job.finished.connect(lambda: self._forget(job))
+        self._jobs.add(job)
+        job.start()
+
+    def _forget(self, job: _PreviewJob) -> None:
+        self._jobs.discard(job)
+        job.deleteLater()
+
+    def _on_preview(self, generation: int, png: bytes | None, sha256: str | None) -> None:
+        if generation != self._generation:
+            return
+        if self.state.sha256 is None:
+            self.state.sha256 = sha256
+        # Si el visor ya terminó de cargar, la vista previa llegó tarde.
+        if self._stack.currentIndex() == 0 and png:
+            self._set_preview(png)
+
+    def _set_preview(self, png: bytes | None) -> None:
+        pix = QPixmap()
+        if png:
+            pix.loadFromData(png)
+        if not pix.isNull() and self.width() > 0:
+            pix = pix.scaledToWidth(self.width(), Qt.TransformationMode.SmoothTransformation)
+        self._preview.setPixmap(pix)
+        self._stack.setCurrentIndex(0)
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class DocumentTabs(QTabWidget):
+    """Pestañas de expedientes con un tope de visores vivos."""
+
+    currentDocumentChanged = pyqtSignal(object)  # TabState | None
+
+    def __init__(
+        self,
+        viewer_factory: ViewerFactory,
+        *,
+        max_live: int | None = None,
+        idle_seconds: int | None = None,
+        parent: QWidget | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.setObjectName("documentTabs")
+        self.setTabsClosable(True)
+        self.setMovable(True)
+        self.setDocumentMode(True)
+        self._factory = viewer_factory
+        self._max_live = max(max_live or config.MAX_LIVE_TABS, 1)
+        self._idle_seconds = idle_seconds if idle_seconds is not None else config.TAB_IDLE_SECONDS
+        self._active: _TabPage | None = None
+
+        self.currentChanged.connect(self._on_current_changed)
+        self.tabCloseRequested.connect(self.close_tab)
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setInterval(15_000)
+        self._idle_timer.timeout.connect(self.release_idle)
+        self._idle_timer.start()
+
+    # ——— API pública ——————————————————————————————————————————————
+    def open_document(self, path: str, actuacion: str, titular: str) -> TabState:
+        """Abre ``path`` en una pestaña nueva, o cambia a la que ya lo tiene."""
+        resolved = str(Path(path).resolve())
+        for index in range(self.count()):
+            page = self._page(index)
+            if str(Path(page.state.path).resolve()) == resolved:
+                self.setCurrentIndex(index)
+                return page.state
+        page = _TabPage(TabState(path=path, actuacion=actuacion, titular=titular), self._factory)
+        index = self.addTab(page, actuacion)
+        self.setTabToolTip(index, path)
+        self.setCurrentIndex(index)
+        return page.state
+
+    def replace_current(
+        self,
+        path: str,
+        actuacion: str | None = None,
+        titular: str | None = None,
+        *,
+        preview_png: bytes | None = None,
+        sha256: str | None = None,
+    ) -> None:
+        """Carga ``path`` en la pestaña activa (abre una si no hay ninguna)."""
+        page = self._current_page()
+        if page is None:
+            self.open_document(path, actuacion or Path(path).stem, titular or "(sin datos)")
+            return
+        if actuacion is not None:
+            page.state.actuacion = actuacion
+        if titular is not None:
+            page.state.titular = titular
+        page.load(path, preview_png=preview_png, sha256=sha256)
+        self.setTabText(self.currentIndex(), page.state.actuacion)
+        self.setTabToolTip(self.currentIndex(), path)
+        self.currentDocumentChanged.emit(page.state)
+
+    def current_state(self) -> TabState | None:
+        page = self._current_page()
+        return page.state if page is not None else None
+
+    def current_viewer(self) -> QWebEngineView | None:
+        page = self._current_page()
+        return page.viewer if page is not None else None
+
+    def reload(self, state: TabState) -> None:
+        """Vuelve a cargar en su visor el documento de la pestaña de ``state``."""
+        for i in range(self.count()):
+            page = self._page(i)
+            if page.state is state and page.is_live:
+                page._load()
+
+    def states(self) -> list[TabState]:
+        return [self._page(i).state for i in range(self.count())]
+
+    def live_count(self) -> int:
+        return sum(1 for i in range(self.count()) if self._page(i).is_live)
+
+    def close_tab(self, index: int) -> None:
+        page = self._page(index)
+        if page is self._active:
+            self._active = None
+        self.removeTab(index)
+        page.release()
+        page.wait_jobs()  # sus hilos son hijos de la pestaña
+        page.deleteLater()
+
+    def wait_jobs(self) -> None:
+        """Espera las vistas previas en curso de todas las pestañas."""
+        for i in range(self.count()):
+            self._page(i).wait_jobs()
+
+    def release_idle(self) -> int:
+        """Libera los visores de pestañas inactivas por más del tiempo límite."""
+        if self._idle_seconds <= 0:
+            return 0
+        now = time.monotonic()
+        released = 0
+        for i in range(self.count()):
+            page = self._page(i)
+            if i != self.currentIndex() and page.is_live and now - page.state.last_active > self._idle_seconds:
+                page.release()
+                released += 1
+        return released
+
+    def release_hidden(self) -> int:
+        """Libera todos los visores salvo el activo (presión de memoria)."""
+        released = 0
+        for i in range(self.count()):
+            page = self._page(i)
+            if i != self.currentIndex() and page.is_live:
+                page.release()
+                released += 1
+        return released
+
+    # ——— internos ——————————————————————————————————————————————————
+    def _page(self, index: int) -> _TabPage:
+        widget = self.widget(index)
+        assert isinstance(widget, _TabPage)
+        return widget
+
+    def _current_page(self) -> _TabPage | None:
+        return self._page(self.currentIndex()) if self.count() else None
+
+    def _on_current_changed(self, index: int) -> None:
+        if index < 0:
+            self._active = None
+            self.currentDocumentChanged.emit(None)
+            return
+        if self._active is not None:
+            self._active.state.last_active = time.monotonic()  # inactiva desde ahora
+        current = self._active = self._page(index)
+        current.activate()
+        self._enforce_live_cap(keep=current)
+        self.currentDocumentChanged.emit(current.state)
+
+    def _enforce_live_cap(self, keep: _TabPage) -> None:
+        pages = [self._page(i) for i in range(self.count())]
+        live = [p for p in pages if p.is_live and p is not keep]
+        live.sort(key=lambda p: p.state.last_active)
+        while len(live) + 1 > self._max_live:
+            live.pop(0).release()
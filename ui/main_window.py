@@ -3,13 +3,14 @@
 # ui/main_window.py · WolfSight-PDF
 from __future__ import annotations
 
+import hashlib
 import os
 import sys
 from pathlib import Path
-from typing import Callable, cast
+from typing import Any, Callable, cast
 
-from PyQt6.QtCore import QEasingCurve, QPropertyAnimation, QSize, Qt, QUrl
-from PyQt6.QtGui import QIcon, QShowEvent
+from PyQt6.QtCore import QEasingCurve, QPropertyAnimation, QSize, Qt, QThread, QTimer, QUrl, pyqtSignal
+from PyQt6.QtGui import QCloseEvent, QIcon, QKeySequence, QShortcut, QShowEvent
 from PyQt6.QtWidgets import (
     QFileDialog,
     QHBoxLayout,
@@ -17,6 +18,7 @@ from PyQt6.QtWidgets import (
     QLabel,
     QLineEdit,
     QMainWindow,
+    QMessageBox,
     QPushButton,
     QSplitter,
     QStyle,
@@ -26,18 +28,35 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile, QWebEngineSettings
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 
+from modules import config
+from modules.document_session import hold, release_all
+from modules.hashing import get_hash_service
+from modules.page_fingerprints import PageDiff, compare_versions
+from modules.pdf_tools import extract_pages, merge_pdfs, parse_page_ranges
+from modules.pkcs11_signer import Pkcs11Pool, TokenLoginError, get_pkcs11_pool
+from modules.render_cache import get_render_cache, process_rss
 from modules.signature_manager import SignatureManager
-from ui.dialogs import CustomConfirmDialog, SignedResultDialog
+from modules.version_store import VersionStore
+from modules.worklist import Worklist, WorklistPrefetcher, guess_actuacion
+from ui import resources
+from ui.annex_list import AnnexList
+from ui.debug_overlay import CacheDebugOverlay
+from ui.document_tabs import DocumentTabs, TabState
+from ui.dialogs import CustomConfirmDialog, ResponsivenessDialog, SignedResultDialog
 from ui.version import VersionDialog
 from utils.resource_handler import resource_path
+from utils.responsiveness import active_monitor, timed_slot
 
 # Place-holders externos
 try:
-    from utils.download import download_pdf  # type: ignore
+    from utils.download import download_many, download_pdf  # type: ignore
 except ImportError:  # pragma: no cover
     def download_pdf(path: str, parent: QWidget | None = None) -> None:  # type: ignore[override]
         print(f"[PLACEHOLDER] Descargar {path}")
 
+    def download_many(paths: list[str], parent: QWidget | None = None) -> None:  # type: ignore[override]
+        print(f"[PLACEHOLDER] Descargar {paths}")
+
 
 try:
     from utils.print import print_pdf  # type: ignore
@@ -46,10 +65,6 @@ except ImportError:  # pragma: no cover
         print(f"[PLACEHOLDER] Imprimir {path}")
 
 
-def merge_pdfs(base_pdf_path: str, files_to_annex: list[str], output_path: str) -> None:
-    print(f"— ACCIÓN — Anexar {files_to_annex} → {output_path}")
-
-
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 class PdfViewer(QWebEngineView):
     """Visor embebido basado en QWebEngineView."""
@@ -76,6 +91,24 @@ class PdfViewer(QWebEngineView):
         else:
             self.setHtml("")
 
+    def release_if_hidden(self, *, collapsed: bool = False) -> bool:
+        """Descarta el renderer de Chromium si la página no está a la vista.
+
+        Qt la reactiva (y la recarga) sola cuando vuelve a mostrarse.
+        ``collapsed`` indica que un divisor la dejó sin espacio: para Qt sigue
+        visible y Chromium no descarta páginas visibles, así que antes se
+        oculta la vista (quien reabre el panel la vuelve a mostrar).
+        """
+        page = cast(QWebEnginePage, self.page())
+        if page.lifecycleState() == QWebEnginePage.LifecycleState.Discarded:
+            return False
+        if collapsed and self.isVisible():
+            self.setVisible(False)
+        if page.isVisible():
+            return False
+        page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+        return True
+
 
 class MainHeaderWidget(QWidget):
     """Barra superior con info del expediente."""
@@ -104,6 +137,109 @@ class MainHeaderWidget(QWidget):
         self.titular_label.setText(f"Titular: {titular}")
 
 
+def _page_subset(path: str, pages: list[int]) -> str | None:
+    """PDF con sólo ``pages`` de ``path`` (cacheado por contenido y páginas)."""
+    if not pages:
+        return None
+    subset_dir = config.CACHE_DIR / "comparaciones"
+    subset_dir.mkdir(parents=True, exist_ok=True)
+    doc_sha256 = get_hash_service().sha256(path)
+    key = hashlib.blake2b(f"{doc_sha256}|{pages}".encode("utf-8"), digest_size=8).hexdigest()
+    subset = subset_dir / f"{Path(path).stem}-{key}.pdf"
+    if not subset.exists():
+        extract_pages(path, pages, subset)
+    return str(subset)
+
+
+def _combined_annex(paths: list[str]) -> str:
+    """Un solo PDF con los anexos en orden (cacheado por contenido y orden).
+
+    Se conservan las ``ANNEX_PREVIEWS_KEPT`` vistas usadas más recientemente;
+    el resto se borra al armar una nueva.
+    """
+    preview_dir = config.CACHE_DIR / "anexos"
+    preview_dir.mkdir(parents=True, exist_ok=True)
+    hashes = get_hash_service().sha256_many(paths)
+    key = hashlib.blake2b("|".join(str(hashes[Path(p)]) for p in paths).encode("utf-8"), digest_size=8)
+    preview = preview_dir / f"anexo-{key.hexdigest()}.pdf"
+    if preview.exists():
+        os.utime(preview)
+        return str(preview)
+    try:
+        merge_pdfs(paths[0], paths[1:], preview)
+    except BaseException:
+        preview.unlink(missing_ok=True)
+        raise
+    stale = sorted(preview_dir.glob("anexo-*.pdf"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in stale[max(config.ANNEX_PREVIEWS_KEPT, 1):]:
+        old.unlink(missing_ok=True)
+    return str(preview)
+
+
+class AnnexPreviewJob(QThread):
+    """Une los anexos para la vista previa fuera del hilo de la GUI."""
+
+    done = pyqtSignal(int, str)  # generación, ruta de la vista previa
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, generation: int, paths: list[str], parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._generation = generation
+        self._paths = paths
+
+    def run(self) -> None:
+        try:
+            preview = _combined_annex(self._paths)
+        except Exception as exc:  # noqa: BLE001
+            self.failed.emit(self._generation, str(exc))
+        else:
+            self.done.emit(self._generation, preview)
+
+
+class CompareJob(QThread):
+    """Huellas, alineación y recortes de dos versiones fuera del hilo de la GUI."""
+
+    done = pyqtSignal(object, object, object)  # PageDiff, recorte nuevo | None, recorte anterior | None
+    failed = pyqtSignal(str)
+
+    def __init__(self, old: str, new: str, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._old, self._new = old, new
+
+    def run(self) -> None:
+        try:
+            diff = compare_versions(self._old, self._new)
+            if diff.identical:
+                self.done.emit(diff, None, None)
+                return
+            self.done.emit(diff, _page_subset(self._new, diff.new_pages), _page_subset(self._old, diff.old_pages))
+        except Exception as exc:  # noqa: BLE001
+            self.failed.emit(str(exc))
+
+
+class DocumentJob(QThread):
+    """Anexado, firma (con la red de B-LT/B-LTA) y registro de versión fuera del hilo de la GUI.
+
+    ``work`` corre en el hilo del trabajo y lo que devuelve llega por ``done``;
+    si falla, ``failed`` lleva la excepción.
+    """
+
+    done = pyqtSignal(object)
+    failed = pyqtSignal(object)  # Exception
+
+    def __init__(self, work: Callable[[], Any], parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._work = work
+
+    def run(self) -> None:
+        try:
+            result = self._work()
+        except Exception as exc:  # noqa: BLE001
+            self.failed.emit(exc)
+        else:
+            self.done.emit(result)
+
+
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 class MainWindow(QMainWindow):
     """Shell principal."""
@@ -114,31 +250,71 @@ class MainWindow(QMainWindow):
         self.resize(1200, 800)
         self.setWindowIcon(self._get_icon("AppIcon"))
 
-        # Estado
-        self.current_expediente_path: str | None = None
-        self.current_annex_path: str | None = None
+        # Estado (el expediente actual es el de la pestaña activa)
+        self.current_annex_path: str | None = None   # lo que muestra el panel de anexo
+        self.annex_paths: list[str] = []              # lo que se anexará, en orden
+        self.comparing: TabState | None = None
+        self._jobs: set[QThread] = set()  # trabajos en segundo plano en curso
+        self._annex_generation = 0  # la última vista previa pedida del anexo
+        self._operation: DocumentJob | None = None  # anexado o firma en curso (de a uno)
         self.menu_is_expanded: bool = False
         self._menu_animation: QPropertyAnimation | None = None
 
-        # Firma
+        # Firma (con token PKCS#11 el PIN se pide una vez por sesión de trabajo)
         self.signature_manager = SignatureManager()
+        self._pkcs11_pool: Pkcs11Pool | None = None
+
+        # Historial de versiones
+        self.version_store = VersionStore()
+
+        # Lista de trabajo (precarga de los próximos expedientes)
+        self.worklist = Worklist()
+        self.prefetcher = WorklistPrefetcher()
 
         # UI
         self._create_widgets()
         self._create_layout()
         self._connect_signals()
 
+        # Memoria: caché de render compartida y límite blando del proceso
+        self._memory_timer = QTimer(self)
+        self._memory_timer.setInterval(5000)
+        self._memory_timer.timeout.connect(self._check_memory_pressure)
+        self._memory_timer.start()
+        self.debug_overlay = CacheDebugOverlay(cast(QWidget, self.centralWidget()))
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, activated=self.debug_overlay.toggle)
+        QShortcut(QKeySequence("Ctrl+Shift+R"), self, activated=self._show_responsiveness)
+        self.debug_overlay.setVisible(config.DEBUG_OVERLAY)
+
         demo = resource_path("tests/E-010529-2025.pdf")
         if os.path.exists(demo):
-            self.current_expediente_path = demo
-            self.main_viewer.load_pdf(demo)
-            self.main_header.update_data("E-010529-2021", "TITULAR DEMO")
+            self.tabs.open_document(demo, "E-010529-2021", "TITULAR DEMO")
+
+    # ——— expediente activo ————————————————————————————————————————————
+    @property
+    def current_expediente_path(self) -> str | None:
+        state = self.tabs.current_state()
+        return state.path if state is not None else None
+
+    @property
+    def main_viewer(self) -> PdfViewer | None:
+        return cast("PdfViewer | None", self.tabs.current_viewer())
 
     # ——————————————————————————————————————————
     def showEvent(self, event: QShowEvent) -> None:  # noqa: D401
         super().showEvent(event)
         self.setUpdatesEnabled(True)
 
+    def closeEvent(self, event: QCloseEvent) -> None:  # noqa: D401
+        for job in list(self._jobs):
+            job.wait()
+        self.tabs.wait_jobs()
+        self.prefetcher.shutdown()
+        if self._pkcs11_pool is not None:
+            self._pkcs11_pool.close()
+        release_all()
+        super().closeEvent(event)
+
     # ══════════════════════ widgets ══════════════════════════════════════════
     def _create_widgets(self) -> None:
         self.menu_frame = QWidget()
@@ -151,6 +327,9 @@ class MainWindow(QMainWindow):
         self.btn_download = QPushButton()
         self.btn_print = QPushButton()
         self.btn_sign = QPushButton()
+        self.btn_worklist = QPushButton()
+        self.btn_next = QPushButton()
+        self.btn_compare = QPushButton()
         self.btn_version = QPushButton()
 
         menu_map: dict[QPushButton, str] = {
@@ -160,6 +339,9 @@ class MainWindow(QMainWindow):
             self.btn_download: "Descargar",
             self.btn_print: "Imprimir",
             self.btn_sign: "Firmar Documento",
+            self.btn_worklist: "Lista de Trabajo",
+            self.btn_next: "Siguiente Expediente",
+            self.btn_compare: "Comparar Versiones",
         }
         for btn, label in menu_map.items():
             btn.setIcon(self._get_icon(label))
@@ -173,18 +355,25 @@ class MainWindow(QMainWindow):
         # Visores
         self.main_header = MainHeaderWidget()
         self.content_splitter = QSplitter(Qt.Orientation.Horizontal)
-        self.main_viewer = PdfViewer()
+        self.tabs = DocumentTabs(PdfViewer)
         self.annex_viewer = PdfViewer()
+        self.annex_list = AnnexList()
+        self.annex_list.setVisible(False)
+        annex_pane = QSplitter(Qt.Orientation.Vertical)
+        annex_pane.addWidget(self.annex_list)
+        annex_pane.addWidget(self.annex_viewer)
+        annex_pane.setStretchFactor(1, 1)
 
         main_container = self._create_viewer_container(
-            "Expediente Principal", self.main_viewer, path_getter=lambda: self.current_expediente_path
+            "Expediente Principal", self.tabs, path_getter=lambda: self.current_expediente_path
         )
         annex_container = self._create_viewer_container(
-            "Documento a Anexar", self.annex_viewer, is_annex=True, path_getter=lambda: self.current_annex_path
+            "Documento a Anexar", annex_pane, is_annex=True, path_getter=lambda: self.current_annex_path
         )
         self.content_splitter.addWidget(main_container)
         self.content_splitter.addWidget(annex_container)
         self.content_splitter.setSizes([self.width(), 0])
+        self.content_splitter.splitterMoved.connect(self._on_splitter_moved)
 
     # ══════════════════════ layout ═══════════════════════════════════════════
     def _create_layout(self) -> None:
@@ -197,6 +386,9 @@ class MainWindow(QMainWindow):
         menu_vbox.addWidget(self.btn_download)
         menu_vbox.addWidget(self.btn_print)
         menu_vbox.addWidget(self.btn_sign)
+        menu_vbox.addWidget(self.btn_worklist)
+        menu_vbox.addWidget(self.btn_next)
+        menu_vbox.addWidget(self.btn_compare)
         menu_vbox.addStretch()
         menu_vbox.addWidget(self.btn_version)
 
@@ -224,12 +416,21 @@ class MainWindow(QMainWindow):
         self.btn_download.clicked.connect(lambda: self._download_pdf(self.current_expediente_path))
         self.btn_print.clicked.connect(lambda: self._print_pdf(self.current_expediente_path))
         self.btn_sign.clicked.connect(self._sign_current_pdf)
+        self.btn_worklist.clicked.connect(self._load_worklist)
+        self.btn_next.clicked.connect(self._next_expediente)
+        self.btn_compare.clicked.connect(self._compare_versions)
         self.btn_version.clicked.connect(lambda: VersionDialog(self).exec())
+        self.tabs.currentDocumentChanged.connect(self._on_document_changed)
+        self.btn_extract_range.clicked.connect(self._extract_page_range)
+        self.page_range_edit.returnPressed.connect(self._extract_page_range)
 
         if hasattr(self, "btn_confirm_annex"):
             self.btn_confirm_annex.clicked.connect(self._confirm_and_annex)
+        if hasattr(self, "btn_annex_sign"):
+            self.btn_annex_sign.clicked.connect(self._annex_and_sign)
         if hasattr(self, "btn_close_annex"):
             self.btn_close_annex.clicked.connect(self._close_annex_pane)
+        self.annex_list.orderChanged.connect(self._on_annex_order_changed)
 
     # ═════════════ viewer container ══════════════════════════════════════════
     def _create_viewer_container(
@@ -251,16 +452,37 @@ class MainWindow(QMainWindow):
         hbox = QHBoxLayout(header)
         hbox.setContentsMargins(5, 0, 5, 0)
 
-        hbox.addWidget(QLabel(title))
+        title_label = QLabel(title)
+        hbox.addWidget(title_label)
         hbox.addStretch()
 
+        if not is_annex:
+            self.page_range_edit = QLineEdit()
+            self.page_range_edit.setObjectName("pageRangeEdit")
+            self.page_range_edit.setPlaceholderText("Fojas: 1-3, 7")
+            self.page_range_edit.setFixedWidth(140)
+            self.page_range_edit.setToolTip("Páginas a extraer en un PDF aparte")
+            hbox.addWidget(self.page_range_edit)
+
+            self.btn_extract_range = QPushButton(self._get_icon("Extraer Fojas"), "")
+            self.btn_extract_range.setIconSize(QSize(24, 24))
+            self.btn_extract_range.setToolTip("Extraer Fojas Seleccionadas")
+            hbox.addWidget(self.btn_extract_range)
+
         if is_annex:
+            self.annex_title = title_label
             self.btn_confirm_annex = QPushButton(self._get_icon("Anexar"), "")
             self.btn_confirm_annex.setIconSize(QSize(30, 30))
             self.btn_confirm_annex.setToolTip("Anexar al Expediente")
             self.btn_confirm_annex.setEnabled(False)
             hbox.addWidget(self.btn_confirm_annex)
 
+            self.btn_annex_sign = QPushButton(self._get_icon("Firmar Documento"), "")
+            self.btn_annex_sign.setIconSize(QSize(30, 30))
+            self.btn_annex_sign.setToolTip("Anexar y Firmar (una sola revisión)")
+            self.btn_annex_sign.setEnabled(False)
+            hbox.addWidget(self.btn_annex_sign)
+
             self.btn_close_annex = QPushButton(self._get_icon("Cerrar"), "")
             self.btn_close_annex.setIconSize(QSize(30, 30))
             self.btn_close_annex.setToolTip("Cerrar Panel de Anexo")
@@ -271,116 +493,500 @@ class MainWindow(QMainWindow):
         return container
 
     # ═════════════════════ utilidades ════════════════════════════════════════
+    _ICON_MAP: dict[str, str] = {
+        "Menú": "icons/menu.png",
+        "Abrir Expediente": "icons/abrir-expediente.png",
+        "Cargar Documento": "icons/cargar-documento.png",
+        "Firmar Documento": "icons/firmar-documento.png",
+        "Descargar": "icons/descargar.png",
+        "Imprimir": "icons/imprimir.png",
+        "Anexar": "icons/anexar.png",
+        "Cerrar": "icons/cerrar.png",
+        "Versión": "icons/wolf.png",
+        "AppIcon": "icons/app_icon.png",
+    }
+
     def _get_icon(self, key: str) -> QIcon:
-        icon_map = {
-            "Menú": "menu.png",
-            "Abrir Expediente": "abrir-expediente.png",
-            "Cargar Documento": "cargar-documento.png",
-            "Firmar Documento": "firmar-documento.png",
-            "Descargar": "descargar.png",
-            "Imprimir": "imprimir.png",
-            "Anexar": "anexar.png",
-            "Cerrar": "cerrar.png",
-            "Versión": "wolf.png",
-            "AppIcon": "app_icon.png",
-        }
-        filename = icon_map.get(key)
-        if filename:
-            full = resource_path(os.path.join("assets", "icons", filename))
-            if os.path.exists(full):
-                return QIcon(full)
+        alias = self._ICON_MAP.get(key)
+        if alias:
+            icon = resources.icon(alias)
+            if not icon.isNull():
+                return icon
 
         if key == "AppIcon":
             return QIcon()
 
-        return cast(QStyle, self.style()).standardIcon(QStyle.StandardPixmap.SP_MessageBoxInformation)
+        fallback = {
+            "Lista de Trabajo": QStyle.StandardPixmap.SP_FileDialogDetailedView,
+            "Siguiente Expediente": QStyle.StandardPixmap.SP_ArrowForward,
+            "Comparar Versiones": QStyle.StandardPixmap.SP_FileDialogContentsView,
+            "Extraer Fojas": QStyle.StandardPixmap.SP_DialogSaveButton,
+        }.get(key, QStyle.StandardPixmap.SP_MessageBoxInformation)
+        return cast(QStyle, self.style()).standardIcon(fallback)
 
     # —— acciones básicas ——————————————————————————————————————————————
+    @timed_slot
     def _download_pdf(self, path: str | None) -> None:
+        if len(self.worklist) > 1:
+            answer = QMessageBox.question(
+                self,
+                "Descargar",
+                "¿Exportar toda la lista de trabajo como un único ZIP?",
+            )
+            if answer == QMessageBox.StandardButton.Yes:
+                download_many(self.worklist.refs(), self)
+                return
         if path:
             download_pdf(path, self)
 
+    @timed_slot
     def _print_pdf(self, path: str | None) -> None:
         if path:
             print_pdf(path, self)
 
+    @timed_slot
     def _open_expediente(self) -> None:
         path, _ = QFileDialog.getOpenFileName(self, "Abrir Expediente PDF", "", "PDF (*.pdf)")
         if path:
-            self.current_expediente_path = path
-            self.main_viewer.load_pdf(path)
-            self.main_header.update_data("K-003607-2025", "CACERES GLADYS NILDA")
+            # El operador salió de la lista de trabajo: no seguir precargando.
+            self.prefetcher.cancel_all()
+            self.tabs.open_document(path, guess_actuacion(Path(path)), "CACERES GLADYS NILDA")
             if self.content_splitter.sizes()[1] != 0:
                 self.content_splitter.setSizes([self.width(), 0])
 
+    @timed_slot
+    def open_files(self, paths: list[str]) -> None:
+        """Abre ``paths`` en pestañas (los que llegan de otro arranque) y trae la ventana al frente."""
+        opened = False
+        for path in paths:
+            if not (os.path.isfile(path) and path.lower().endswith(".pdf")):
+                print(f"[ERROR] No es un PDF accesible → {path}")
+                continue
+            self.tabs.open_document(path, guess_actuacion(Path(path)), "(sin datos)")
+            opened = True
+        if opened:
+            self.prefetcher.cancel_all()
+            if self.content_splitter.sizes()[1] != 0:
+                self.content_splitter.setSizes([self.width(), 0])
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    # ——— lista de trabajo ————————————————————————————————————————————
+    @timed_slot
+    def _load_worklist(self) -> None:
+        paths, _ = QFileDialog.getOpenFileNames(self, "Lista de Trabajo", "", "PDF (*.pdf)")
+        if paths:
+            self.worklist.set_items(paths)
+            self._next_expediente()
+
+    @timed_slot
+    def _next_expediente(self) -> None:
+        item = self.worklist.advance()
+        if item is None:
+            print("► No hay más expedientes en la lista de trabajo.")
+            return
+
+        ready = self.prefetcher.take(item.ref)
+        try:
+            path = ready.local_path if ready else self.prefetcher.fetch_now(item.ref)
+        except OSError as exc:
+            print(f"[ERROR] No se pudo obtener {item.ref} → {exc}")
+            return
+        self.prefetcher.schedule(self.worklist.upcoming(self.prefetcher.depth))
+
+        # La lista de trabajo reutiliza la pestaña activa en lugar de acumular.
+        if ready:
+            # El render precargado de la página 1 se ve mientras Chromium carga.
+            self.tabs.replace_current(
+                str(path), ready.actuacion, ready.titular,
+                preview_png=ready.first_page_png, sha256=ready.sha256,
+            )
+        else:
+            self.tabs.replace_current(str(path), guess_actuacion(path), "(sin datos)")
+        if self.content_splitter.sizes()[1] != 0:
+            self._close_annex_pane()
+
+    @timed_slot
     def _load_document_to_annex(self) -> None:
         if not self.current_expediente_path:
             print("► Primero abra un expediente principal.")
             return
-        path, _ = QFileDialog.getOpenFileName(self, "Cargar Documento", "", "PDF (*.pdf)")
-        if path:
-            self.current_annex_path = path
-            self.annex_viewer.load_pdf(path)
-            self.content_splitter.setSizes([self.width() // 2, self.width() // 2])
-            if hasattr(self, "btn_confirm_annex"):
-                self.btn_confirm_annex.setEnabled(True)
+        paths, _ = QFileDialog.getOpenFileNames(self, "Cargar Documentos", "", "PDF (*.pdf)")
+        if paths:
+            if self.comparing is not None:
+                self._close_annex_pane()
+            # Se revisan en segundo plano; la vista previa se arma al terminar.
+            self.annex_list.setVisible(True)
+            self.annex_list.add_files(paths)
+            self._open_annex_pane()
+
+    def _on_annex_order_changed(self, paths: list[str]) -> None:
+        self.annex_paths = paths
+        self._annex_generation += 1  # descarta vistas previas aún en curso
+        ready = bool(paths) and self.current_expediente_path is not None
+        if hasattr(self, "btn_confirm_annex"):
+            self.btn_confirm_annex.setEnabled(ready)
+            self.btn_annex_sign.setEnabled(ready)
+        if not paths:
+            self.current_annex_path = None
+            self.annex_title.setText("Documento a Anexar")
+            self.annex_viewer.setHtml("<p style='font-family:sans-serif;color:#888'>Nada para anexar.</p>")
+            return
+        if len(paths) == 1:
+            self._show_annex_preview(self._annex_generation, paths[0])
+            return
+        self.annex_title.setText(f"Documentos a Anexar · {len(paths)} archivos (uniendo…)")
+        job = AnnexPreviewJob(self._annex_generation, paths, self)
+        job.done.connect(self._show_annex_preview)
+        job.failed.connect(self._on_annex_preview_failed)
+        self._track(job)
+
+    @timed_slot
+    def _show_annex_preview(self, generation: int, preview: str) -> None:
+        if generation != self._annex_generation:
+            return
+        self.current_annex_path = preview
+        count = len(self.annex_paths)
+        self.annex_title.setText(
+            "Documento a Anexar" if count == 1 else f"Documentos a Anexar · {count} archivos"
+        )
+        self.annex_viewer.load_pdf(preview)
 
+    def _on_annex_preview_failed(self, generation: int, message: str) -> None:
+        if generation == self._annex_generation:
+            print(f"[ERROR] Vista previa del anexo fallida → {message}")
+
+    @timed_slot
     def _confirm_and_annex(self) -> None:
-        if not (self.current_expediente_path and self.current_annex_path):
+        if not (self.current_expediente_path and self.annex_paths) or self._operation_running():
             return
-        if CustomConfirmDialog(self).exec():
-            output = self.current_expediente_path.replace(".pdf", "-anexado.pdf")
-            merge_pdfs(self.current_expediente_path, [self.current_annex_path], output)
-            self._close_annex_pane()
-            self.main_viewer.load_pdf(output)
-            self.current_expediente_path = output
+        if not CustomConfirmDialog(self).exec():
+            return
+        src = self.current_expediente_path
+        output = src.replace(".pdf", "-anexado.pdf")
+        annexes, note = list(self.annex_paths), self._annex_note()
+        expediente, state = self._version_key(src), self.tabs.current_state()
+
+        def work() -> None:
+            merge_pdfs(src, annexes, output)
+            self._store_version(expediente, src, output, "anexado", note=note)
+
+        self._run_operation(
+            "Anexando…", work,
+            lambda _result: self._show_operation_result(state, output, close_annex=True),
+            lambda exc: print(f"[ERROR] Anexado fallido → {exc}"),
+        )
 
+    @timed_slot
+    def _annex_and_sign(self) -> None:
+        if not (self.current_expediente_path and self.annex_paths) or self._operation_running():
+            return
+        if not CustomConfirmDialog(self).exec():
+            return
+        credentials = self._ask_credentials()
+        if credentials is None:
+            return
+
+        src = Path(self.current_expediente_path)
+        annexes, note = list(self.annex_paths), self._annex_note()
+        dst = src.with_stem(src.stem + "-anexado-firmado")
+        expediente, state = self._version_key(str(src)), self.tabs.current_state()
+
+        def work() -> tuple[Any, bytes]:
+            rec, qr_png = self.signature_manager.annex_and_sign(
+                pdf_in=src,
+                annex_paths=annexes,
+                pdf_out=dst,
+                user="demo_user",
+                **credentials,
+            )
+            self._store_version(
+                expediente, str(src), str(dst), "anexado-firmado", note=f"{note} · Código {rec.code}"
+            )
+            return rec, qr_png
+
+        self._run_operation(
+            "Anexando y firmando…", work,
+            lambda result: self._on_signed(state, str(dst), *result, close_annex=True),
+            lambda exc: self._on_sign_failed("Anexado y firma fallidos", exc),
+        )
+
+    def _annex_note(self) -> str:
+        return " + ".join(os.path.basename(p) for p in self.annex_paths)
+
+    def _open_annex_pane(self) -> None:
+        self.annex_viewer.setVisible(True)
+        self.content_splitter.setSizes([self.width() // 2, self.width() // 2])
+
+    def _annex_pane_collapsed(self) -> bool:
+        return self.content_splitter.sizes()[1] == 0
+
+    def _on_splitter_moved(self, _pos: int, _index: int) -> None:
+        if not self._annex_pane_collapsed():
+            self.annex_viewer.setVisible(True)  # oculto al liberar memoria
+
+    @timed_slot
     def _close_annex_pane(self) -> None:
         self.content_splitter.setSizes([self.width(), 0])
         self.annex_viewer.setHtml("")
+        self.annex_list.clear()
+        self.annex_list.setVisible(False)
+        self.annex_paths = []
+        self._annex_generation += 1
+        self.current_annex_path = None
+        self.annex_title.setText("Documento a Anexar")
+        if self.comparing is not None:
+            # El visor principal mostraba sólo las páginas distintas.
+            state, self.comparing = self.comparing, None
+            self.tabs.reload(state)
+        if hasattr(self, "btn_confirm_annex"):
+            self.btn_confirm_annex.setEnabled(False)
+            self.btn_annex_sign.setEnabled(False)
+
+    # ——— extracción de fojas ——————————————————————————————————————
+    @timed_slot
+    def _extract_page_range(self) -> None:
+        src = self.current_expediente_path
+        if not src:
+            print("► Primero abra un expediente.")
+            return
+        try:
+            with hold(src) as session:
+                pages = parse_page_ranges(self.page_range_edit.text(), session.page_count)
+        except ValueError as exc:
+            QMessageBox.warning(self, "Extraer Fojas", str(exc))
+            return
+        default = Path(src).with_stem(Path(src).stem + "-fojas")
+        dst, _ = QFileDialog.getSaveFileName(self, "Guardar fojas extraídas", str(default), "PDF (*.pdf)")
+        if not dst:
+            return
+        try:
+            count = extract_pages(src, pages, dst)
+        except (OSError, ValueError, IndexError) as exc:
+            print(f"[ERROR] Extracción fallida → {exc}")
+            return
+        print(f"► {count} fojas extraídas en {dst}")
+
+    # ——— comparación de versiones —————————————————————————————————
+    @timed_slot
+    def _compare_versions(self) -> None:
+        current = self.current_expediente_path
+        if not current:
+            print("► Primero abra un expediente para comparar.")
+            return
+        other, _ = QFileDialog.getOpenFileName(
+            self, "Comparar con la versión anterior", str(Path(current).parent), "PDF (*.pdf)"
+        )
+        if not other:
+            return
+        if self.comparing is not None or self.annex_paths:
+            self._close_annex_pane()
+        # La primera pasada de huellas recorre todo el documento: en un hilo.
+        print("► Comparando versiones…")
+        state = self.tabs.current_state()
+        job = CompareJob(other, current, self)
+        job.done.connect(lambda diff, new, old: self._show_comparison(state, current, diff, new, old))
+        job.failed.connect(lambda message: print(f"[ERROR] Comparación fallida → {message}"))
+        self._track(job)
+
+    @timed_slot
+    def _show_comparison(
+        self, state: TabState | None, current: str, diff: PageDiff, new_subset: str | None, old_subset: str | None
+    ) -> None:
+        # El operador pudo cambiar de pestaña o de documento mientras tanto.
+        if state is None or self.tabs.current_state() is not state or state.path != current:
+            return
+        if diff.identical:
+            QMessageBox.information(self, "Comparar Versiones", "Las dos versiones tienen las mismas páginas.")
+            return
+
+        # Sólo las páginas distintas, lado a lado: la versión activa a la
+        # izquierda y la anterior en el panel derecho.
+        self.comparing = state
+        self._load_page_subset(cast(PdfViewer, self.main_viewer), new_subset)
+        self._load_page_subset(self.annex_viewer, old_subset)
         self.current_annex_path = None
         if hasattr(self, "btn_confirm_annex"):
             self.btn_confirm_annex.setEnabled(False)
+            self.btn_annex_sign.setEnabled(False)
+        self.annex_title.setText(
+            f"Versión anterior · {len(diff.changed)} modificadas, "
+            f"{len(diff.added)} agregadas, {len(diff.removed)} quitadas"
+        )
+        self._open_annex_pane()
+
+    @staticmethod
+    def _load_page_subset(viewer: PdfViewer, subset: str | None) -> None:
+        if subset is None:
+            viewer.setHtml("<p style='font-family:sans-serif;color:#888'>Sin páginas en este lado.</p>")
+            return
+        viewer.load_pdf(subset)
+
+    def _track(self, job: QThread) -> None:
+        """Arranca ``job`` y lo retiene hasta que termine."""
+        self._jobs.add(job)
+        job.finished.connect(lambda: self._forget_job(job))
+        job.start()
+
+    def _forget_job(self, job: QThread) -> None:
+        self._jobs.discard(job)
+        job.deleteLater()
 
     # ——— firma digital ——————————————————————————————————————————————
+    @timed_slot
     def _sign_current_pdf(self) -> None:
         if not self.current_expediente_path:
             print("► Primero abra un expediente para firmar.")
             return
-
-        pfx_path, _ = QFileDialog.getOpenFileName(self, "Seleccionar certificado .pfx", "", "PFX (*.pfx)")
-        if not pfx_path:
+        if self._operation_running():
             return
 
-        pwd, ok = QInputDialog.getText(
-            self,
-            "Contraseña",
-            "Contraseña del certificado:",
-            QLineEdit.EchoMode.Password,
-        )
-        if not ok:
+        credentials = self._ask_credentials()
+        if credentials is None:
             return
 
         src = Path(cast(str, self.current_expediente_path))
         dst = src.with_stem(src.stem + "-firmado")
+        expediente, state = self._version_key(str(src)), self.tabs.current_state()
 
-        try:
+        def work() -> tuple[Any, bytes]:
             rec, qr_png = self.signature_manager.sign_pdf(
                 pdf_in=src,
                 pdf_out=dst,
-                pfx_path=pfx_path,
-                pfx_password=pwd,
                 user="demo_user",
+                **credentials,
             )
-        except Exception as exc:  # noqa: BLE001
-            print(f"[ERROR] Firma fallida → {exc}")
-            return
+            self._store_version(expediente, str(src), str(dst), "firmado", note=f"Código {rec.code}")
+            return rec, qr_png
 
-        self.current_expediente_path = str(dst)
-        self.main_viewer.load_pdf(str(dst))
+        self._run_operation(
+            "Firmando…", work,
+            lambda result: self._on_signed(state, str(dst), *result),
+            lambda exc: self._on_sign_failed("Firma fallida", exc),
+        )
+
+    # ——— operaciones en segundo plano ——————————————————————————————
+    def _operation_running(self) -> bool:
+        if self._operation is None:
+            return False
+        print("► Espere a que termine la operación en curso.")
+        return True
+
+    def _run_operation(
+        self,
+        message: str,
+        work: Callable[[], Any],
+        on_done: Callable[[Any], None],
+        on_failed: Callable[[Exception], None],
+    ) -> None:
+        print(f"► {message}")
+        job = DocumentJob(work, self)
+        self._operation = job
+        job.done.connect(on_done)
+        job.failed.connect(on_failed)
+        job.finished.connect(lambda: setattr(self, "_operation", None))
+        self._track(job)
+
+    @timed_slot
+    def _show_operation_result(self, state: TabState | None, path: str, *, close_annex: bool = False) -> None:
+        if close_annex:
+            self._close_annex_pane()
+        # Si el operador cambió de pestaña mientras tanto, el resultado va en una nueva.
+        if state is None or self.tabs.current_state() is state:
+            self.tabs.replace_current(path)
+        else:
+            self.tabs.open_document(path, state.actuacion, state.titular)
+
+    def _on_signed(
+        self, state: TabState | None, path: str, rec: Any, qr_png: bytes, *, close_annex: bool = False
+    ) -> None:
+        self._show_operation_result(state, path, close_annex=close_annex)
         SignedResultDialog(code=rec.code, qr_png=qr_png, parent=self).exec()
 
+    def _on_sign_failed(self, what: str, exc: Exception) -> None:
+        self._forget_token_if_rejected(exc)
+        print(f"[ERROR] {what} → {exc}")
+
+    def _ask_credentials(self) -> dict[str, Any] | None:
+        """Argumentos de firma: token PKCS#11 si está configurado, si no un .pfx."""
+        if config.PKCS11_LIB:
+            if self._pkcs11_pool is None:
+                pin, ok = QInputDialog.getText(self, "Token", "PIN del token:", QLineEdit.EchoMode.Password)
+                if not ok:
+                    return None
+                try:
+                    self._pkcs11_pool = get_pkcs11_pool(pin)
+                except (RuntimeError, ValueError) as exc:
+                    print(f"[ERROR] Token no disponible → {exc}")
+                    return None
+            return {"pkcs11": self._pkcs11_pool}
+
+        pfx_path, _ = QFileDialog.getOpenFileName(self, "Seleccionar certificado .pfx", "", "PFX (*.pfx)")
+        if not pfx_path:
+            return None
+
+        pwd, ok = QInputDialog.getText(
+            self,
+            "Contraseña",
+            "Contraseña del certificado:",
+            QLineEdit.EchoMode.Password,
+        )
+        return {"pfx_path": pfx_path, "pfx_password": pwd} if ok else None
+
+    def _forget_token_if_rejected(self, exc: Exception) -> None:
+        # Sólo si el token rechazó el PIN: la próxima firma lo vuelve a pedir.
+        if self._pkcs11_pool is not None and isinstance(exc, TokenLoginError):
+            self._pkcs11_pool.close()
+            self._pkcs11_pool = None
+
+    # ——— historial de versiones ————————————————————————————————————
+    def _version_key(self, source: str) -> str:
+        # La clave es la identidad de la pestaña (se conserva al reemplazar
+        # el archivo): «foo» y «foo-firmado» comparten una sola historia.
+        state = self.tabs.current_state()
+        if state is not None and Path(state.path) == Path(source):
+            return state.actuacion
+        return guess_actuacion(Path(source))
+
+    def _store_version(self, expediente: str, source: str, result: str, action: str, *, note: str = "") -> None:
+        """Registra la versión (corre en el trabajo de la operación: calcula diferencias)."""
+        try:
+            self.version_store.record_operation(
+                expediente, source, result, action=action, user="demo_user", note=note
+            )
+        except (OSError, ValueError) as exc:
+            print(f"[ADVERTENCIA] No se pudo registrar la versión → {exc}")
+
+    # ——— memoria ————————————————————————————————————————————————————
+    def _show_responsiveness(self) -> None:
+        monitor = active_monitor()
+        if monitor is None:
+            print("► Monitor de respuesta inactivo (WOLFSIGHT_RESPONSIVENESS=1 o --monitor).")
+            return
+        ResponsivenessDialog(summary=monitor.summary(), report_path=str(monitor.report_path), parent=self).exec()
+
+    @timed_slot
+    def _check_memory_pressure(self) -> None:
+        rss = process_rss(children=True)
+        if rss is None or rss <= config.MEMORY_SOFT_LIMIT or config.MEMORY_SOFT_LIMIT <= 0:
+            return
+        get_render_cache().relieve_pressure(rss)
+        self.tabs.release_hidden()
+        self.annex_viewer.release_if_hidden(collapsed=self._annex_pane_collapsed())
+
+    @timed_slot
+    def _on_document_changed(self, state: TabState | None) -> None:
+        if self.comparing is not None:
+            self._close_annex_pane()
+        if state is None:
+            self.main_header.update_data("(ninguna)", "(ninguno)")
+        else:
+            self.main_header.update_data(state.actuacion, state.titular)
+
     # ——— menú lateral ——————————————————————————————————————————————
+    @timed_slot
     def _toggle_menu(self) -> None:
         collapsed, expanded = 60, 220
         self._menu_animation = QPropertyAnimation(self.menu_frame, b"minimumWidth", self)
@@ -396,6 +1002,9 @@ class MainWindow(QMainWindow):
                 self.btn_download,
                 self.btn_print,
                 self.btn_sign,
+                self.btn_worklist,
+                self.btn_next,
+                self.btn_compare,
             ):
                 btn.setText("")
         else:
@@ -406,6 +1015,9 @@ class MainWindow(QMainWindow):
             self.btn_download.setText("   Descargar")
             self.btn_print.setText("   Imprimir")
             self.btn_sign.setText("   Firmar Documento")
+            self.btn_worklist.setText("   Lista de Trabajo")
+            self.btn_next.setText("   Siguiente Expediente")
+            self.btn_compare.setText("   Comparar Versiones")
 
         self._menu_animation.start()
         self.menu_is_expanded = not self.menu_is_expanded
@@ -0,0 +1,107 @@
+# coding: utf-8
+# ui/resources.py · WolfSight-PDF
+"""
+Acceso cacheado a íconos, imágenes y hojas de estilo.
+
+Si existe el módulo compilado ``ui/resources_rc.py`` (ver
+``utils/build_resources.py``) los recursos salen de memoria; en desarrollo
+se leen del disco según ``resources.qrc``. En ambos casos cada recurso se
+lee y decodifica una única vez por proceso.
+"""
+
+from __future__ import annotations
+
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QIcon, QPixmap
+
+from utils.resource_handler import resource_path
+
+try:
+    from ui.resources_rc import RESOURCES as _BUNDLE  # type: ignore[import-not-found]
+except ImportError:
+    _BUNDLE = None
+
+_ICONS: dict[str, QIcon] = {}
+_PIXMAPS: dict[tuple[str, int], QPixmap] = {}
+_STYLES: dict[str, str] = {}
+
+
+@lru_cache(maxsize=1)
+def _qrc_map() -> dict[str, str]:
+    try:
+        root = ET.parse(resource_path("resources.qrc")).getroot()
+    except (OSError, ET.ParseError):
+        return {}
+    return {
+        node.get("alias") or (node.text or "").strip(): (node.text or "").strip()
+        for node in root.iter("file")
+    }
+
+
+def aliases() -> list[str]:
+    return sorted(_BUNDLE) if _BUNDLE is not None else sorted(_qrc_map())
+
+
+def read_bytes(alias: str) -> bytes | None:
+    if _BUNDLE is not None and alias in _BUNDLE:
+        return _BUNDLE[alias]
+    rel = _qrc_map().get(alias)
+    if not rel:
+        return None
+    try:
+        with open(resource_path(rel), "rb") as fp:
+            return fp.read()
+    except OSError:
+        return None
+
+
+def pixmap(alias: str, size: int = 0) -> QPixmap:
+    """Pixmap del recurso; con ``size`` se devuelve una variante escalada y cacheada."""
+    key = (alias, size)
+    cached = _PIXMAPS.get(key)
+    if cached is not None:
+        return cached
+    if size:
+        base = pixmap(alias)
+        pix = base if base.isNull() else base.scaled(
+            size,
+            size,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+    else:
+        pix = QPixmap()
+        data = read_bytes(alias)
+        if data is not None:
+            pix.loadFromData(data)
+    _PIXMAPS[key] = pix
+    return pix
+
+
+def icon(alias: str) -> QIcon:
+    cached = _ICONS.get(alias)
+    if cached is None:
+        pix = pixmap(alias)
+        cached = _ICONS[alias] = QIcon(pix) if not pix.isNull() else QIcon()
+    return cached
+
+
+def stylesheet(alias: str) -> str:
+    cached = _STYLES.get(alias)
+    if cached is None:
+        data = read_bytes(alias)
+        cached = _STYLES[alias] = data.decode("utf-8") if data is not None else ""
+    return cached
+
+
+def preload() -> None:
+    """Decodifica todo al arranque (requiere un ``QApplication`` creado)."""
+    for alias in aliases():
+        if alias.startswith("icons/"):
+            icon(alias)
+        elif alias.endswith(".qss"):
+            stylesheet(alias)
+    pixmap("icons/wolf.png", 100)  # logo del diálogo «Acerca de»
@@ -3,13 +3,10 @@
 
 from __future__ import annotations
 
-import os
-
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap
 from PyQt6.QtWidgets import QDialog, QLabel, QPushButton, QVBoxLayout
 
-from utils.resource_handler import resource_path
+from ui import resources
 
 
 class VersionDialog(QDialog):
@@ -23,25 +20,18 @@ class VersionDialog(QDialog):
         self.setWindowModality(Qt.WindowModality.ApplicationModal)
 
         # Cargar estilo dedicado (si existe)
-        qss = resource_path("ui/styles/version.qss")
-        if os.path.exists(qss):
-            with open(qss, "r", encoding="utf-8") as f:
-                self.setStyleSheet(f.read())
+        qss = resources.stylesheet("styles/version.qss")
+        if qss:
+            self.setStyleSheet(qss)
 
         layout = QVBoxLayout(self)
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(14)
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
-        # Logo
-        logo_path = resource_path("assets/icons/wolf.png")
-        if os.path.exists(logo_path):
-            pix = QPixmap(logo_path).scaled(
-                100,
-                100,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation,
-            )
+        # Logo (variante de 100 px precalculada en ui.resources)
+        pix = resources.pixmap("icons/wolf.png", 100)
+        if not pix.isNull():
             lbl_logo = QLabel()
             lbl_logo.setAlignment(Qt.AlignmentFlag.AlignCenter)
             lbl_logo.setPixmap(pix)
@@ -0,0 +1,61 @@
+# coding: utf-8
+# utils/build_resources.py · WolfSight-PDF
+"""
+Compila ``resources.qrc`` a un módulo Python importable.
+
+PyQt6 ya no incluye ``pyrcc``, así que el módulo generado guarda el
+contenido de cada archivo en un diccionario ``alias → bytes`` que
+``ui.resources`` carga una sola vez al iniciar. Ejecutar antes de empaquetar
+con PyInstaller:
+
+    python -m utils.build_resources
+"""
+
+from __future__ import annotations
+
+import base64
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Final
+
+_DEFAULT_QRC: Final[Path] = Path("resources.qrc")
+_DEFAULT_OUT: Final[Path] = Path("ui/resources_rc.py")
+_LINE: Final[int] = 76
+
+
+def parse_qrc(qrc_path: str | Path) -> dict[str, Path]:
+    """Devuelve ``{alias: ruta}`` para cada ``<file>`` del .qrc."""
+    qrc = Path(qrc_path)
+    entries: dict[str, Path] = {}
+    for node in ET.parse(qrc).getroot().iter("file"):
+        rel = (node.text or "").strip()
+        entries[node.get("alias") or rel] = qrc.parent / rel
+    return entries
+
+
+def build(qrc_path: str | Path = _DEFAULT_QRC, out_path: str | Path = _DEFAULT_OUT) -> int:
+    entries = parse_qrc(qrc_path)
+    lines = [
+        "# coding: utf-8",
+        f"# Generado por utils/build_resources.py a partir de {Path(qrc_path).name}. No editar.",
+        "import base64",
+        "",
+        "RESOURCES = {",
+    ]
+    total = 0
+    for alias, path in sorted(entries.items()):
+        data = path.read_bytes()
+        total += len(data)
+        encoded = base64.b64encode(data).decode("ascii")
+        lines.append(f"    {alias!r}: base64.b64decode(")
+        lines.extend(f"        {encoded[i:i + _LINE]!r}" for i in range(0, len(encoded), _LINE))
+        lines.append("    ),")
+    lines.append("}")
+    Path(out_path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    print(f"{len(entries)} recursos ({total} bytes) → {out_path}")
+    return total
+
+
+if __name__ == "__main__":
+    build(*sys.argv[1:3])
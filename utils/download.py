@@ -1,9 +1,97 @@
-from PyQt6.QtWidgets import QFileDialog, QWidget
-import shutil, os
+# coding: utf-8
+# utils/download.py · WolfSight-PDF
+"""
+Exportación de expedientes en segundo plano con progreso y cancelación.
 
-def download_pdf(source_path: str, parent: QWidget | None = None) -> None:
+La copia corre en un ``QThread`` (ver ``utils.export``) para no congelar la
+ventana al escribir en memorias USB lentas o unidades de red.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Callable
+
+from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog, QWidget
+
+from utils.export import ExportCancelled, copy_file, zip_files
+
+# Referencias a los trabajos en curso para que no los recolecte el GC.
+_ACTIVE_JOBS: set["ExportJob"] = set()
+
+
+class ExportJob(QThread):
+    """Ejecuta una exportación y reporta el avance en bytes."""
+
+    progress = pyqtSignal("qint64", "qint64")
+    succeeded = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, task: Callable[..., object], dest: str, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._task = task
+        self._dest = dest
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self) -> None:
+        try:
+            self._task(progress=self.progress.emit, cancel=self._cancel)
+        except ExportCancelled:
+            self.failed.emit("Exportación cancelada.")
+        except Exception as exc:  # noqa: BLE001
+            self.failed.emit(str(exc))
+        else:
+            self.succeeded.emit(self._dest)
+
+
+def _start(job: ExportJob, title: str, parent: QWidget | None) -> ExportJob:
+    dialog = QProgressDialog(title, "Cancelar", 0, 1000, parent)
+    dialog.setWindowTitle("Exportando")
+    dialog.setMinimumDuration(300)
+    dialog.setAutoClose(True)
+
+    def on_progress(done: int, total: int) -> None:
+        dialog.setValue(int(done * 1000 / total) if total else 1000)
+
+    def on_failed(message: str) -> None:
+        if not job.cancelled:
+            dialog.cancel()
+            QMessageBox.warning(parent, "Exportación fallida", message)
+
+    job.progress.connect(on_progress)
+    job.succeeded.connect(lambda _dest: dialog.setValue(1000))
+    job.failed.connect(on_failed)
+    dialog.canceled.connect(job.cancel)
+    job.finished.connect(lambda: _ACTIVE_JOBS.discard(job))
+
+    _ACTIVE_JOBS.add(job)
+    job.start()
+    return job
+
+
+def download_pdf(source_path: str, parent: QWidget | None = None) -> ExportJob | None:
     dest, _ = QFileDialog.getSaveFileName(
         parent, "Guardar PDF", os.path.basename(source_path), "PDF Files (*.pdf)"
     )
-    if dest:
-        shutil.copyfile(source_path, dest)
+    if not dest:
+        return None
+    task = lambda **kw: copy_file(source_path, dest, **kw)  # noqa: E731
+    return _start(ExportJob(task, dest, parent), f"Guardando {os.path.basename(dest)}…", parent)
+
+
+def download_many(source_paths: list[str], parent: QWidget | None = None) -> ExportJob | None:
+    """Exporta varios expedientes como un único ZIP."""
+    dest, _ = QFileDialog.getSaveFileName(parent, "Guardar expedientes", "expedientes.zip", "ZIP (*.zip)")
+    if not dest:
+        return None
+    task = lambda **kw: zip_files(source_paths, dest, **kw)  # noqa: E731
+    return _start(ExportJob(task, dest, parent), f"Empaquetando {len(source_paths)} expedientes…", parent)
@@ -0,0 +1,174 @@
+# coding: utf-8
+# utils/export.py · WolfSight-PDF
+"""
+Copia y empaquetado de expedientes sin dependencias de Qt.
+
+``copy_file`` usa las rutas de copia sin pasar por espacio de usuario
+(``os.copy_file_range`` / ``os.sendfile``) cuando el sistema las ofrece y
+verifica el SHA-256 del destino. ``zip_files`` escribe varios expedientes
+en un único ZIP leyendo cada origen por bloques, sin copias temporales.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import threading
+import zipfile
+from pathlib import Path
+from typing import Callable, Final, Iterable
+
+from modules.hashing import HashCancelled, get_hash_service
+
+_CHUNK: Final[int] = 8 * 1024 * 1024
+
+Progress = Callable[[int, int], None]
+
+
+class ExportCancelled(Exception):
+    """El operador canceló la exportación."""
+
+
+class ExportVerificationError(OSError):
+    """El hash del archivo exportado no coincide con el del origen."""
+
+
+def _check(cancel: threading.Event | None) -> None:
+    if cancel is not None and cancel.is_set():
+        raise ExportCancelled()
+
+
+def _sha256(path: Path, cancel: threading.Event | None = None) -> str:
+    try:
+        return get_hash_service().sha256(path, cancel)
+    except HashCancelled:
+        raise ExportCancelled() from None
+
+
+def _copy_kernel(src_fd: int, dst_fd: int, size: int, advance: Callable[[int], None],
+                 cancel: threading.Event | None) -> bool:
+    """Copia dentro del kernel. Devuelve ``False`` si el sistema no lo admite."""
+    copier: Callable[[int, int, int], int]
+    if hasattr(os, "copy_file_range"):
+        copier = lambda i, o, n: os.copy_file_range(i, o, n)  # noqa: E731
+    elif hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        # Sólo Linux admite sendfile() hacia un archivo regular.
+        copier = lambda i, o, n: os.sendfile(o, i, None, n)  # noqa: E731
+    else:
+        return False
+
+    copied = 0
+    while copied < size:
+        _check(cancel)
+        try:
+            sent = copier(src_fd, dst_fd, min(_CHUNK, size - copied))
+        except OSError:
+            if copied == 0:
+                return False  # p. ej. EXDEV/ENOSYS en sistemas de archivos remotos
+            raise
+        if sent == 0:
+            break
+        copied += sent
+        advance(sent)
+    return copied == size
+
+
+def copy_file(
+    source: str | Path,
+    dest: str | Path,
+    *,
+    progress: Progress | None = None,
+    cancel: threading.Event | None = None,
+    verify: bool = True,
+) -> str:
+    """
+    Copia ``source`` a ``dest`` y devuelve el SHA-256 del contenido.
+
+    Se escribe primero en ``dest.part`` y se renombra al final, de modo que
+    una cancelación o un fallo nunca deja un archivo a medias con el
+    nombre definitivo.
+    """
+    src = Path(source)
+    dst = Path(dest)
+    tmp = dst.with_name(dst.name + ".part")
+    size = src.stat().st_size
+    done = 0
+
+    def advance(n: int) -> None:
+        nonlocal done
+        done += n
+        if progress:
+            progress(done, size)
+
+    src_digest: str | None = None
+    try:
+        with src.open("rb") as fin, tmp.open("wb") as fout:
+            if not _copy_kernel(fin.fileno(), fout.fileno(), size, advance, cancel):
+                fin.seek(0)
+                fout.seek(0)
+                fout.truncate()
+                done = 0
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: fin.read(_CHUNK), b""):
+                    _check(cancel)
+                    digest.update(chunk)
+                    fout.write(chunk)
+                    advance(len(chunk))
+                src_digest = digest.hexdigest()
+            fout.flush()
+            os.fsync(fout.fileno())
+
+        if src_digest is None:
+            src_digest = _sha256(src, cancel)
+        if verify and _sha256(tmp, cancel) != src_digest:
+            raise ExportVerificationError(f"La copia de {src.name} no coincide con el original.")
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return src_digest
+
+
+def zip_files(
+    sources: Iterable[str | Path],
+    dest: str | Path,
+    *,
+    progress: Progress | None = None,
+    cancel: threading.Event | None = None,
+) -> dict[str, str]:
+    """
+    Empaqueta ``sources`` en un único ZIP y devuelve ``{nombre: sha256}``.
+
+    Los PDF ya vienen comprimidos, por lo que se almacenan sin deflate. Se
+    agrega un ``SHA256SUMS`` con el hash de cada expediente.
+    """
+    files = [Path(s) for s in sources]
+    dst = Path(dest)
+    tmp = dst.with_name(dst.name + ".part")
+    total = sum(f.stat().st_size for f in files)
+    done = 0
+    sums: dict[str, str] = {}
+
+    try:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for src in files:
+                arcname = src.name
+                if arcname in sums:
+                    arcname = f"{src.stem}-{len(sums)}{src.suffix}"
+                digest = hashlib.sha256()
+                with src.open("rb") as fin, zf.open(arcname, "w", force_zip64=True) as zout:
+                    for chunk in iter(lambda: fin.read(_CHUNK), b""):
+                        _check(cancel)
+                        digest.update(chunk)
+                        zout.write(chunk)
+                        done += len(chunk)
+                        if progress:
+                            progress(done, total)
+                sums[arcname] = digest.hexdigest()
+            zf.writestr("SHA256SUMS", "".join(f"{h}  {n}\n" for n, h in sums.items()))
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return sums
@@ -1,12 +1,194 @@
-from PyQt6.QtPrintSupport import QPrinter, QPrintDialog
-from PyQt6.QtWidgets import QWidget
-from PyQt6.QtGui import QPageLayout
-from typing import cast
-import os
+# coding: utf-8
+# utils/print.py · WolfSight-PDF
+"""
+Impresión multiplataforma de expedientes.
+
+Cada página se rasteriza con PyMuPDF a la resolución de la impresora en un
+hilo de trabajo y se entrega al ``QPrinter`` de a una, de modo que la
+memoria se mantiene acotada aun en expedientes de cientos de páginas. Se
+respetan el rango de páginas y las copias elegidas en el diálogo. El conteo
+de páginas que necesita el diálogo también se hace fuera del hilo de la GUI.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Final
+
+from PyQt6.QtCore import QRectF, Qt, QThread, pyqtSignal
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtPrintSupport import QAbstractPrintDialog, QPrintDialog, QPrinter
+from PyQt6.QtWidgets import QMessageBox, QProgressDialog, QWidget
+
+from modules import pdf_render
+from modules.document_session import hold
+
+# Tope de resolución: por encima no hay ganancia visible y se dispara la RAM.
+_MAX_DPI: Final[int] = 300
+
+_ACTIVE_JOBS: set[QThread] = set()
+
+
+def _selected_pages(printer: QPrinter, page_count: int) -> list[int]:
+    """Índices (base 0) de las páginas elegidas en el diálogo."""
+    if printer.printRange() == QPrinter.PrintRange.PageRange:
+        ranges = printer.pageRanges()
+        if not ranges.isEmpty():
+            pages = [
+                p - 1
+                for r in ranges.toRangeList()
+                for p in range(r.from_, r.to + 1)
+                if 1 <= p <= page_count
+            ]
+            if pages:
+                return pages
+        first, last = printer.fromPage(), printer.toPage()
+        if first and last:
+            return list(range(max(first, 1) - 1, min(last, page_count)))
+    return list(range(page_count))
+
+
+class PageCountJob(QThread):
+    """Cuenta las páginas (parseo de PyPDF2) fuera del hilo de la GUI."""
+
+    done = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, source_path: str, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._source = source_path
+
+    def run(self) -> None:
+        try:
+            with hold(self._source) as session:
+                count = session.page_count
+        except Exception as exc:  # noqa: BLE001
+            self.failed.emit(str(exc))
+        else:
+            self.done.emit(count)
+
+
+class PrintJob(QThread):
+    """Rasteriza e imprime página por página fuera del hilo de la GUI."""
+
+    progress = pyqtSignal(int, int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, source_path: str, printer: QPrinter, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._source = source_path
+        self._printer = printer
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self) -> None:
+        try:
+            self._print()
+        except Exception as exc:  # noqa: BLE001
+            self.failed.emit(str(exc))
+
+    def _print(self) -> None:
+        # El documento sale de la sesión compartida: no se vuelve a parsear.
+        with hold(self._source) as session:
+            self._print_session(session.fitz_document, session.page_count)
+
+    def _print_session(self, doc: Any, page_count: int) -> None:
+        pages = _selected_pages(self._printer, page_count)
+        # Si el driver no maneja copias, las generamos nosotros.
+        copies = 1 if self._printer.supportsMultipleCopies() else max(self._printer.copyCount(), 1)
+        sequence = [p for _ in range(copies) for p in pages]
+        dpi = min(self._printer.resolution(), _MAX_DPI)
+
+        painter = QPainter()
+        if not painter.begin(self._printer):
+            raise RuntimeError("No se pudo iniciar la impresora.")
+        try:
+            for done, index in enumerate(sequence):
+                if self._cancel.is_set():
+                    self._printer.abort()
+                    return
+                if done:
+                    self._printer.newPage()
+                samples, width, height, stride = pdf_render.render_page_rgb(doc, index, dpi)
+                image = QImage(samples, width, height, stride, QImage.Format.Format_RGB888)
+                viewport = painter.viewport()
+                scale = min(viewport.width() / width, viewport.height() / height)
+                target = QRectF(0, 0, width * scale, height * scale)
+                target.moveCenter(QRectF(viewport).center())
+                painter.drawImage(target, image)
+                del image, samples
+                self.progress.emit(done + 1, len(sequence))
+        finally:
+            painter.end()
+
+
+def _start(job: PrintJob, parent: QWidget | None) -> PrintJob:
+    dialog = QProgressDialog("Imprimiendo…", "Cancelar", 0, 1, parent)
+    dialog.setWindowTitle("Imprimir")
+    dialog.setMinimumDuration(300)
+
+    def on_progress(done: int, total: int) -> None:
+        dialog.setMaximum(total)
+        dialog.setValue(done)
+
+    def on_failed(message: str) -> None:
+        dialog.cancel()
+        QMessageBox.warning(parent, "Impresión fallida", message)
+
+    job.progress.connect(on_progress)
+    job.failed.connect(on_failed)
+    dialog.canceled.connect(job.cancel)
+    job.finished.connect(lambda: _ACTIVE_JOBS.discard(job))
+
+    _ACTIVE_JOBS.add(job)
+    job.start()
+    return job
+
 
 def print_pdf(source_path: str, parent: QWidget | None = None) -> None:
-    printer = QPrinter()
+    """Cuenta las páginas en segundo plano y luego muestra el diálogo."""
+    if not pdf_render.is_available():
+        QMessageBox.warning(parent, "Imprimir", "PyMuPDF no está instalado.")
+        return
+
+    job = PageCountJob(source_path, parent)
+    job.done.connect(lambda page_count: _ask_and_print(source_path, page_count, parent))
+    job.failed.connect(lambda message: QMessageBox.warning(parent, "Imprimir", message))
+    job.finished.connect(lambda: _ACTIVE_JOBS.discard(job))
+    _ACTIVE_JOBS.add(job)
+    job.start()
+
+
+def _ask_and_print(source_path: str, page_count: int, parent: QWidget | None) -> PrintJob | None:
+    printer = QPrinter(QPrinter.PrinterMode.HighResolution)
     dialog = QPrintDialog(printer, parent)
-    if dialog.exec():
-        # Shell-out a simple print (alternativamente usar QtPdf ^)
-        os.startfile(source_path, "print")  # Windows quick-hack
+    dialog.setOption(QAbstractPrintDialog.PrintDialogOption.PrintPageRange, True)
+    dialog.setMinMax(1, page_count)
+    if not dialog.exec():
+        return None
+    return _start(PrintJob(source_path, printer, parent), parent)
+
+
+def print_to_pdf(source_path: str, dest_path: str, *, dpi: int = 150) -> None:
+    """
+    Imprime a un archivo PDF por el mismo camino que una impresora real.
+
+    Útil para pruebas sin hardware. Bloquea hasta terminar.
+    """
+    printer = QPrinter(QPrinter.PrinterMode.HighResolution)
+    printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
+    printer.setOutputFileName(dest_path)
+    printer.setResolution(dpi)
+    errors: list[str] = []
+    job = PrintJob(source_path, printer)
+    job.failed.connect(errors.append, Qt.ConnectionType.DirectConnection)
+    job.start()
+    job.wait()
+    if errors:
+        raise RuntimeError(errors[0])
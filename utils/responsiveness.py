@@ -0,0 +1,296 @@
+# coding: utf-8
+# utils/responsiveness.py · WolfSight-PDF
+"""
+Monitor de respuesta del bucle de eventos (opcional).
+
+* Un ``QTimer`` de latido mide cuánto se atrasa el bucle de eventos.
+* Un hilo vigía toma muestras de la pila de Python del hilo principal
+  (``sys._current_frames``) mientras el bucle está bloqueado más allá del
+  umbral, así se ve *qué línea* estaba corriendo durante el congelamiento.
+* ``timed_slot`` envuelve los manejadores de la ventana principal: mide su
+  duración y atribuye cada bloqueo al manejador que lo causó.
+
+Todo se escribe como JSON Lines y ``summary()`` agrupa los peores casos
+para ``ResponsivenessDialog``. En memoria sólo quedan agregados de tamaño
+fijo (histograma de atrasos por milisegundo, llamadas/máximo/total por
+manejador), así una sesión de días no crece sin límite. Se activa con ``WOLFSIGHT_RESPONSIVENESS=1``
+o ``python run_app.py --monitor``; desactivado, ``timed_slot`` sólo cuesta
+una comparación por llamada.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Final, Iterator, TypeVar
+
+from PyQt6.QtCore import QObject, QTimer
+
+from modules import config
+
+_LOG = logging.getLogger("Responsiveness")
+_MAX_SAMPLES_PER_STALL: Final[int] = 20
+_STACK_DEPTH: Final[int] = 12
+# Histograma de atrasos: un casillero por milisegundo hasta 1 s, más el de desborde.
+_LAG_BUCKETS: Final[int] = 1000
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_ACTIVE: "ResponsivenessMonitor | None" = None
+
+
+def active_monitor() -> "ResponsivenessMonitor | None":
+    return _ACTIVE
+
+
+def timed_slot(fn: F) -> F:
+    """Decora un manejador para medirlo cuando el monitor está activo.
+
+    Qt pasa argumentos extra (``checked``) a los slots que los aceptan; el
+    envoltorio recorta los posicionales a los que admite el manejador real.
+    """
+    params = inspect.signature(fn).parameters.values()
+    variadic = any(p.kind is p.VAR_POSITIONAL for p in params)
+    max_args = sum(1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not variadic:
+            args = args[:max_args]
+        monitor = _ACTIVE
+        if monitor is None:
+            return fn(*args, **kwargs)
+        with monitor.handler(fn.__qualname__):
+            return fn(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+@dataclass(slots=True)
+class _HandlerStats:
+    calls: int = 0
+    total: float = 0.0
+    worst: float = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.calls += 1
+        self.total += elapsed
+        self.worst = max(self.worst, elapsed)
+
+
+class _LagHistogram:
+    """Atrasos del latido en casilleros fijos de 1 ms (memoria constante)."""
+
+    __slots__ = ("counts", "total", "worst")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (_LAG_BUCKETS + 1)
+        self.total = 0
+        self.worst = 0.0
+
+    def add(self, lag: float) -> None:
+        self.counts[min(int(lag * 1000), _LAG_BUCKETS)] += 1
+        self.total += 1
+        self.worst = max(self.worst, lag)
+
+    def quantile(self, q: float) -> float:
+        """Atraso en segundos del cuantil ``q`` (resolución de 1 ms)."""
+        if not self.total:
+            return 0.0
+        rank = int(self.total * q)
+        seen = 0
+        for ms, count in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                return self.worst if ms == _LAG_BUCKETS else min(ms / 1000, self.worst)
+        return self.worst
+
+
+@dataclass(slots=True)
+class _Stall:
+    started: float
+    handler: str | None
+    samples: list[list[str]] = field(default_factory=list)
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class ResponsivenessMonitor(QObject):
+    """Latido + vigía + medición de manejadores. Debe crearse en el hilo principal."""
+
+    def __init__(
+        self,
+        *,
+        report_path: str | Path | None = None,
+        interval_ms: int = 50,
+        stall_ms: int | None = None,
+        slow_handler_ms: int | None = None,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self._report_path = Path(report_path or config.RESPONSIVENESS_LOG)
+        self._interval = interval_ms / 1000
+        self._stall = (stall_ms if stall_ms is not None else config.RESPONSIVENESS_STALL_MS) / 1000
+        self._slow_handler = (slow_handler_ms if slow_handler_ms is not None else config.RESPONSIVENESS_STALL_MS) / 1000
+        self._main_ident = threading.get_ident()
+        self._lock = threading.Lock()
+        self._report: Any = None
+
+        self._last_beat = time.perf_counter()
+        self._current: _Stall | None = None
+        self._handlers: list[str] = []
+
+        # Estadísticas para el resumen
+        self._lags = _LagHistogram()
+        self._stall_count = 0
+        self._handler_stats: dict[str, _HandlerStats] = {}
+        self._stall_sites: Counter[str] = Counter()
+        self._stall_lag_by_site: dict[str, float] = {}
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._beat)
+        self._stop = threading.Event()
+        self._watchdog = threading.Thread(target=self._watch, name="responsiveness-watchdog", daemon=True)
+
+    # ——— ciclo de vida —————————————————————————————————————————————
+    def start(self) -> None:
+        global _ACTIVE
+        self._report_path.parent.mkdir(parents=True, exist_ok=True)
+        self._report = self._report_path.open("a", encoding="utf-8")
+        self._write({"type": "session", "pid": os.getpid(), "stall_ms": round(self._stall * 1000)})
+        self._last_beat = time.perf_counter()
+        self._timer.start()
+        self._watchdog.start()
+        _ACTIVE = self
+        _LOG.info("Monitor de respuesta activo → %s", self._report_path)
+
+    def stop(self) -> None:
+        global _ACTIVE
+        if _ACTIVE is self:
+            _ACTIVE = None
+        self._timer.stop()
+        self._stop.set()
+        with self._lock:
+            if self._report is not None:
+                self._report.close()
+                self._report = None
+
+    @property
+    def report_path(self) -> Path:
+        return self._report_path
+
+    # ——— manejadores ———————————————————————————————————————————————
+    @contextmanager
+    def handler(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        with self._lock:
+            self._handlers.append(name)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._handlers.pop()
+                stats = self._handler_stats.get(name)
+                if stats is None:
+                    stats = self._handler_stats[name] = _HandlerStats()
+                stats.add(elapsed)
+            if elapsed >= self._slow_handler:
+                self._write({"type": "handler", "name": name, "ms": round(elapsed * 1000, 1)})
+
+    # ——— latido (hilo principal) ———————————————————————————————————
+    def _beat(self) -> None:
+        now = time.perf_counter()
+        lag = max(now - self._last_beat - self._interval, 0.0)
+        with self._lock:
+            self._last_beat = now
+            stall, self._current = self._current, None
+        self._lags.add(lag)
+        if lag >= self._stall:
+            self._stall_count += 1
+            self._record_stall(lag, stall)
+
+    def _record_stall(self, lag: float, stall: _Stall | None) -> None:
+        samples = stall.samples if stall else []
+        # El marco más interno que se repite en las muestras es el culpable.
+        site_counts = Counter(s[-1] for s in samples if s)
+        site = site_counts.most_common(1)[0][0] if site_counts else "(sin muestra)"
+        self._stall_sites[site] += 1
+        self._stall_lag_by_site[site] = self._stall_lag_by_site.get(site, 0.0) + lag
+        self._write({
+            "type": "stall",
+            "lag_ms": round(lag * 1000, 1),
+            "handler": stall.handler if stall else None,
+            "site": site,
+            "samples": samples,
+        })
+
+    # ——— vigía (hilo propio) ———————————————————————————————————————
+    def _watch(self) -> None:
+        period = max(self._stall / 2, 0.01)
+        while not self._stop.wait(period):
+            with self._lock:
+                blocked = time.perf_counter() - self._last_beat - self._interval
+                if blocked < self._stall:
+                    continue
+                if self._current is None:
+                    self._current = _Stall(self._last_beat, self._handlers[-1] if self._handlers else None)
+                stall = self._current
+            if len(stall.samples) < _MAX_SAMPLES_PER_STALL:
+                frame = sys._current_frames().get(self._main_ident)
+                if frame is not None:
+                    stack = traceback.extract_stack(frame, limit=_STACK_DEPTH)
+                    stall.samples.append([f"{Path(f.filename).name}:{f.lineno} {f.name}" for f in stack])
+
+    # ——— informe ———————————————————————————————————————————————————
+    def _write(self, entry: dict[str, Any]) -> None:
+        entry = {"ts": time.time(), **entry}
+        with self._lock:
+            if self._report is not None:
+                self._report.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._report.flush()
+
+    def summary(self, top: int = 10) -> dict[str, Any]:
+        """Peores manejadores y sitios de bloqueo de la sesión."""
+        with self._lock:
+            handlers = {
+                name: (stats.calls, stats.worst, stats.total) for name, stats in self._handler_stats.items()
+            }
+        lags = self._lags
+        return {
+            "beats": lags.total,
+            "stalls": self._stall_count,
+            "worst_lag_ms": round(lags.worst * 1000, 1),
+            "p99_lag_ms": round(lags.quantile(0.99) * 1000, 1),
+            "handlers": sorted(
+                (
+                    {
+                        "name": name,
+                        "calls": calls,
+                        "max_ms": round(worst * 1000, 1),
+                        "total_ms": round(total * 1000, 1),
+                    }
+                    for name, (calls, worst, total) in handlers.items()
+                ),
+                key=lambda h: h["max_ms"],
+                reverse=True,
+            )[:top],
+            "sites": [
+                {"site": site, "stalls": count, "total_lag_ms": round(self._stall_lag_by_site[site] * 1000, 1)}
+                for site, count in sorted(
+                    self._stall_sites.items(), key=lambda kv: self._stall_lag_by_site[kv[0]], reverse=True
+                )[:top]
+            ],
+        }
+
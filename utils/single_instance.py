@@ -0,0 +1,147 @@
+# coding: utf-8
+# utils/single_instance.py · WolfSight-PDF
+"""
+Instancia única: un segundo arranque le pasa sus archivos al primero.
+
+Cada doble clic en un PDF vuelve a ejecutar ``run_app.py``; sin esto se
+levantaría otro intérprete y otro Chromium de QtWebEngine (segundos y
+cientos de MB). En su lugar:
+
+* ``forward_to_running`` intenta conectarse al ``QLocalServer`` de la
+  instancia abierta, le envía las rutas (absolutas: el directorio de
+  trabajo del segundo arranque puede ser otro) y espera el acuse. Sólo
+  importa ``QtCore`` y ``QtNetwork`` y no necesita ``QApplication``, así que
+  se ejecuta antes de cargar la interfaz.
+* ``InstanceServer`` escucha en la instancia principal y emite
+  ``filesReceived`` con cada lista recibida (vacía = sólo traer la ventana
+  al frente).
+
+El nombre del socket incluye el usuario del sistema: dos sesiones en el
+mismo equipo (escritorio remoto) no se mezclan. Mensaje: una línea JSON
+``{"files": [...]}``; respuesta: ``ok``.
+"""
+
+from __future__ import annotations
+
+import getpass
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Final, Iterable
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+from modules import config
+
+_LOG = logging.getLogger("SingleInstance")
+_ACK: Final[bytes] = b"ok\n"
+_MAX_MESSAGE: Final[int] = 1024 * 1024
+
+
+def server_name() -> str:
+    """Nombre del socket local, propio de cada usuario del sistema."""
+    try:
+        user = getpass.getuser()
+    except Exception:  # noqa: BLE001 – sin variable de usuario: nombre genérico
+        user = ""
+    # El nombre termina en una ruta de archivo en Unix: sin caracteres raros.
+    digest = hashlib.blake2b(f"{config.INSTANCE_NAME}|{user}".encode(), digest_size=8).hexdigest()
+    return f"wolfsight-{digest}"
+
+
+def document_args(argv: Iterable[str]) -> list[str]:
+    """PDF existentes de la línea de comandos.
+
+    Se descarta todo lo demás: las opciones propias (``--monitor``) y las de
+    Qt, que pueden llevar valor aparte (``-platform offscreen``).
+    """
+    paths = (Path(arg) for arg in argv if not arg.startswith("-"))
+    return [str(p.resolve()) for p in paths if p.suffix.lower() == ".pdf" and p.is_file()]
+
+
+def forward_to_running(files: list[str], timeout_ms: int | None = None) -> bool:
+    """Entrega ``files`` a la instancia abierta. ``False`` si no hay ninguna."""
+    timeout_ms = timeout_ms or config.INSTANCE_TIMEOUT_MS
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    if not socket.waitForConnected(timeout_ms):
+        return False
+    socket.write(json.dumps({"files": files}).encode("utf-8") + b"\n")
+    if not socket.waitForBytesWritten(timeout_ms):
+        socket.abort()
+        return False
+    reply = b""
+    while not reply.endswith(b"\n") and socket.waitForReadyRead(timeout_ms):
+        reply += bytes(socket.readAll())
+    socket.disconnectFromServer()
+    # Sin acuse la otra instancia está colgada o cerrándose: arrancar igual.
+    return reply == _ACK
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class InstanceServer(QObject):
+    """Recibe los archivos de los arranques posteriores."""
+
+    filesReceived = pyqtSignal(list)  # list[str]; vacía = sólo activar la ventana
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self._server.newConnection.connect(self._on_connection)
+        self._buffers: dict[QLocalSocket, bytes] = {}
+
+    def listen(self) -> bool:
+        """Empieza a escuchar. ``False`` si otra instancia ya lo hace."""
+        name = server_name()
+        if self._server.listen(name):
+            return True
+        if self._server.serverError() != QLocalSocket.LocalSocketError.AddressInUseError:
+            _LOG.warning("No se pudo abrir el canal de instancia única: %s", self._server.errorString())
+            return False
+        # En Unix un cierre abrupto deja el archivo del socket: si nadie
+        # contesta, es de una instancia muerta y se puede reemplazar.
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(config.INSTANCE_TIMEOUT_MS):
+            probe.abort()
+            return False
+        QLocalServer.removeServer(name)
+        return self._server.listen(name)
+
+    def close(self) -> None:
+        self._server.close()
+
+    # ——— internos ———————————————————————————————————————————————————
+    def _on_connection(self) -> None:
+        while (socket := self._server.nextPendingConnection()) is not None:
+            self._buffers[socket] = b""
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self._forget(s))
+
+    def _on_ready_read(self, socket: QLocalSocket) -> None:
+        data = self._buffers.get(socket, b"") + bytes(socket.readAll())
+        if len(data) > _MAX_MESSAGE:
+            _LOG.warning("Mensaje de instancia demasiado grande; se descarta")
+            socket.abort()
+            return
+        if not data.endswith(b"\n"):
+            self._buffers[socket] = data
+            return
+        self._buffers[socket] = b""
+        try:
+            files = [str(f) for f in json.loads(data)["files"]]
+        except (ValueError, KeyError, TypeError) as exc:
+            _LOG.warning("Mensaje de instancia inválido: %r", exc)
+            socket.abort()
+            return
+        socket.write(_ACK)
+        socket.flush()
+        socket.disconnectFromServer()
+        self.filesReceived.emit(files)
+
+    def _forget(self, socket: QLocalSocket) -> None:
+        self._buffers.pop(socket, None)
+        socket.deleteLater()
@@ -0,0 +1,3 @@
+# coding: utf-8
+# wolfsight/__init__.py · WolfSight-PDF
+"""Punto de entrada sin interfaz gráfica (``python -m wolfsight``)."""
@@ -0,0 +1,7 @@
+# coding: utf-8
+# wolfsight/__main__.py · WolfSight-PDF
+import sys
+
+from wolfsight.cli import main
+
+sys.exit(main())
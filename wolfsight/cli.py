@@ -0,0 +1,458 @@
+# coding: utf-8
+# wolfsight/cli.py · WolfSight-PDF
+"""
+Línea de comandos sin interfaz gráfica para trabajos por lotes.
+
+    python -m wolfsight sign     expedientes/*.pdf --pfx cert.pfx --jobs 4
+    python -m wolfsight sign     expedientes/*.pdf --token --key-label firmante --jobs 4
+    python -m wolfsight annex    base.pdf --annex nota.pdf
+    python -m wolfsight extract  expediente.pdf --pages "1-3, 7"
+    python -m wolfsight split    expediente.pdf --parts 4 --jobs 4
+    python -m wolfsight ltv      firmados/ --archival --jobs 4
+    python -m wolfsight verify   firmados/ --recursive --jsonl
+    python -m wolfsight optimize escaneos/*.pdf --output-dir optimizados/
+    python -m wolfsight watch    bandeja/ -o firmados/ --failed-dir errores/ --pfx cert.pfx
+    python -m wolfsight rebuild-store firmados/ archivo/ --recursive --jobs 8
+    python -m wolfsight audit    --root firmados/ --root archivo/ --report auditoria.jsonl
+    python -m wolfsight stats    --by user,month --from 2026-01-01 --metric bytes
+
+Este módulo no importa PyQt (ni directa ni indirectamente): arranca rápido
+y funciona en contenedores mínimos sin servidor gráfico. Las dependencias
+pesadas (pyhanko, PyMuPDF) se importan recién dentro de cada tarea.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as _dt
+import getpass
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from wolfsight import tasks
+
+_FLUSH_EVERY = 100
+
+
+# ═════════════════════ entradas ══════════════════════════════════════════════
+def expand_inputs(items: Iterable[str], recursive: bool = False) -> list[Path]:
+    """Expande archivos, directorios y patrones glob a una lista sin duplicados."""
+    seen: dict[Path, None] = {}
+    for item in items:
+        path = Path(item)
+        if path.is_dir():
+            matches = sorted(path.rglob("*.pdf") if recursive else path.glob("*.pdf"))
+        elif any(ch in item for ch in "*?["):
+            matches = sorted(Path(m) for m in glob.glob(item, recursive=True))
+        else:
+            matches = [path]
+        for match in matches:
+            seen.setdefault(match.resolve(), None)
+    return list(seen)
+
+
+def _output_for(src: Path, suffix: str, output_dir: str | None) -> Path:
+    folder = Path(output_dir).resolve() if output_dir else src.parent
+    return folder / f"{src.stem}-{suffix}{src.suffix}"
+
+
+def _run_all(
+    task: Callable[..., dict[str, Any]],
+    jobs: list[tuple[str, str]],
+    opts: dict[str, Any],
+    workers: int,
+) -> Iterator[dict[str, Any]]:
+    if workers <= 1:
+        for src, dst in jobs:
+            yield tasks.run_task(task, src, dst, opts)
+        return
+    # Ventana acotada de trabajos en vuelo: con cientos de miles de archivos
+    # no conviene crear todos los futures (ni sus argumentos) por adelantado.
+    window = workers * 4
+    pending: set[Future[dict[str, Any]]] = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for src, dst in jobs:
+            pending.add(pool.submit(tasks.run_task, task, src, dst, opts))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def _run_warm(
+    task: Callable[..., dict[str, Any]],
+    jobs: list[tuple[str, str]],
+    opts: dict[str, Any],
+    workers: int,
+) -> Iterator[dict[str, Any]]:
+    """Como ``_run_all``, pero el primer archivo se procesa antes de repartir.
+
+    Así la revocación (OCSP/CRL) del certificado queda en la caché en disco
+    y los procesos de trabajo la leen en vez de consultarla cada uno.
+    """
+    if workers > 1 and jobs:
+        yield tasks.run_task(task, *jobs[0], opts)
+        jobs = jobs[1:]
+    yield from _run_all(task, jobs, opts, workers)
+
+
+# ═════════════════════ comandos ══════════════════════════════════════════════
+def _sign_options(args: argparse.Namespace) -> dict[str, Any]:
+    from modules.signature_manager import SignatureManager
+
+    pkcs11: dict[str, Any] | None = None
+    if args.token:
+        from modules.pkcs11_signer import Pkcs11Settings
+
+        settings = Pkcs11Settings.from_config(
+            lib=args.pkcs11_lib, slot=args.slot, token_label=args.token_label, key_label=args.key_label,
+            key_id=bytes.fromhex(args.key_id) if args.key_id else None,
+        )
+        settings.check()
+        pkcs11 = asdict(settings)
+    password_env = args.password_env or ("WOLFSIGHT_PKCS11_PIN" if args.token else "WOLFSIGHT_PFX_PASSWORD")
+    password = os.environ.get(password_env)
+    if password is None:
+        password = getpass.getpass("PIN del token: " if args.token else "Contraseña del certificado: ")
+    return {
+        "store": str(SignatureManager(store_path=args.store).store_path),
+        "pfx": str(Path(args.pfx).resolve()) if args.pfx else None,
+        "pkcs11": pkcs11,
+        "password": password,
+        "user": args.user,
+        "reason": args.reason,
+        "all_pages": None if args.stamp is None else args.stamp == "all",
+        "level": args.level,
+    }
+
+
+def _cmd_sign(args: argparse.Namespace, inputs: list[Path]) -> Iterator[dict[str, Any]]:
+    from modules.ltv import check_level
+    from modules.signature_manager import SignatureManager, ValidationRecord
+
+    opts = _sign_options(args)
+    manager = SignatureManager(store_path=opts["store"])
+    jobs = [(str(p), str(_output_for(p, "firmado", args.output_dir))) for p in inputs]
+    run = _run_warm if check_level(opts["level"]) in ("B-LT", "B-LTA") else _run_all
+
+    # Los workers no tocan el almacén: los registros se agregan acá, por tandas.
+    pending: list[ValidationRecord] = []
+    try:
+        for result in run(tasks.sign_task, jobs, opts, args.jobs):
+            if result["ok"]:
+                pending.append(ValidationRecord(**result["record"]))
+                if len(pending) >= _FLUSH_EVERY:
+                    manager.append_records(pending)
+                    pending.clear()
+            yield result
+    finally:
+        if pending:
+            manager.append_records(pending)
+
+
+def _cmd_annex(args: argparse.Namespace, inputs: list[Path]) -> Iterator[dict[str, Any]]:
+    opts = {"annex": [str(Path(a).resolve()) for a in args.annex]}
+    jobs = [(str(p), str(_output_for(p, "anexado", args.output_dir))) for p in inputs]
+    yield from _run_all(tasks.annex_task, jobs, opts, args.jobs)
+
+
+def _cmd_extract(args: argparse.Namespace, inputs: list[Path]) -> Iterator[dict[str, Any]]:
+    opts = {"pages": args.pages}
+    jobs = [(str(p), str(_output_for(p, "fojas", args.output_dir))) for p in inputs]
+    yield from _run_all(tasks.extract_task, jobs, opts, args.jobs)
+
+
+def _cmd_split(args: argparse.Namespace, inputs: list[Path]) -> Iterator[dict[str, Any]]:
+    # Un archivo por vez: el paralelismo está dentro de cada división.
+    opts = {"parts": args.parts, "workers": args.jobs}
+    for src in inputs:
+        folder = Path(args.output_dir).resolve() if args.output_dir else src.parent
+        yield tasks.run_task(tasks.split_task, str(src), str(folder), opts)
+
+
+def _cmd_ltv(args: argparse.Namespace, inputs: list[Path]) -> Iterator[dict[str, Any]]:
+    from modules.signature_manager import SignatureManager
+
+    manager = SignatureManager(store_path=args.store)
+    opts = {"archival": args.archival}
+    suffix = "lta" if args.archival else "ltv"
+    jobs = [(str(p), str(_output_for(p, suffix, args.output_dir))) for p in inputs]
+    # El registro de validación sigue al documento: mismo código, hash nuevo.
+    changes: dict[str, tuple[str, str]] = {}
+    try:
+        for result in _run_warm(tasks.ltv_task, jobs, opts, args.jobs):
+            if result["ok"]:
+                changes[result["sha256_before"]] = (result["sha256"], Path(result["output"]).name)
+                if len(changes) >= _FLUSH_EVERY:
+                    manager.update_hashes(changes)
+                    changes.clear()
+            yield result
+    finally:
+        manager.update_hashes(changes)
+
+
+def _cmd_verify(args: argparse.Namespace, inputs: list[Path]) -> Iterator[dict[str, Any]]:
+    from modules.signature_manager import SignatureManager
+
+    records = {r.sha256: r for r in SignatureManager(store_path=args.store).load_records()}
+    jobs = [(str(p), "") for p in inputs]
+    for result in _run_all(tasks.verify_task, jobs, {}, args.jobs):
+        if result["ok"]:
+            record = records.get(result["sha256"])
+            result["record"] = asdict(record) if record else None
+            sigs = result["signatures"]
+            result["ok"] = bool(sigs) and all(s["intact"] for s in sigs) and record is not None
+        yield result
+
+
+def _cmd_optimize(args: argparse.Namespace, inputs: list[Path]) -> Iterator[dict[str, Any]]:
+    opts = {"force": args.force}
+    jobs = [(str(p), str(_output_for(p, "optimizado", args.output_dir))) for p in inputs]
+    yield from _run_all(tasks.optimize_task, jobs, opts, args.jobs)
+
+
+def _cmd_rebuild_store(args: argparse.Namespace, inputs: list[Path]) -> Iterator[dict[str, Any]]:
+    from modules.signature_manager import SignatureManager, ValidationRecord
+    from modules.store_recovery import merge_into_store
+
+    manager = SignatureManager(store_path=args.store)
+    recovered: list[ValidationRecord] = []
+    jobs = [(str(p), "") for p in inputs]
+    for result in _run_all(tasks.recover_task, jobs, {}, args.jobs):
+        if result["ok"]:
+            recovered.append(ValidationRecord(**result["record"]))
+        yield result
+    # Una sola escritura del almacén al final, sin pisar registros existentes.
+    manager.append_records(merge_into_store(manager.load_records(), recovered))
+
+
+_COMMANDS: dict[str, Callable[[argparse.Namespace, list[Path]], Iterator[dict[str, Any]]]] = {
+    "sign": _cmd_sign,
+    "annex": _cmd_annex,
+    "extract": _cmd_extract,
+    "split": _cmd_split,
+    "ltv": _cmd_ltv,
+    "verify": _cmd_verify,
+    "optimize": _cmd_optimize,
+    "rebuild-store": _cmd_rebuild_store,
+}
+
+
+# ═════════════════════ argumentos ════════════════════════════════════════════
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("inputs", nargs="+", help="Archivos PDF, directorios o patrones glob.")
+    common.add_argument("-r", "--recursive", action="store_true", help="Recorrer subdirectorios.")
+    common.add_argument("-j", "--jobs", type=int, default=1, help="Cantidad de procesos de trabajo.")
+    common.add_argument("--jsonl", action="store_true", help="Emitir un objeto JSON por archivo al terminarlo.")
+    common.add_argument("-v", "--verbose", action="store_true")
+
+    signing = argparse.ArgumentParser(add_help=False)
+    credential = signing.add_mutually_exclusive_group(required=True)
+    credential.add_argument("--pfx", help="Certificado .pfx.")
+    credential.add_argument("--token", action="store_true",
+                            help="Firmar con token/HSM PKCS#11 (ver WOLFSIGHT_PKCS11_*).")
+    signing.add_argument("--password-env",
+                         help="Variable de entorno con la contraseña o el PIN (por defecto "
+                              "WOLFSIGHT_PFX_PASSWORD o WOLFSIGHT_PKCS11_PIN; si no existe, se pregunta).")
+    signing.add_argument("--pkcs11-lib", help="Módulo PKCS#11 (por defecto WOLFSIGHT_PKCS11_LIB).")
+    signing.add_argument("--slot", type=int, help="Número de slot del token.")
+    signing.add_argument("--token-label", help="Etiqueta del token.")
+    signing.add_argument("--key-label", help="Etiqueta de la clave (y del certificado) en el token.")
+    signing.add_argument("--key-id", help="ID de la clave en hexadecimal.")
+    signing.add_argument("--user", default="demo_user")
+    signing.add_argument("--reason", default="Firma de conformidad")
+    signing.add_argument("--stamp", choices=("all", "first"),
+                         help="Páginas con sello QR (por defecto WOLFSIGHT_STAMP_ALL_PAGES).")
+    signing.add_argument("--level", type=str.upper, choices=("B-B", "B-T", "B-LT", "B-LTA"),
+                         help="Nivel PAdES (por defecto WOLFSIGHT_PADES_LEVEL).")
+    signing.add_argument("--store", help="Almacén de validaciones (validaciones.json).")
+
+    parser = argparse.ArgumentParser(prog="wolfsight", description="WolfSight-PDF sin interfaz gráfica.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sign = sub.add_parser("sign", parents=[common, signing], help="Firmar con QR de validación y firma PAdES.")
+    sign.add_argument("-o", "--output-dir")
+
+    annex = sub.add_parser("annex", parents=[common], help="Anexar documentos al final de cada expediente.")
+    annex.add_argument("--annex", nargs="+", required=True, help="Documentos a anexar, en orden.")
+    annex.add_argument("-o", "--output-dir")
+
+    extract = sub.add_parser("extract", parents=[common], help="Extraer fojas a un PDF aparte.")
+    extract.add_argument("--pages", required=True, help='Fojas a extraer, p. ej. "1-3, 7, 10-".')
+    extract.add_argument("-o", "--output-dir")
+
+    split = sub.add_parser("split", parents=[common], help="Dividir cada PDF en partes de tamaño parejo.")
+    split.add_argument("--parts", type=int, required=True, help="Cantidad de partes.")
+    split.add_argument("-o", "--output-dir")
+
+    ltv = sub.add_parser("ltv", parents=[common],
+                         help="Agregar validación de largo plazo (B-LT) a PDF ya firmados.")
+    ltv.add_argument("--archival", action="store_true", help="Agregar también sello de tiempo de archivo (B-LTA).")
+    ltv.add_argument("--store", help="Almacén de validaciones (validaciones.json).")
+    ltv.add_argument("-o", "--output-dir")
+
+    verify = sub.add_parser("verify", parents=[common], help="Verificar firmas y registro de validación.")
+    verify.add_argument("--store", help="Almacén de validaciones (validaciones.json).")
+
+    optimize = sub.add_parser("optimize", parents=[common], help="Recomprimir y limpiar objetos no usados.")
+    optimize.add_argument("--force", action="store_true", help="Optimizar aunque el PDF esté firmado.")
+    optimize.add_argument("-o", "--output-dir")
+
+    rebuild = sub.add_parser("rebuild-store", parents=[common],
+                             help="Reconstruir el almacén de validaciones desde los PDF firmados.")
+    rebuild.add_argument("--store", help="Almacén de validaciones (validaciones.json).")
+
+    watch = sub.add_parser("watch", parents=[signing], help="Firmar lo que llegue a una carpeta (demonio).")
+    watch.add_argument("inbox", help="Carpeta de entrada vigilada.")
+    watch.add_argument("-o", "--output-dir", required=True, help="Destino de los PDF firmados.")
+    watch.add_argument("--failed-dir", required=True, help="Destino de los archivos que fallaron.")
+    watch.add_argument("-j", "--jobs", type=int, default=2, help="Cantidad de procesos de trabajo.")
+    watch.add_argument("--max-pending", type=int, help="Máximo de archivos reclamados a la vez.")
+    watch.add_argument("--settle", type=float, default=2.0, help="Segundos sin cambios para dar un archivo por completo.")
+    watch.add_argument("--poll", type=float, default=5.0, help="Intervalo de sondeo (sin inotify).")
+    watch.add_argument("--metrics", help="Archivo JSON de métricas (por defecto <salida>/metrics.json).")
+    watch.add_argument("-v", "--verbose", action="store_true")
+
+    audit = sub.add_parser("audit", help="Auditar el almacén de validaciones contra los archivos.")
+    audit.add_argument("--root", action="append", required=True, help="Carpeta donde buscar los PDF (repetible).")
+    audit.add_argument("--report", required=True, help="Informe JSONL de hallazgos.")
+    audit.add_argument("--checkpoint", help="Checkpoint para retomar (por defecto junto al informe).")
+    audit.add_argument("--store", help="Almacén de validaciones (validaciones.json).")
+    audit.add_argument("--batch", type=int, default=256, help="Registros por tanda entre checkpoints.")
+    audit.add_argument("-v", "--verbose", action="store_true")
+
+    stats = sub.add_parser("stats", help="Estadísticas de firma (por usuario, oficina, día o mes).")
+    stats.add_argument("--by", default="user,day",
+                       help="Claves de agrupación separadas por coma: user, office, day, month (vacío = total).")
+    stats.add_argument("--metric", choices=("count", "bytes", "latency"), default="count")
+    stats.add_argument("--from", dest="start", type=_dt.date.fromisoformat, help="Desde (AAAA-MM-DD).")
+    stats.add_argument("--to", dest="end", type=_dt.date.fromisoformat, help="Hasta inclusive (AAAA-MM-DD).")
+    stats.add_argument("--user", help="Sólo este usuario.")
+    stats.add_argument("--office", help="Sólo esta oficina.")
+    stats.add_argument("--rebuild", action="store_true",
+                       help="Regenerar antes las estadísticas desde el almacén de validaciones.")
+    stats.add_argument("--store", help="Almacén de validaciones (validaciones.json).")
+    stats.add_argument("-v", "--verbose", action="store_true")
+
+    return parser
+
+
+def _run_audit(args: argparse.Namespace) -> int:
+    from modules.audit import AuditJob
+    from modules.signature_manager import SignatureManager
+
+    started = time.perf_counter()
+    counts = AuditJob(
+        store_path=SignatureManager(store_path=args.store).store_path,
+        roots=args.root,
+        report_path=args.report,
+        checkpoint_path=args.checkpoint,
+        batch_size=args.batch,
+    ).run()
+    summary = {
+        "command": "audit",
+        **counts,
+        "report": str(Path(args.report).resolve()),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if counts["missing"] or counts["modified"] or counts["duplicate"] or counts["orphaned"] else 0
+
+
+def _run_stats(args: argparse.Namespace) -> int:
+    from modules.analytics import analytics_dir_for, get_signing_stats
+    from modules.signature_manager import SignatureManager
+
+    started = time.perf_counter()
+    store_path = SignatureManager(store_path=args.store).store_path
+    stats = get_signing_stats(analytics_dir_for(store_path))
+    summary: dict[str, Any] = {"command": "stats", "metric": args.metric}
+    if args.rebuild:
+        summary["rebuilt_records"] = stats.rebuild_from_store(store_path)
+
+    by = [key.strip() for key in args.by.split(",") if key.strip()]
+    filters = {"start": args.start, "end": args.end, "user": args.user, "office": args.office}
+    try:
+        if args.metric == "count":
+            groups = [{**dict(zip(by, key)), "count": n} for key, n in stats.count(by, **filters).items()]
+        elif args.metric == "bytes":
+            groups = [{**dict(zip(by, key)), "bytes": n} for key, n in stats.bytes_signed(by, **filters).items()]
+        else:
+            groups = [{**dict(zip(by, key)), **values}
+                      for key, values in stats.latency_percentiles(by=by, **filters).items()]
+    except ValueError as exc:
+        print(json.dumps({"command": "stats", "error": str(exc)}, ensure_ascii=False))
+        return 2
+    summary.update(by=by, groups=groups, elapsed_s=round(time.perf_counter() - started, 3))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+def _run_watch(args: argparse.Namespace) -> int:
+    from wolfsight.daemon import WatchFolderDaemon, install_signal_handlers
+
+    daemon = WatchFolderDaemon(
+        inbox=args.inbox,
+        output_dir=args.output_dir,
+        failed_dir=args.failed_dir,
+        sign_opts=_sign_options(args),
+        workers=args.jobs,
+        max_pending=args.max_pending,
+        settle_seconds=args.settle,
+        poll_interval=args.poll,
+        metrics_path=args.metrics,
+    )
+    install_signal_handlers(daemon)
+    daemon.run()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+    if not args.verbose:
+        logging.getLogger("pyhanko").setLevel(logging.CRITICAL)
+    if args.command == "watch":
+        return _run_watch(args)
+    if args.command == "audit":
+        return _run_audit(args)
+    if args.command == "stats":
+        return _run_stats(args)
+
+    inputs = expand_inputs(args.inputs, args.recursive)
+    if not inputs:
+        print(json.dumps({"command": args.command, "error": "No se encontraron archivos."}))
+        return 2
+    if getattr(args, "output_dir", None):
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    results: list[dict[str, Any]] = []
+    for result in _COMMANDS[args.command](args, inputs):
+        results.append(result)
+        if args.jsonl:
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    failed = sum(1 for r in results if not r["ok"])
+    summary: dict[str, Any] = {
+        "command": args.command,
+        "total": len(results),
+        "ok": len(results) - failed,
+        "failed": failed,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+    if not args.jsonl:
+        summary["results"] = results
+    print(json.dumps(summary, ensure_ascii=False, indent=None if args.jsonl else 2))
+    return 1 if failed else 0
@@ -0,0 +1,374 @@
+# coding: utf-8
+# wolfsight/daemon.py · WolfSight-PDF
+"""
+Demonio de firma por carpeta vigilada.
+
+Los PDF que se dejan en la bandeja de entrada se firman automáticamente:
+
+1. Un vigilante (inotify en Linux, sondeo periódico en el resto) despierta
+   al escáner, que sólo acepta archivos cuyo tamaño y fecha no cambiaron
+   durante ``settle_seconds`` y que terminan en ``%%EOF``.
+2. Cada archivo estable se *reclama* renombrándolo dentro de
+   ``<entrada>/.procesando`` con un sufijo único (``nombre~<marca>.pdf``:
+   dos envíos con el mismo nombre no se pisan) y se envía a un pool de
+   procesos acotado.
+3. La salida firmada va a la carpeta de salida (``nombre-firmado.pdf``,
+   ``nombre-firmado-1.pdf``… si ya existe), el original a
+   ``<salida>/originales`` y los fallos, con su ``.error.txt``, a la
+   carpeta de errores.
+
+La contrapresión la da un semáforo: nunca hay más de ``max_pending``
+archivos reclamados. El resto espera en disco, así que una ráfaga de miles
+de archivos no hace crecer la memoria.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Final
+
+from wolfsight import tasks
+
+_LOG = logging.getLogger("WatchDaemon")
+_PROCESSING_DIR: Final[str] = ".procesando"
+_CLAIM_MARK: Final[str] = "~"
+_EOF_TAIL: Final[int] = 1024
+_LATENCY_WINDOW: Final[int] = 1000
+_FLUSH_EVERY: Final[int] = 100
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class _Inotify:
+    """Aviso de cambios en un directorio mediante inotify (sólo Linux)."""
+
+    _IN_CLOSE_WRITE: Final[int] = 0x00000008
+    _IN_MOVED_TO: Final[int] = 0x00000080
+    _IN_NONBLOCK: Final[int] = 0o4000
+    _IN_CLOEXEC: Final[int] = 0o2000000
+
+    def __init__(self, path: Path) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(self._IN_NONBLOCK | self._IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        if libc.inotify_add_watch(fd, os.fsencode(path), self._IN_CLOSE_WRITE | self._IN_MOVED_TO) < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch")
+        self._fd = fd
+
+    def wait(self, timeout: float) -> None:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if ready:
+            # Sólo interesa despertar: se descartan los eventos y se reescanea.
+            try:
+                while os.read(self._fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class _Polling:
+    """Alternativa portable: despierta cada ``timeout`` segundos."""
+
+    def __init__(self, stop: threading.Event) -> None:
+        self._stop = stop
+
+    def wait(self, timeout: float) -> None:
+        self._stop.wait(timeout)
+
+    def close(self) -> None:
+        pass
+
+
+def _make_watcher(path: Path, stop: threading.Event) -> _Inotify | _Polling:
+    if sys.platform.startswith("linux"):
+        try:
+            return _Inotify(path)
+        except (OSError, AttributeError) as exc:
+            _LOG.warning("inotify no disponible (%s); se usará sondeo.", exc)
+    return _Polling(stop)
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+@dataclass(slots=True)
+class _Metrics:
+    started: float = field(default_factory=time.time)
+    processed: int = 0
+    failed: int = 0
+    latencies: deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+    completions: deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+
+    def snapshot(self, queue_depth: int, in_flight: int) -> dict[str, Any]:
+        now = time.time()
+        last_minute = sum(1 for t in self.completions if now - t <= 60)
+        ordered = sorted(self.latencies)
+
+        def pct(q: float) -> float | None:
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3) if ordered else None
+
+        return {
+            "timestamp": now,
+            "uptime_s": round(now - self.started, 1),
+            "queue_depth": queue_depth,
+            "in_flight": in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "throughput_per_min": last_minute,
+            "latency_p50_s": pct(0.50),
+            "latency_p95_s": pct(0.95),
+            "latency_max_s": round(ordered[-1], 3) if ordered else None,
+        }
+
+
+# ╔═══════════════════════════════════════════════════════════════════════════╗
+class WatchFolderDaemon:
+    """Vigila ``inbox`` y firma cada PDF completo que aparece en ella."""
+
+    def __init__(
+        self,
+        *,
+        inbox: str | Path,
+        output_dir: str | Path,
+        failed_dir: str | Path,
+        sign_opts: dict[str, Any],
+        workers: int = 2,
+        max_pending: int | None = None,
+        settle_seconds: float = 2.0,
+        poll_interval: float = 5.0,
+        metrics_path: str | Path | None = None,
+        metrics_interval: float = 10.0,
+    ) -> None:
+        self.inbox = Path(inbox).resolve()
+        self.output_dir = Path(output_dir).resolve()
+        self.failed_dir = Path(failed_dir).resolve()
+        self.originals_dir = self.output_dir / "originales"
+        self.processing_dir = self.inbox / _PROCESSING_DIR
+        for folder in (self.inbox, self.output_dir, self.failed_dir, self.originals_dir, self.processing_dir):
+            folder.mkdir(parents=True, exist_ok=True)
+
+        self._sign_opts = sign_opts
+        self._workers = max(workers, 1)
+        self._max_pending = max_pending or self._workers * 4
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+        self._settle = settle_seconds
+        self._poll = poll_interval
+        self._metrics_path = Path(metrics_path) if metrics_path else self.output_dir / "metrics.json"
+        self._metrics_interval = metrics_interval
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._metrics = _Metrics()
+        self._claimed: dict[str, float] = {}  # nombre en .procesando → momento del reclamo
+        # Candidatos aún no estables: acotado a ``max_pending`` para no crecer en ráfagas.
+        self._candidates: dict[Path, tuple[int, int, float]] = {}
+        self._records: list[Any] = []
+        # Reclamados de una ejecución anterior que esperan lugar en el pool.
+        self._backlog: deque[Path] = deque()
+
+    # ——— ciclo principal ————————————————————————————————————————————
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        watcher = _make_watcher(self.inbox, self._stop)
+        pool = ProcessPoolExecutor(max_workers=self._workers)
+        last_metrics = 0.0
+        try:
+            self._recover(pool)
+            while not self._stop.is_set():
+                self._drain_backlog(pool)
+                self._scan(pool)
+                self._flush_records()
+                if time.monotonic() - last_metrics >= self._metrics_interval:
+                    self._write_metrics()
+                    last_metrics = time.monotonic()
+                busy = self._candidates or self._backlog
+                watcher.wait(min(self._poll, self._settle) if busy else self._poll)
+        finally:
+            watcher.close()
+            pool.shutdown(wait=True)
+            self._flush_records(force=True)
+            self._write_metrics()
+
+    # ——— escaneo y reclamo ——————————————————————————————————————————
+    def _scan(self, pool: ProcessPoolExecutor) -> None:
+        now = time.monotonic()
+        seen: set[Path] = set()
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if self._stop.is_set():
+                    return
+                if entry.name.startswith(".") or not entry.name.lower().endswith(".pdf"):
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                path = Path(entry.path)
+                seen.add(path)
+                st = entry.stat()
+                sig = (st.st_size, st.st_mtime_ns)
+                previous = self._candidates.get(path)
+                if previous is None or previous[:2] != sig:
+                    if previous is None and len(self._candidates) >= self._max_pending:
+                        continue  # se retoma en el próximo escaneo
+                    self._candidates[path] = (*sig, now)
+                    continue
+                if now - previous[2] < self._settle or not self._is_complete(path):
+                    continue
+                if not self._slots.acquire(blocking=False):
+                    return  # contrapresión: el pool está lleno
+                del self._candidates[path]
+                self._claim_and_submit(pool, path)
+
+        for gone in set(self._candidates) - seen:
+            del self._candidates[gone]
+
+    @staticmethod
+    def _is_complete(path: Path) -> bool:
+        try:
+            with path.open("rb") as fp:
+                fp.seek(max(path.stat().st_size - _EOF_TAIL, 0))
+                return b"%%EOF" in fp.read()
+        except OSError:
+            return False
+
+    def _claim_and_submit(self, pool: ProcessPoolExecutor, path: Path) -> None:
+        claimed = self._claim_name(path)
+        try:
+            os.replace(path, claimed)
+        except OSError as exc:
+            _LOG.warning("No se pudo reclamar %s: %s", path.name, exc)
+            self._slots.release()
+            return
+        self._submit(pool, claimed)
+
+    def _claim_name(self, path: Path) -> Path:
+        # Sólo el demonio escribe en .procesando: alcanza con no repetir la marca.
+        while True:
+            claimed = self.processing_dir / f"{path.stem}{_CLAIM_MARK}{time.time_ns():x}{path.suffix}"
+            if not claimed.exists():
+                return claimed
+
+    @staticmethod
+    def _original_name(claimed: Path) -> str:
+        stem, mark, _token = claimed.stem.rpartition(_CLAIM_MARK)
+        return f"{stem if mark else claimed.stem}{claimed.suffix}"
+
+    def _recover(self, pool: ProcessPoolExecutor) -> None:
+        """Reencola lo que quedó reclamado si el demonio se detuvo a mitad."""
+        self._backlog.extend(sorted(self.processing_dir.glob("*.pdf")))
+        self._drain_backlog(pool)
+
+    def _drain_backlog(self, pool: ProcessPoolExecutor) -> None:
+        # Sin bloquear: lo que no entra espera a que se libere un lugar.
+        while self._backlog and self._slots.acquire(blocking=False):
+            self._submit(pool, self._backlog.popleft())
+
+    def _submit(self, pool: ProcessPoolExecutor, claimed: Path) -> None:
+        try:
+            dst = self._reserve(self.output_dir / f"{Path(self._original_name(claimed)).stem}-firmado.pdf")
+        except OSError as exc:
+            self._slots.release()
+            _LOG.error("No se pudo reservar la salida de %s: %s", claimed.name, exc)
+            return
+        with self._lock:
+            self._claimed[claimed.name] = time.time()
+        future = pool.submit(tasks.run_task, tasks.sign_task, str(claimed), str(dst), self._sign_opts)
+        future.add_done_callback(lambda f, c=claimed, d=dst: self._on_done(c, d, f))
+
+    @staticmethod
+    def _reserve(path: Path) -> Path:
+        """Crea vacío el primer nombre libre (``-1``, ``-2``…), atómicamente."""
+        n = 0
+        while True:
+            candidate = path if n == 0 else path.with_name(f"{path.stem}-{n}{path.suffix}")
+            try:
+                with open(candidate, "x"):
+                    return candidate
+            except FileExistsError:
+                n += 1
+
+    # ——— resultados ————————————————————————————————————————————————
+    def _on_done(self, claimed: Path, dst: Path, future: Future[dict[str, Any]]) -> None:
+        try:
+            try:
+                result = future.result()
+            except Exception as exc:  # noqa: BLE001  (p. ej. BrokenProcessPool)
+                result = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+            with self._lock:
+                started = self._claimed.pop(claimed.name, time.time())
+            original = self._original_name(claimed)
+            if result["ok"]:
+                os.replace(claimed, self._unique(self.originals_dir / original))
+                with self._lock:
+                    self._records.append(result["record"])
+                    self._metrics.processed += 1
+            else:
+                if dst.exists() and dst.stat().st_size == 0:
+                    dst.unlink()  # la reserva vacía
+                target = self._unique(self.failed_dir / original)
+                os.replace(claimed, target)
+                target.with_name(target.name + ".error.txt").write_text(result["error"], encoding="utf-8")
+                _LOG.error("Falló %s: %s", claimed.name, result["error"])
+                with self._lock:
+                    self._metrics.failed += 1
+            with self._lock:
+                now = time.time()
+                self._metrics.latencies.append(now - started)
+                self._metrics.completions.append(now)
+        except OSError as exc:
+            _LOG.error("No se pudo mover %s: %s", claimed.name, exc)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _unique(path: Path) -> Path:
+        candidate, n = path, 1
+        while candidate.exists():
+            candidate = path.with_name(f"{path.stem}-{n}{path.suffix}")
+            n += 1
+        return candidate
+
+    def _flush_records(self, force: bool = False) -> None:
+        from modules.signature_manager import SignatureManager, ValidationRecord
+
+        with self._lock:
+            # Por tandas mientras hay trabajo; todo lo pendiente al quedar ocioso.
+            idle = not self._claimed
+            if not self._records or not (force or idle or len(self._records) >= _FLUSH_EVERY):
+                return
+            batch, self._records = self._records, []
+        SignatureManager(store_path=self._sign_opts["store"]).append_records(
+            ValidationRecord(**rec) for rec in batch
+        )
+
+    def _write_metrics(self) -> None:
+        with self._lock:
+            in_flight = min(len(self._claimed), self._workers)
+            snapshot = self._metrics.snapshot(
+                queue_depth=len(self._claimed) - in_flight + len(self._candidates) + len(self._backlog),
+                in_flight=in_flight,
+            )
+        tmp = self._metrics_path.with_name(self._metrics_path.name + ".tmp")
+        tmp.write_text(json.dumps(snapshot, indent=2), encoding="utf-8")
+        os.replace(tmp, self._metrics_path)
+
+
+def install_signal_handlers(daemon: WatchFolderDaemon) -> None:
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
@@ -0,0 +1,102 @@
+# coding: utf-8
+# wolfsight/tasks.py · WolfSight-PDF
+"""
+Tareas por archivo que ejecutan los procesos de trabajo de la CLI y del
+demonio. Deben ser funciones de módulo para poder enviarse a otro proceso.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict
+from typing import Any, Callable
+
+
+def sign_task(src: str, dst: str, opts: dict[str, Any]) -> dict[str, Any]:
+    from modules.signature_manager import SignatureManager
+
+    manager = SignatureManager(store_path=opts["store"])
+    credentials: dict[str, Any] = {"pfx_path": opts["pfx"], "pfx_password": opts["password"]}
+    if opts.get("pkcs11") is not None:
+        from modules.pkcs11_signer import Pkcs11Settings, get_pkcs11_pool
+
+        # Un grupo por proceso: el PIN se ingresa una vez y la sesión se
+        # reutiliza en todos los archivos que le toquen a este worker.
+        pool = get_pkcs11_pool(opts["password"], Pkcs11Settings(**opts["pkcs11"]))
+        credentials = {"pkcs11": pool}
+    record, _qr = manager.sign_pdf(
+        pdf_in=src,
+        pdf_out=dst,
+        **credentials,
+        user=opts["user"],
+        reason=opts["reason"],
+        persist=False,
+        all_pages=opts.get("all_pages"),
+        level=opts.get("level"),
+    )
+    return {"output": dst, "record": asdict(record)}
+
+
+def ltv_task(src: str, dst: str, opts: dict[str, Any]) -> dict[str, Any]:
+    from modules.hashing import get_hash_service
+    from modules.ltv import get_ltv_service
+
+    before = get_hash_service().sha256(src)
+    after = get_ltv_service().add_ltv(src, dst, archival=opts["archival"])
+    return {"output": dst, "sha256_before": before, "sha256": after}
+
+
+def annex_task(src: str, dst: str, opts: dict[str, Any]) -> dict[str, Any]:
+    from modules.pdf_tools import merge_pdfs
+
+    pages = merge_pdfs(src, opts["annex"], dst)
+    return {"output": dst, "pages": pages}
+
+
+def extract_task(src: str, dst: str, opts: dict[str, Any]) -> dict[str, Any]:
+    from modules.document_session import get_session
+    from modules.pdf_tools import extract_pages, parse_page_ranges
+
+    pages = parse_page_ranges(opts["pages"], get_session(src).page_count)
+    return {"output": dst, "pages": extract_pages(src, pages, dst)}
+
+
+def split_task(src: str, dst: str, opts: dict[str, Any]) -> dict[str, Any]:
+    from modules.pdf_tools import split_pdf
+
+    outputs = split_pdf(src, opts["parts"], dst, workers=opts["workers"])
+    return {"outputs": [str(o) for o in outputs]}
+
+
+def verify_task(src: str, _dst: str, _opts: dict[str, Any]) -> dict[str, Any]:
+    from modules.hashing import get_hash_service
+    from modules.signature_manager import SignatureManager
+
+    statuses = SignatureManager.verify_signatures(src)
+    return {
+        "sha256": get_hash_service().sha256(src),
+        "signatures": [asdict(s) for s in statuses],
+    }
+
+
+def optimize_task(src: str, dst: str, opts: dict[str, Any]) -> dict[str, Any]:
+    from modules.pdf_tools import optimize_pdf
+
+    before, after = optimize_pdf(src, dst, force=opts["force"])
+    return {"output": dst, "bytes_before": before, "bytes_after": after}
+
+
+def recover_task(src: str, _dst: str, _opts: dict[str, Any]) -> dict[str, Any]:
+    from modules.store_recovery import recover_record
+
+    return {"record": asdict(recover_record(src))}
+
+
+def run_task(task: Callable[..., dict[str, Any]], src: str, dst: str, opts: dict[str, Any]) -> dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        result = {"input": src, "ok": True, **task(src, dst, opts)}
+    except Exception as exc:  # noqa: BLE001
+        result = {"input": src, "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result